@@ -0,0 +1,99 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from backend.all_func_metrics import metrics
+from backend.logger import setup_logger
+logger = setup_logger()
+
+CONFIG_PATH = "config.json"
+DEFAULT_CONFIG = {"folder_paths": [], "current_music": None, "theme": "dark", "sort_by": "Name"}
+FLUSH_DELAY_SECONDS = 1.0
+
+
+class ConfigStore:
+    """config.json kept in memory and written back in the background.
+
+    Changes only mark the store dirty and (re)start a short timer, so a burst of
+    actions such as next/next/next ends up as a single write. Writes go to a temporary
+    file that is renamed over config.json, so a crash never leaves a truncated file.
+    """
+
+    def __init__(self, path=CONFIG_PATH, flush_delay=FLUSH_DELAY_SECONDS, defaults=DEFAULT_CONFIG):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.defaults = defaults
+        self.lock = threading.RLock()
+        self.values = None
+        self.dirty = False
+        self.flush_timer = None
+
+    def load(self):
+        with self.lock:
+            if self.values is not None:
+                return
+            try:
+                with open(self.path, "r") as json_file:
+                    self.values = json.load(json_file)
+            except FileNotFoundError:
+                self.values = dict(self.defaults)
+            except Exception as e:
+                logger.exception("An error occurred while loading config: %s", e)
+                self.values = {}
+
+    def get(self, key, default=None):
+        with self.lock:
+            self.load()
+            return self.values.get(key, default)
+
+    def snapshot(self):
+        with self.lock:
+            self.load()
+            return dict(self.values)
+
+    def update(self, **values):
+        """Change one or more keys and schedule a write."""
+        with self.lock:
+            self.load()
+            changed = {key: value for key, value in values.items() if self.values.get(key, object()) != value}
+            if not changed:
+                return
+            self.values.update(changed)
+            self.dirty = True
+            if self.flush_timer is not None:
+                self.flush_timer.cancel()
+            self.flush_timer = threading.Timer(self.flush_delay, self.flush)
+            self.flush_timer.daemon = True
+            self.flush_timer.start()
+
+    def flush(self):
+        """Write pending changes now."""
+        with self.lock:
+            if self.flush_timer is not None:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+            if not self.dirty:
+                return
+            folder = os.path.dirname(os.path.abspath(self.path))
+            try:
+                started = time.perf_counter()
+                file_descriptor, temp_path = tempfile.mkstemp(dir=folder, prefix=".config-", suffix=".tmp")
+                try:
+                    with os.fdopen(file_descriptor, "w") as json_file:
+                        json.dump(self.values, json_file)
+                        json_file.flush()
+                        os.fsync(json_file.fileno())
+                    os.replace(temp_path, self.path)
+                except BaseException:
+                    os.remove(temp_path)
+                    raise
+                self.dirty = False
+                metrics.observe(f"config.write:{os.path.basename(self.path)}", time.perf_counter() - started)
+            except Exception as e:
+                logger.exception("An error occurred while saving config: %s", e)
+
+
+config_store = ConfigStore()
+atexit.register(config_store.flush)
@@ -0,0 +1,177 @@
+import io
+import shutil
+import subprocess
+import wave
+import numpy as np
+from backend.logger import setup_logger
+logger = setup_logger()
+
+
+def iter_audio_blocks(file_path, block_frames, sample_rate, channels, start_seconds=0.0, seek_index=None):
+    """Decode a file into float32 blocks of shape (frames, channels) in [-1, 1].
+
+    16-bit WAV files that already match the requested format are read straight from
+    disk block by block; everything else is decoded (and resampled) by an ffmpeg process
+    whose output is read a block at a time, so the first block is ready after a few
+    milliseconds of decoding and only a block is held in memory. With a seek index, an
+    MP3 is only decoded from the frame the start position is in. Without ffmpeg, pydub
+    decodes the whole file up front (it reads WAV files of any format by itself).
+    """
+    if file_path.lower().endswith(".wav"):
+        try:
+            wav_file = wave.open(file_path, "rb")
+        except (wave.Error, EOFError):
+            wav_file = None
+        if wav_file is not None:
+            with wav_file:
+                if wav_file.getsampwidth() == 2 and wav_file.getframerate() == sample_rate and wav_file.getnchannels() == channels:
+                    wav_file.setpos(min(int(start_seconds * sample_rate), wav_file.getnframes()))
+                    while True:
+                        data = wav_file.readframes(block_frames)
+                        if not data:
+                            return
+                        yield pcm16_to_float(data, channels)
+            # the format needs converting, fall back to ffmpeg below
+
+    converter = ffmpeg_path()
+    if converter is not None:
+        skip_bytes = 0
+        if seek_index is not None and start_seconds > 0 and file_path.lower().endswith(".mp3"):
+            skip_bytes, first_sample = seek_index.locate(start_seconds)
+            start_seconds -= first_sample / seek_index.sample_rate
+        blocks = iter_ffmpeg_blocks(converter, file_path, block_frames, sample_rate, channels, skip_bytes=skip_bytes, start_seconds=0.0 if skip_bytes else start_seconds)
+        # ffmpeg seeks on its own; after a seek index jump only the frames before the position are left to drop
+        yield from drop_frames(blocks, max(0, round(start_seconds * sample_rate)) if skip_bytes else 0)
+        return
+
+    if seek_index is not None and start_seconds > 0 and file_path.lower().endswith(".mp3"):
+        offset, first_sample = seek_index.locate(start_seconds)
+        with open(file_path, "rb") as audio_file:
+            audio_file.seek(offset)
+            samples, _ = decode_audio(io.BytesIO(audio_file.read()), sample_rate, channels)
+        # the frame starts up to a grid step early, which also covers the bit reservoir it may lack
+        start_seconds -= first_sample / seek_index.sample_rate
+    else:
+        samples, _ = decode_audio(file_path, sample_rate, channels)
+    for start in range(int(start_seconds * sample_rate), len(samples), block_frames):
+        yield samples[start:start + block_frames]
+
+
+def open_audio(file_path, block_frames):
+    """Decode a file at its own sample rate and channel count, block by block.
+
+    Returns (sample_rate, channels, total_frames, blocks). 16-bit WAV files are streamed
+    from disk and everything else through ffmpeg, with the format and length read from the
+    tags; total_frames is then an estimate. Without ffmpeg, pydub decodes it up front.
+    """
+    if file_path.lower().endswith(".wav"):
+        try:
+            wav_file = wave.open(file_path, "rb")
+        except (wave.Error, EOFError):
+            wav_file = None
+        if wav_file is not None:
+            if wav_file.getsampwidth() == 2:
+                return wav_file.getframerate(), wav_file.getnchannels(), wav_file.getnframes(), iter_wav_blocks(wav_file, block_frames)
+            wav_file.close()
+
+    converter = ffmpeg_path()
+    info = stream_info(file_path) if converter is not None else None
+    if info is not None:
+        sample_rate, channels, seconds = info
+        return sample_rate, channels, round(seconds * sample_rate), iter_ffmpeg_blocks(converter, file_path, block_frames, sample_rate, channels)
+
+    samples, sample_rate = decode_audio(file_path)
+    blocks = (samples[start:start + block_frames] for start in range(0, len(samples), block_frames))
+    return sample_rate, samples.shape[1], len(samples), blocks
+
+
+def iter_wav_blocks(wav_file, block_frames):
+    with wav_file:
+        channels = wav_file.getnchannels()
+        while True:
+            data = wav_file.readframes(block_frames)
+            if not data:
+                return
+            yield pcm16_to_float(data, channels)
+
+
+def ffmpeg_path():
+    """The ffmpeg pydub is set up to use, None if it isn't installed."""
+    from pydub import AudioSegment
+    return shutil.which(AudioSegment.converter)
+
+
+def stream_info(file_path):
+    """(sample rate, channels, seconds) from the file's headers, None if mutagen can't tell."""
+    from mutagen import File
+    try:
+        audio_file = File(file_path)
+    except Exception as e:
+        logger.exception("An error occurred while reading a music file: %s", e)
+        return None
+    if audio_file is None or not getattr(audio_file.info, "channels", 0):
+        return None
+    # Opus is always decoded at 48 kHz, mutagen doesn't report a rate for it
+    return getattr(audio_file.info, "sample_rate", 48000), audio_file.info.channels, audio_file.info.length
+
+
+def iter_ffmpeg_blocks(converter, file_path, block_frames, sample_rate, channels, skip_bytes=0, start_seconds=0.0):
+    """Decode a file with an ffmpeg process writing 16-bit PCM to a pipe, and read it back a block at a time.
+
+    The process is killed when the generator is closed, a track skipped half way say.
+    """
+    command = [converter, "-v", "error", "-nostdin"]
+    if skip_bytes:
+        command += ["-skip_initial_bytes", str(skip_bytes)]
+    command += ["-i", file_path]
+    if start_seconds > 0:
+        # after -i ffmpeg decodes up to the position and drops it, which is sample exact; a seek before -i isn't for MP3
+        command += ["-ss", f"{start_seconds:.6f}"]
+    command += ["-vn", "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-ac", str(channels), "-"]
+    process = subprocess.Popen(
+        command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),  # no console window flashing up on Windows
+    )
+    yielded = False
+    try:
+        while True:
+            data = process.stdout.read(block_frames * channels * 2)
+            if not data:
+                break
+            yielded = True
+            yield pcm16_to_float(data, channels)
+        if process.wait() != 0 and not yielded:
+            raise RuntimeError(f"ffmpeg couldn't decode {file_path}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+
+
+def drop_frames(blocks, frames):
+    """The blocks with their first frames left out."""
+    for block in blocks:
+        if frames >= len(block):
+            frames -= len(block)
+            continue
+        yield block[frames:]
+        frames = 0
+
+
+def decode_audio(file_path, sample_rate=None, channels=None):
+    """Decode a whole file into a float32 array of shape (frames, channels), and return it with its sample rate."""
+    from pydub import AudioSegment
+    segment = AudioSegment.from_file(file_path)
+    if sample_rate is not None:
+        segment = segment.set_frame_rate(sample_rate)
+    if channels is not None:
+        segment = segment.set_channels(channels)
+    segment = segment.set_sample_width(2)
+    return pcm16_to_float(segment.raw_data, segment.channels), segment.frame_rate
+
+
+def pcm16_to_float(data, channels):
+    samples = np.frombuffer(data, dtype=np.int16)
+    samples = samples[:len(samples) - len(samples) % channels]
+    return (samples.reshape(-1, channels) / 32768.0).astype(np.float32)
@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from backend.all_func_decoding import iter_audio_blocks
+from backend.all_func_loudness import lower_priority
+from backend.logger import setup_logger
+logger = setup_logger()
+
+FINGERPRINT_SAMPLE_RATE = 11025  # mono; the bands the fingerprint looks at end at 3 kHz
+FINGERPRINT_SECONDS = 30  # the window that is fingerprinted, from the first sound of a track
+LEAD_IN_LEVEL = 1 / 256  # samples below this before the first sound are skipped
+SILENCE_RMS = 1e-3  # a window this quiet gets no fingerprint
+DECODE_BLOCK_FRAMES = 65536
+FRAME_SIZE = 2048  # FFT frames, half overlapping
+BAND_EDGES_HZ = np.geomspace(300, 3000, 18)  # 17 log-spaced bands
+SEGMENTS = 17  # overlapping stretches of the window the band energies are averaged over
+FINGERPRINT_BYTES = (SEGMENTS - 1) * (len(BAND_EDGES_HZ) - 2) // 8  # 16 x 16 bits
+LSH_KEYS = 16  # 16-bit slices of a fingerprint; tracks sharing any one of them are compared
+MAX_BUCKET = 256  # tracks sharing a key beyond this are too common a pattern to say anything
+MAX_DISTANCE = 40  # bits out of 256 two fingerprints may differ in and still be the same recording
+STORE_BATCH = 32  # fingerprints written to the index together
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+
+def decode_window(file_path):
+    """Mono float32 samples of the first FINGERPRINT_SECONDS of a file, leading silence skipped."""
+    window_frames = FINGERPRINT_SECONDS * FINGERPRINT_SAMPLE_RATE
+    collected = []
+    frames = 0
+    blocks = iter_audio_blocks(file_path, DECODE_BLOCK_FRAMES, FINGERPRINT_SAMPLE_RATE, 1)
+    try:
+        for block in blocks:
+            block = block[:, 0]
+            if not collected:
+                sound = np.flatnonzero(np.abs(block) > LEAD_IN_LEVEL)
+                if not len(sound):
+                    continue
+                block = block[sound[0]:]
+            collected.append(block[:window_frames - frames])
+            frames += len(collected[-1])
+            if frames >= window_frames:
+                break
+    finally:
+        blocks.close()
+    return np.concatenate(collected) if collected else np.zeros(0, dtype=np.float32)
+
+
+def spectral_fingerprint(samples, sample_rate=FINGERPRINT_SAMPLE_RATE):
+    """The 256-bit fingerprint of a mono window, as bytes; b"" if it's silent or too short to tell.
+
+    The window is cut into FFT frames, their energy summed in log-spaced bands and averaged
+    over SEGMENTS stretches of the window. Every bit is the sign of how the difference
+    between two neighbouring bands changes from one stretch to the next, which holds up
+    under a different codec, bitrate, sample rate or volume. The stretches overlap and
+    fade in and out, so a copy that starts a few frames later still lands on the same bits.
+    """
+    hop = FRAME_SIZE // 2
+    frame_count = 1 + (len(samples) - FRAME_SIZE) // hop if len(samples) >= FRAME_SIZE else 0
+    if frame_count < SEGMENTS or np.sqrt(np.mean(np.square(samples, dtype=np.float64))) < SILENCE_RMS:
+        return b""
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_SIZE)[::hop][:frame_count]
+    power = np.square(np.abs(np.fft.rfft(frames * np.hanning(FRAME_SIZE).astype(np.float32), axis=1)))
+    edges = np.round(BAND_EDGES_HZ * FRAME_SIZE / sample_rate).astype(np.int64)
+    band_energy = np.add.reduceat(power[:, :edges[-1]], edges[:-1], axis=1)
+    # triangular weights, each stretch peaking where its neighbours fade out
+    spacing = frame_count / (SEGMENTS + 1)
+    centres = np.arange(1, SEGMENTS + 1)[:, np.newaxis] * spacing
+    weights = np.maximum(0.0, 1 - np.abs(np.arange(frame_count) + 0.5 - centres) / spacing)
+    segment_energy = weights @ band_energy / weights.sum(axis=1, keepdims=True)
+    log_energy = np.log(segment_energy + 1e-12)
+    band_slope = log_energy[:, :-1] - log_energy[:, 1:]
+    return np.packbits(band_slope[1:] > band_slope[:-1]).tobytes()
+
+
+def fingerprint_file(file_path):
+    """Decode the window of a file and fingerprint it; None if it can't be decoded."""
+    try:
+        return spectral_fingerprint(decode_window(file_path))
+    except Exception as e:
+        logger.exception("An error occurred while fingerprinting a track: %s", e)
+        return None
+
+
+class DuplicateIndex:
+    """Locality-sensitive hash index over fingerprints, for finding near-duplicates without comparing every pair.
+
+    Every fingerprint is cut into LSH_KEYS slices of 16 bits. Two recordings of the same
+    song differ in a few bits spread over the whole fingerprint, so they almost always
+    agree on at least one slice, while unrelated tracks rarely do. Only tracks that share
+    a slice are compared bit by bit.
+    """
+
+    def __init__(self, entries):
+        """entries: (path, fingerprint) pairs; empty fingerprints are left out."""
+        entries = [(path, fingerprint) for path, fingerprint in entries if fingerprint]
+        self.paths = [path for path, _ in entries]
+        self.fingerprints = np.frombuffer(b"".join(fingerprint for _, fingerprint in entries), dtype=np.uint8).reshape(-1, FINGERPRINT_BYTES)
+        self.keys = self.fingerprints.view(np.uint16)  # (tracks, LSH_KEYS)
+
+    def candidate_pairs(self):
+        """(first, second) index arrays of every pair of tracks sharing a key, first < second."""
+        pairs = []
+        for column in self.keys.T:
+            order = np.argsort(column, kind="stable")
+            sorted_keys = column[order]
+            run_starts = np.flatnonzero(np.diff(sorted_keys, prepend=sorted_keys[:1] ^ 1))
+            run_lengths = np.diff(run_starts, append=len(order))
+            # buckets of the same size are paired up together, so the loop is over sizes, not buckets
+            for length in np.unique(run_lengths[(run_lengths > 1) & (run_lengths <= MAX_BUCKET)]).tolist():
+                starts = run_starts[run_lengths == length]
+                members = np.sort(order[starts[:, np.newaxis] + np.arange(length)], axis=1)
+                first, second = np.triu_indices(length, 1)
+                pairs.append((members[:, first] * len(self.paths) + members[:, second]).ravel())
+        if not pairs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        pairs = np.unique(np.concatenate(pairs))
+        return pairs // len(self.paths), pairs % len(self.paths)
+
+    def groups(self, max_distance=MAX_DISTANCE):
+        """Paths of the tracks that sound the same, as lists of two or more."""
+        first, second = self.candidate_pairs()
+        distance = np.bitwise_count(self.fingerprints[first] ^ self.fingerprints[second]).sum(axis=1)
+        close = distance <= max_distance
+        parent = list(range(len(self.paths)))
+
+        def root(index):
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+
+        for a, b in zip(first[close].tolist(), second[close].tolist()):
+            parent[root(a)] = root(b)
+        groups = {}
+        for index in sorted(set(first[close].tolist()) | set(second[close].tolist())):
+            groups.setdefault(root(index), []).append(self.paths[index])
+        return list(groups.values())
+
+
+class DuplicateFinder:
+    """Fingerprints the library in the background and groups the tracks that sound the same.
+
+    Fingerprints are cached in the library index by path, size and modification time.
+    Tracks that aren't cached yet are decoded on a pool of low-priority worker processes;
+    on_progress(done, total) reports on them now and then, and on_done(groups) gets the
+    result, which is also kept in groups.
+    """
+
+    def __init__(self, library_index, on_progress=None, on_done=None):
+        self.library_index = library_index
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.groups = []
+        self.lock = threading.Lock()
+        self.generation = 0
+
+    def find(self, music_files, workers=None):
+        """Look for duplicates among music_files; a newer call replaces a running one. Returns the thread."""
+        entries = [(file.path, file.date_modified, file.size) for file in music_files]
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+        thread = threading.Thread(target=self.run, args=(entries, workers, generation), daemon=True)
+        thread.start()
+        return thread
+
+    def cancel(self):
+        with self.lock:
+            self.generation += 1
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def run(self, entries, workers, generation):
+        try:
+            known = self.library_index.load_spectral_fingerprints()
+            fingerprints = {}
+            to_fingerprint = []
+            for file_path, date_modified, size in entries:
+                cached = known.get(file_path)
+                if cached is not None and cached[:2] == (date_modified, size):
+                    fingerprints[file_path] = cached[2]
+                else:
+                    to_fingerprint.append((file_path, date_modified, size))
+            if to_fingerprint:
+                self.fingerprint(to_fingerprint, workers, generation, fingerprints)
+            if not self.is_current(generation):
+                return
+            self.groups = DuplicateIndex(fingerprints.items()).groups()
+            if self.on_done is not None:
+                self.on_done(self.groups)
+        except Exception as e:
+            logger.exception("An error occurred while looking for duplicates: %s", e)
+
+    def fingerprint(self, to_fingerprint, workers, generation, fingerprints):
+        if workers is None:
+            workers = max(1, (os.cpu_count() or 2) - 1)  # leave a core for the UI and the mixer
+        pending = []
+        done_count = 0
+        reported = 0.0
+        with ProcessPoolExecutor(max_workers=workers, initializer=lower_priority) as executor:
+            remaining = iter(to_fingerprint)
+            running = {}
+            while True:
+                while len(running) < workers * 2 and self.is_current(generation):
+                    entry = next(remaining, None)
+                    if entry is None:
+                        break
+                    running[executor.submit(fingerprint_file, entry[0])] = entry
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path, date_modified, size = running.pop(future)
+                    done_count += 1
+                    fingerprint = future.result()
+                    if fingerprint is None:
+                        continue
+                    fingerprints[file_path] = fingerprint
+                    pending.append((file_path, date_modified, size, fingerprint))
+                if len(pending) >= STORE_BATCH:
+                    self.library_index.store_spectral_fingerprints(pending)
+                    pending = []
+                if self.on_progress is not None and self.is_current(generation) and time.monotonic() - reported >= PROGRESS_INTERVAL_SECONDS:
+                    reported = time.monotonic()
+                    self.on_progress(done_count, len(to_fingerprint))
+        if pending:
+            self.library_index.store_spectral_fingerprints(pending)
+        if self.on_progress is not None and self.is_current(generation):
+            self.on_progress(done_count, len(to_fingerprint))
@@ -0,0 +1,271 @@
+import collections
+import threading
+import time
+import numpy as np
+import pygame
+from backend.all_func_decoding import iter_audio_blocks
+from backend.logger import setup_logger
+logger = setup_logger()
+
+# band: (filter shape, centre/corner frequency in Hz)
+BANDS = {
+    "bass": ("low_shelf", 100.0),
+    "mid": ("peaking", 1000.0),
+    "treble": ("high_shelf", 8000.0),
+}
+MAX_GAIN_DB = 12.0
+PEAKING_Q = 0.9
+BLOCK_FRAMES = 2048  # ~46 ms at 44.1 kHz, also how quickly a slider change is heard
+# pygame.mixer.get_init() reports the sample size in bits, negative for signed formats (float32 is -32)
+MIXER_FORMATS = {-32: np.float32, -16: np.int16, 16: np.uint16, -8: np.int8, 8: np.uint8}
+
+
+def level_to_gain_db(level):
+    """Map an equalizer slider (0-100, 50 = flat) to a gain in dB."""
+    return (level - 50) / 50 * MAX_GAIN_DB
+
+
+def design_filters(sample_rate, gains_db):
+    """Biquad coefficients (RBJ audio EQ cookbook) for all bands, as an sos array for scipy."""
+    shapes = [shape for shape, _ in BANDS.values()]
+    frequencies = np.array([frequency for _, frequency in BANDS.values()])
+    gains = np.array([gains_db.get(band, 0.0) for band in BANDS])
+
+    amplitude = 10 ** (gains / 40)
+    omega = 2 * np.pi * np.minimum(frequencies, sample_rate * 0.45) / sample_rate
+    cos_omega = np.cos(omega)
+    # shelves use a slope of 1, i.e. Q = 1/sqrt(2)
+    alpha = np.where([shape == "peaking" for shape in shapes], np.sin(omega) / (2 * PEAKING_Q), np.sin(omega) / np.sqrt(2))
+    shelf_alpha = 2 * np.sqrt(amplitude) * alpha
+
+    sos = np.empty((len(BANDS), 6))
+    for section, shape in enumerate(shapes):
+        a, c, s = amplitude[section], cos_omega[section], shelf_alpha[section]
+        if shape == "peaking":
+            b = [1 + alpha[section] * a, -2 * c, 1 - alpha[section] * a]
+            den = [1 + alpha[section] / a, -2 * c, 1 - alpha[section] / a]
+        elif shape == "low_shelf":
+            b = [a * ((a + 1) - (a - 1) * c + s), 2 * a * ((a - 1) - (a + 1) * c), a * ((a + 1) - (a - 1) * c - s)]
+            den = [(a + 1) + (a - 1) * c + s, -2 * ((a - 1) + (a + 1) * c), (a + 1) + (a - 1) * c - s]
+        else:
+            b = [a * ((a + 1) + (a - 1) * c + s), -2 * a * ((a - 1) + (a + 1) * c), a * ((a + 1) + (a - 1) * c - s)]
+            den = [(a + 1) - (a - 1) * c + s, 2 * ((a - 1) - (a + 1) * c), (a + 1) - (a - 1) * c - s]
+        sos[section, :3] = np.array(b) / den[0]
+        sos[section, 3:] = np.array(den) / den[0]
+    return sos
+
+
+class Equalizer:
+    """Bass/mid/treble filter bank that processes audio block by block.
+
+    Filter state is carried from one block to the next, so blocks join without clicks.
+    New gains are picked up at the start of the next block, which is rendered with both
+    the old and the new coefficients and cross-faded from one to the other.
+    """
+
+    def __init__(self, sample_rate=44100, channels=2):
+        self.gains_db = {band: 0.0 for band in BANDS}
+        self.lock = threading.Lock()
+        self.configure(sample_rate, channels)
+
+    def configure(self, sample_rate, channels):
+        with self.lock:
+            self.sample_rate = sample_rate
+            self.channels = channels
+            self.sos = design_filters(sample_rate, self.gains_db)
+            self.pending_sos = None
+            self.state = np.zeros((len(BANDS), 2, channels))
+
+    def set_gains(self, **gains_db):
+        """Change one or more band gains (in dB); takes effect from the next block."""
+        with self.lock:
+            self.gains_db.update(gains_db)
+            self.pending_sos = design_filters(self.sample_rate, self.gains_db)
+
+    def is_flat(self):
+        return all(gain == 0 for gain in self.gains_db.values())
+
+    def reset(self):
+        """Forget the filter state, for a jump to another position or track."""
+        with self.lock:
+            self.state = np.zeros_like(self.state)
+
+    def process(self, block):
+        """Filter a (frames, channels) float block and return the result clipped to [-1, 1]."""
+        from scipy.signal import sosfilt  # slow to import, and only needed once the equalizer is on
+        with self.lock:
+            pending_sos, self.pending_sos = self.pending_sos, None
+            if pending_sos is None:
+                output, self.state = sosfilt(self.sos, block, axis=0, zi=self.state)
+            else:
+                old_output, _ = sosfilt(self.sos, block, axis=0, zi=self.state)
+                output, self.state = sosfilt(pending_sos, block, axis=0, zi=self.state)
+                fade_in = np.linspace(0.0, 1.0, len(block))[:, np.newaxis]
+                output = old_output + (output - old_output) * fade_in
+                self.sos = pending_sos
+        return np.clip(output, -1.0, 1.0)
+
+
+class EqualizerStream:
+    """Plays files through an Equalizer on a pygame Channel.
+
+    It mirrors the parts of pygame.mixer.music that PlaybackControls uses (load, play,
+    queue, pause, set_pos, get_pos, ...) so it can stand in for it while the equalizer
+    is switched on. A feeder thread decodes, filters and queues one block ahead.
+    """
+
+    def __init__(self, equalizer, block_frames=BLOCK_FRAMES):
+        self.equalizer = equalizer
+        self.block_frames = block_frames
+        self.channel = None
+        self.path = None
+        self.queued_path = None
+        self.seek_index = None  # of the current file, set by PlaybackControls
+        self.lock = threading.RLock()
+        self.feeder = None
+        self.stop_event = threading.Event()
+        self.paused = False
+        self.pause_started = None
+        self.pending = collections.deque()  # (sound, frames, starts_track) handed to the channel
+        self.played_frames = 0  # frames of finished blocks since play() or the last track switch
+        self.current_block_started = None
+
+    def load(self, path):
+        self.stop()
+        self.path = path
+        self.queued_path = None
+
+    def queue(self, path):
+        self.queued_path = path
+
+    def play(self, loops=0, start=0.0):
+        self.stop()
+        frequency, size, channels = pygame.mixer.get_init()
+        self.equalizer.configure(frequency, channels)
+        self.sample_format = MIXER_FORMATS.get(size, np.int16)
+        if self.channel is None:
+            self.channel = pygame.mixer.find_channel(True)
+        self.played_frames = 0
+        self.start_feeder(start)
+
+    def start_feeder(self, start):
+        self.stop_event = threading.Event()
+        self.paused = False
+        self.pending.clear()
+        self.current_block_started = None
+        self.feeder = threading.Thread(target=self.feed, args=(self.path, start, self.stop_event), daemon=True)
+        self.feeder.start()
+
+    def stop(self):
+        # not under self.lock: the feeder needs it to notice the stop and exit
+        self.stop_event.set()
+        if self.feeder is not None and self.feeder is not threading.current_thread():
+            self.feeder.join()
+        self.feeder = None
+        if self.channel is not None:
+            self.channel.stop()
+
+    def pause(self):
+        if self.channel is not None and not self.paused:
+            self.channel.pause()
+            self.paused = True
+            self.pause_started = time.monotonic()
+
+    def unpause(self):
+        if self.channel is not None and self.paused:
+            self.channel.unpause()
+            self.paused = False
+            if self.current_block_started is not None:
+                self.current_block_started += time.monotonic() - self.pause_started
+
+    def get_busy(self):
+        return self.feeder is not None and self.feeder.is_alive() and not self.paused
+
+    def get_pos(self):
+        """Milliseconds played since play() or the last switch to a queued file, like pygame."""
+        with self.lock:
+            self.collect_finished_blocks()
+            played_frames = self.played_frames
+            if self.current_block_started is not None:
+                now = self.pause_started if self.paused else time.monotonic()
+                current_frames = self.pending[0][1] if self.pending else 0
+                played_frames += min((now - self.current_block_started) * self.equalizer.sample_rate, current_frames)
+        return int(played_frames * 1000 / self.equalizer.sample_rate)
+
+    def set_pos(self, seconds):
+        """Jump to seconds in the current file; get_pos() keeps counting like it does in pygame."""
+        was_paused = self.paused
+        played_ms = self.get_pos()
+        self.stop()
+        self.played_frames = played_ms * self.equalizer.sample_rate // 1000
+        self.equalizer.reset()
+        self.start_feeder(seconds)
+        if was_paused:
+            self.pause()
+
+    def collect_finished_blocks(self):
+        """Drop the blocks the channel is done with from self.pending and count their frames."""
+        current_sound = self.channel.get_sound() if self.channel is not None else None
+        while self.pending and self.pending[0][0] is not current_sound:
+            _, frames, _ = self.pending.popleft()
+            self.played_frames += frames
+            self.current_block_started = time.monotonic()
+            if self.pending and self.pending[0][2]:
+                self.played_frames = 0  # the queued file has started playing
+        if not self.pending:
+            self.current_block_started = None
+
+    def feed(self, path, start, stop_event):
+        try:
+            blocks = iter_audio_blocks(path, self.block_frames, self.equalizer.sample_rate, self.equalizer.channels, start, self.seek_index)
+            starts_track = False
+            while not stop_event.is_set():
+                with self.lock:
+                    self.collect_finished_blocks()
+                    room = self.channel.get_queue() is None
+                if self.paused or not room:
+                    time.sleep(self.block_frames / self.equalizer.sample_rate / 4)
+                    continue
+
+                block = next(blocks, None)
+                if block is None:
+                    if self.queued_path is None:
+                        break
+                    # gapless: carry on with the queued file in the same stream of blocks
+                    self.path, self.queued_path = self.queued_path, None
+                    self.equalizer.reset()
+                    blocks = iter_audio_blocks(self.path, self.block_frames, self.equalizer.sample_rate, self.equalizer.channels)
+                    starts_track = True
+                    continue
+
+                samples = to_mixer_samples(self.equalizer.process(block), self.sample_format)
+                sound = pygame.sndarray.make_sound(samples)
+                with self.lock:
+                    if stop_event.is_set():
+                        break
+                    self.pending.append((sound, len(block), starts_track))
+                    if self.channel.get_busy():
+                        self.channel.queue(sound)
+                    else:
+                        self.channel.play(sound)
+                        self.current_block_started = time.monotonic()
+                        if starts_track:
+                            self.played_frames = 0
+                starts_track = False
+
+            # let the last blocks play out so get_busy() stays true until the audio really ends
+            while not stop_event.is_set() and (self.channel.get_busy() or self.paused):
+                time.sleep(self.block_frames / self.equalizer.sample_rate / 4)
+        except Exception as e:
+            logger.exception("An error occurred in the equalizer stream: %s", e)
+
+
+def to_mixer_samples(samples, sample_format):
+    """Float samples in [-1, 1] as a contiguous array in one of MIXER_FORMATS; unsigned ones are centred on half their range."""
+    if sample_format is np.float32:
+        return np.ascontiguousarray(samples, dtype=np.float32)
+    limits = np.iinfo(sample_format)
+    if limits.min < 0:
+        return np.ascontiguousarray(np.round(samples * limits.max), dtype=sample_format)
+    middle = (limits.max + 1) // 2
+    return np.ascontiguousarray(np.round(samples * (middle - 1) + middle), dtype=sample_format)
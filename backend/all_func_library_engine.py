@@ -0,0 +1,579 @@
+import os
+import time
+import base64
+import collections
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from backend.all_func_library_index import Track
+from backend.all_func_metrics import metrics
+from backend.all_func_search import SearchIndex
+from backend.all_func_tag_index import TagIndex
+from backend import all_func_thumbnails
+from backend.all_func_thumbnails import set_assets_dir, store_thumbnail
+from backend.logger import setup_logger
+logger = setup_logger()
+
+MUSIC_EXTENSIONS = (".mp3", ".opus", ".wav")
+SCAN_BATCH_FILES = 64  # files handed on together, cached or not
+SCAN_FILES_PER_PROCESS_TASK = 16
+DELIVERY_INTERVAL_SECONDS = 0.25  # how often newly found tracks are handed to on_tracks
+SORT_LABELS = ["Name", "Recently Added", "Size (Ascending)", "Type"]
+# ties fall through to the name and then the path, so every order is complete and repeatable
+SORT_KEYS = {
+    "Name": lambda track: (track.name.lower(), track.path),
+    "Recently Added": lambda track: (-track.date_modified, track.name.lower(), track.path),
+    "Size (Ascending)": lambda track: (track.size, track.name.lower(), track.path),
+    "Type": lambda track: (track.type, track.name.lower(), track.path),
+}
+# the tags kept on every track: Vorbis comment name (Opus) -> ID3 frame (MP3 and WAV)
+TAG_FRAMES = {"title": "TIT2", "artist": "TPE1", "album": "TALB", "genre": "TCON", "tracknumber": "TRCK"}
+
+
+class LibraryEngine:
+    """The music library without a UI: scanning, the metadata cache, sorting, search and tags.
+
+    MusicPlayer keeps one for the window and shows what it holds; the library CLI
+    (python -m backend.library_cli) drives one on its own, with no Flet at all.
+
+    tracks holds the library in scan order and a track's position in it is its id, which
+    only changes when tracks are removed. Every sort order is a permutation of those ids,
+    computed once per library change and kept, so sorting again only re-reads a permutation.
+    music_files is tracks in the current order, and what indexes from outside refer to.
+
+    lock is held while any of it is read or changed, so the watcher thread can bring the
+    library up to date while the window sorts or searches it. It's reentrant: callers that
+    need a change and what they do with its result to happen together hold it around both.
+    music_files is never changed in place once the scan is done, only replaced, so a list
+    taken from it can be read without the lock.
+    """
+
+    def __init__(self, library_index):
+        self.library_index = library_index
+        self.lock = threading.RLock()
+        self.folder_paths = []
+        self.tracks = []
+        self.ids = {}  # path -> id
+        self.music_files = []
+        self.search_index = SearchIndex()  # by id
+        self.tags = TagIndex()  # by id
+        self.sort_label = SORT_LABELS[0]
+        self.orders = {}  # sort label -> ids in that order
+        self.order = None  # ids in the order of music_files, None while that is scan order
+        self.ranks = None  # id -> index in music_files, None while that is scan order
+
+    def scan(self, folder_paths, on_tracks=None, workers=None, use_processes=False, cancelled=None):
+        """Scan every folder of the library into music_files and the index; returns how many files were parsed.
+
+        music_files is left in scan order. on_tracks(rows) gets the (index, file_metadata)
+        rows found since its last call, every DELIVERY_INTERVAL_SECONDS while the scan is
+        going and once more at the end. Setting the cancelled event stops the scan after the
+        file it's on; what was parsed so far is still stored.
+        """
+        with self.lock:
+            self.folder_paths = list(folder_paths)
+            self.tracks = []
+            self.ids = {}
+            self.music_files = []
+            self.search_index = SearchIndex()
+            self.tags = TagIndex()
+            self.orders = {}
+            self.order = self.ranks = None
+
+        new_rows = []
+        last_delivery = time.monotonic()
+        parsed = 0
+        for folder_path in self.folder_paths:
+            if cancelled is not None and cancelled.is_set():
+                break
+            cached_files = self.library_index.load_folder(folder_path)
+            changed_files = []
+            for file_metadata, changed in scan_folder(folder_path, cached_files, workers, use_processes):
+                if changed:
+                    changed_files.append(file_metadata)
+                if cancelled is not None and cancelled.is_set():
+                    # the rest of the folder wasn't looked at, so nothing counts as deleted
+                    cached_files = {}
+                    break
+                with self.lock:
+                    if file_metadata.path in self.ids:
+                        continue  # one folder of the library may sit inside another
+                    new_rows.append((len(self.music_files), file_metadata))
+                    self.add_track(file_metadata)
+                    self.music_files.append(file_metadata)
+
+                if on_tracks is not None and time.monotonic() - last_delivery >= DELIVERY_INTERVAL_SECONDS:
+                    on_tracks(new_rows)
+                    new_rows = []
+                    last_delivery = time.monotonic()
+
+            # whatever is left in the cache was deleted from the folder since the last scan
+            self.library_index.update_folder(folder_path, changed_files, cached_files.keys())
+            parsed += len(changed_files)
+
+        metrics.count("load_music.files_parsed", parsed)
+        if on_tracks is not None and new_rows and not (cancelled is not None and cancelled.is_set()):
+            on_tracks(new_rows)
+        return parsed
+
+    def load_index(self, folder_paths=None):
+        """Fill music_files from the index alone, without touching the folders; all indexed folders by default."""
+        with self.lock:
+            self.folder_paths = list(folder_paths) if folder_paths is not None else self.library_index.folders()
+            self.tracks = []
+            self.ids = {}
+            self.search_index = SearchIndex()
+            self.tags = TagIndex()
+            self.orders = {}
+            for folder_path in self.folder_paths:
+                for file_metadata in self.library_index.load_folder(folder_path).values():
+                    if file_metadata.path not in self.ids:
+                        self.add_track(file_metadata)
+            self.show_order(self.sort_label)
+
+    def add_track(self, file_metadata):
+        self.ids[file_metadata.path] = len(self.tracks)
+        self.tracks.append(file_metadata)
+        self.search_index.add(file_metadata.name)
+        self.tags.add(self.ids[file_metadata.path], file_metadata)
+
+    def parse_changes(self, changed_paths):
+        """Read what changed on disk at changed_paths, without changing the library yet.
+
+        The files involved are walked, stat'ed and parsed, and the index is brought up to
+        date, all without holding lock. Returns (parsed, removed), for apply_changes(): the
+        metadata of the tracks that are new or changed, and the paths of the tracks gone.
+        Paths outside every folder of the library are left out.
+        """
+        found = {}  # music files that exist now: path -> stat
+        gone = set()  # files and folders that may have taken tracks with them
+        for path in changed_paths:
+            if self.library_folder(path) is None and path not in self.folder_paths:
+                continue
+            if os.path.isdir(path):
+                for file_path, file_stat in iter_music_files(path):
+                    found[file_path] = file_stat
+                gone.add(path)  # tracks under it that the walk didn't find again are gone
+                continue
+            try:
+                file_stat = os.stat(path)
+            except OSError:
+                gone.add(path)
+                continue
+            found[path] = file_stat
+
+        gone_folders = tuple(path + os.sep for path in gone)
+        with self.lock:
+            stale = [
+                (file_path, file_stat) for file_path, file_stat in sorted(found.items())
+                if file_path not in self.ids or not is_cache_valid(self.tracks[self.ids[file_path]], file_stat)
+            ]
+            removed = [
+                file_path for file_path in self.ids
+                if file_path not in found and (file_path in gone or file_path.startswith(gone_folders))
+            ]
+
+        changed_files = {folder_path: [] for folder_path in self.folder_paths}
+        removed_files = {folder_path: [] for folder_path in self.folder_paths}
+        for file_path, file_stat in stale:
+            folder_path = self.library_folder(file_path)
+            if folder_path is None:
+                continue
+            try:
+                file_metadata = extract_metadata(file_path, file_stat.st_mtime, file_stat.st_size)
+            except Exception as e:
+                logger.exception("An error occurred while reading a changed file: %s", e)
+                continue
+            changed_files[folder_path].append(file_metadata)
+        for file_path in removed:
+            folder_path = self.library_folder(file_path)
+            if folder_path is not None:
+                removed_files[folder_path].append(file_path)
+
+        for folder_path in self.folder_paths:
+            if changed_files[folder_path] or removed_files[folder_path]:
+                self.library_index.update_folder(folder_path, changed_files[folder_path], removed_files[folder_path])
+        return [file_metadata for files in changed_files.values() for file_metadata in files], removed
+
+    def apply_changes(self, parsed, removed):
+        """Bring music_files up to date with what parse_changes() found.
+
+        Added tracks are slotted into the kept sort orders; a removed or replaced track has
+        them built again. Returns (removed, added, moved): the paths of the tracks removed,
+        the tracks added, and moved[old index] = new index (-1 for a removed track) for the
+        rows of music_files.
+        """
+        with self.lock:
+            added = []
+            replaced = False
+            for file_metadata in parsed:
+                track_id = self.ids.get(file_metadata.path)
+                if track_id is None:
+                    added.append(file_metadata)
+                else:
+                    self.tags.remove(track_id, self.tracks[track_id])
+                    self.tags.add(track_id, file_metadata)
+                    self.tracks[track_id] = file_metadata
+                    replaced = True
+            removed = [file_path for file_path in removed if file_path in self.ids]
+
+            old_order = self.current_order()
+            new_ids = np.arange(len(self.tracks), dtype=np.int64)  # old id -> new id, -1 once removed
+            if removed:
+                new_ids[[self.ids[file_path] for file_path in removed]] = -1
+                kept = new_ids >= 0
+                new_ids[kept] = np.arange(np.count_nonzero(kept))
+                tracks = [track for track, keep in zip(self.tracks, kept.tolist()) if keep]
+                self.tracks = []
+                self.ids = {}
+                self.search_index = SearchIndex()
+                self.tags = TagIndex()
+                for file_metadata in tracks:
+                    self.add_track(file_metadata)
+            if removed or replaced:
+                self.orders = {}  # rebuilt as they're needed
+            for file_metadata in added:
+                self.add_track(file_metadata)
+                for label, order in self.orders.items():
+                    self.orders[label] = insert_sorted(order, self.tracks, len(self.tracks) - 1, SORT_KEYS[label])
+            self.show_order(self.sort_label if self.order is not None else None)
+
+            moved = new_ids[old_order]
+            survived = moved >= 0
+            moved[survived] = self.ranks[moved[survived]] if self.ranks is not None else moved[survived]
+            return removed, added, moved
+
+    def library_folder(self, file_path):
+        """The folder of the library that file_path belongs to, None if it's in none of them."""
+        for folder_path in self.folder_paths:
+            if file_path.startswith(os.path.join(folder_path, "")):
+                return folder_path
+        return None
+
+    def current_order(self):
+        return self.order if self.order is not None else np.arange(len(self.tracks), dtype=np.int64)
+
+    def show_order(self, label):
+        """Lay music_files out in the order of label, scan order for None."""
+        if label is None:
+            self.order = self.ranks = None
+            self.music_files = list(self.tracks)
+            return
+        order = self.orders.get(label)
+        if order is None:
+            key = SORT_KEYS[label]
+            keys = [key(track) for track in self.tracks]
+            order = self.orders[label] = np.array(sorted(range(len(keys)), key=keys.__getitem__), dtype=np.int64)
+        self.order = order
+        self.ranks = np.empty(len(order), dtype=np.int64)
+        self.ranks[order] = np.arange(len(order))
+        self.music_files = [self.tracks[track_id] for track_id in order.tolist()]
+        self.sort_label = label
+
+    def sort(self, label):
+        """Put music_files in the order of one of SORT_LABELS; returns moved[old index] = new index."""
+        with self.lock:
+            old_order = self.current_order()
+            self.show_order(label)
+            return self.ranks[old_order]
+
+    def search(self, query):
+        """(index, file_metadata) of every track whose name contains query, in the order of music_files."""
+        with self.lock:
+            track_ids = self.search_index.search(query)
+            if self.ranks is None:
+                indexes = track_ids
+            else:
+                indexes = np.sort(self.ranks[np.array(track_ids, dtype=np.int64)]).tolist()
+            return [(index, self.music_files[index]) for index in indexes]
+
+    def rows(self, paths):
+        """(index, file_metadata) of the tracks at paths that are in the library, in the order of music_files."""
+        with self.lock:
+            return self.rows_of_ids(sorted(self.ids[path] for path in paths if path in self.ids), in_order=True)
+
+    def rows_of_ids(self, track_ids, in_order=False):
+        """(index, file_metadata) of the tracks with these ids, as given or else in the order of music_files."""
+        with self.lock:
+            indexes = self.ranks[np.array(track_ids, dtype=np.int64)].tolist() if self.ranks is not None else list(track_ids)
+            if in_order:
+                indexes.sort()
+            return [(index, self.music_files[index]) for index in indexes]
+
+    def album_rows(self, artist, album):
+        """The rows of an album of the TagIndex, in track order."""
+        with self.lock:
+            track_ids = sorted(self.tags.album_ids(artist, album), key=lambda track_id: album_order(self.tracks[track_id]))
+            return self.rows_of_ids(track_ids)
+
+    def artist_rows(self, artist):
+        """The rows of every album of an artist, album after album in name order."""
+        with self.lock:
+            return [row for album in self.tags.album_keys(artist) for row in self.album_rows(artist, album)]
+
+    def genre_rows(self, genre):
+        with self.lock:
+            return self.rows_of_ids(self.tags.genre_ids(genre), in_order=True)
+
+    def stats(self):
+        with self.lock:
+            by_type = collections.Counter(file_metadata.type for file_metadata in self.music_files)
+            return {
+                "folders": len(self.folder_paths),
+                "tracks": len(self.music_files),
+                "by_type": dict(sorted(by_type.items())),
+                "total_duration_seconds": round(sum(file_metadata.duration_seconds for file_metadata in self.music_files), 3),
+                "total_size_bytes": sum(file_metadata.size for file_metadata in self.music_files),
+                "with_cover": sum(1 for file_metadata in self.music_files if file_metadata.album_cover),
+                "covers": len({file_metadata.album_cover for file_metadata in self.music_files if file_metadata.album_cover}),
+                "artists": len(self.tags.artists),
+                "albums": sum(len(albums) for albums in self.tags.artists.values()),
+                "genres": len(self.tags.genres),
+            }
+
+    def verify(self, folder_paths=None):
+        """Compare the index with the folders on disk.
+
+        Returns {"unindexed": [...], "stale": [...], "missing": [...]}: files the index doesn't
+        have (or whose thumbnail is gone), files that changed since they were indexed, and
+        indexed files that no longer exist.
+        """
+        problems = {"unindexed": [], "stale": [], "missing": []}
+        for folder_path in folder_paths if folder_paths is not None else self.library_index.folders():
+            cached_files = self.library_index.load_folder(folder_path)
+            for file_path, file_stat in iter_music_files(folder_path):
+                file_metadata = cached_files.pop(file_path, None)
+                if file_metadata is None:
+                    problems["unindexed"].append(file_path)
+                elif not is_cache_valid(file_metadata, file_stat):
+                    problems["stale"].append(file_path)
+            problems["missing"].extend(sorted(cached_files))
+        return problems
+
+
+def album_order(track):
+    """Tracks without a number go after the numbered ones, by name."""
+    return (track.track_number == 0, track.track_number, track.name.lower(), track.path)
+
+def insert_sorted(order, tracks, track_id, key):
+    """order with track_id slotted in where key puts it."""
+    track_key = key(tracks[track_id])
+    low, high = 0, len(order)
+    while low < high:
+        middle = (low + high) // 2
+        if key(tracks[order[middle]]) < track_key:
+            low = middle + 1
+        else:
+            high = middle
+    return np.insert(order, low, track_id)
+
+def is_cache_valid(file_metadata, file_stat):
+    return file_metadata is not None and file_metadata.date_modified == file_stat.st_mtime and file_metadata.size == file_stat.st_size
+
+def iter_music_files(folder_path):
+    """Walk folder_path and all of its subfolders, yielding (path, stat) for every music file.
+
+    The stat comes from the os.scandir entry, which on Windows needs no extra system call.
+    Folders are visited depth first in name order; links to folders are not followed,
+    the same as os.walk.
+    """
+    folders = [folder_path]
+    while folders:
+        folder = folders.pop()
+        subfolders = []
+        music_entries = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subfolders.append(entry.path)
+                        elif entry.name.lower().endswith(MUSIC_EXTENSIONS) and entry.is_file():  # add ".m4a" support
+                            music_entries.append((entry.name, entry.path, entry.stat()))
+                    except OSError:
+                        continue  # vanished or unreadable while we were looking
+        except OSError as e:
+            logger.exception("An error occurred while scanning folder: %s", e)
+            continue
+        music_entries.sort()
+        for _, file_path, file_stat in music_entries:
+            yield file_path, file_stat
+        folders.extend(sorted(subfolders, reverse=True))
+
+def scan_folder(folder_path, cached_files, workers=None, use_processes=False):
+    """Yield (file_metadata, changed) for every music file under folder_path, in walk order.
+
+    Files whose cached metadata is still valid come straight out of cached_files, which is
+    left holding only the files that have gone. The rest are parsed on a worker pool while
+    the walk carries on, so the first tracks come back long before the walk is done.
+
+    Threads suit folders on network shares where the work is mostly waiting on I/O,
+    processes suit local folders where mutagen parsing keeps a single core busy.
+    A file that can't be parsed is logged and left out; it's tried again next scan.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        executor = None
+    elif use_processes:
+        # a spawned worker imports the modules afresh, so it's told where thumbnails go
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=set_assets_dir, initargs=(all_func_thumbnails.ASSETS_DIR,))
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+    # batch the work so per-task pickling doesn't eat the gain on small files
+    files_per_task = SCAN_FILES_PER_PROCESS_TASK if use_processes else 1
+
+    pending = collections.deque()  # (batch, parsed): batch mixes cached metadata and (path, mtime, size) entries
+    batch = []
+    stale_in_batch = 0
+
+    def submit(batch):
+        entries = [item for item in batch if isinstance(item, tuple)]
+        if executor is None or not entries:
+            parsed = extract_metadata_batch(entries)
+        else:
+            parsed = executor.submit(extract_metadata_batch, entries)
+        pending.append((batch, parsed))
+
+    def ready(wait):
+        while pending:
+            batch, parsed = pending[0]
+            if isinstance(parsed, Future):
+                if not wait and not parsed.done():
+                    return
+                try:
+                    parsed = parsed.result()
+                except Exception as e:
+                    # the worker itself failed, a process killed for running out of memory say
+                    logger.exception("An error occurred while parsing music files: %s", e)
+                    parsed = [None] * sum(isinstance(item, tuple) for item in batch)
+            pending.popleft()
+            parsed = iter(parsed)
+            for item in batch:
+                if not isinstance(item, tuple):
+                    yield item, False
+                    continue
+                file_metadata = next(parsed)
+                if file_metadata is not None:
+                    yield file_metadata, True
+
+    try:
+        for file_path, file_stat in iter_music_files(folder_path):
+            file_metadata = cached_files.pop(file_path, None)
+            if is_cache_valid(file_metadata, file_stat):
+                batch.append(file_metadata)
+            else:
+                batch.append((file_path, file_stat.st_mtime, file_stat.st_size))
+                stale_in_batch += 1
+            if stale_in_batch == files_per_task or len(batch) >= SCAN_BATCH_FILES:
+                submit(batch)
+                batch = []
+                stale_in_batch = 0
+                # keep the workers busy, but don't let the walk run far ahead of them
+                yield from ready(wait=len(pending) > workers * 4)
+        if batch:
+            submit(batch)
+        yield from ready(wait=True)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+def extract_metadata_batch(entries):
+    """extract_metadata for every (path, mtime, size) entry, None for the files it fails on."""
+    parsed = []
+    for entry in entries:
+        try:
+            parsed.append(extract_metadata(*entry))
+        except Exception as e:
+            logger.exception("An error occurred while reading a music file: %s", e)
+            parsed.append(None)
+    return parsed
+
+@metrics.timed("load_music.parse_file")  # only seen from threads; scan processes keep their own metrics
+def extract_metadata(file_path, date_modified, size):
+    """Parse tags and album cover of a single file."""
+    # mutagen is only imported once a file actually needs parsing, a cached library never does
+    from mutagen import File
+    audio_file = File(file_path)
+    if audio_file is not None:
+        song_duration = audio_file.info.length
+        tags = extract_tags(audio_file)
+    else:
+        song_duration = 0
+        tags = {}
+
+    name, file_type = os.path.splitext(os.path.basename(file_path))
+    file_type = file_type.lower()
+    album_cover = None
+    if file_type == ".mp3":
+        album_cover = extract_mp3_cover(file_path)
+    elif file_type == ".opus":
+        album_cover = extract_opus_cover(file_path)
+
+    album_cover = store_thumbnail(album_cover) if album_cover else None
+    return Track(
+        file_path, name, date_modified, size, file_type, song_duration, album_cover,
+        tags.get("title", ""), tags.get("artist", ""), tags.get("album", ""), tags.get("genre", ""),
+        parse_track_number(tags.get("tracknumber", "")),
+    )
+
+def extract_tags(audio_file):
+    """First value of each of TAG_FRAMES that the file has, stripped, as {name: text}."""
+    tags = {}
+    if audio_file.tags is None:
+        return tags
+    for name, frame_id in TAG_FRAMES.items():
+        try:
+            if hasattr(audio_file.tags, "getall"):
+                frames = audio_file.tags.getall(frame_id)
+                values = frames[0].text if frames else []
+            else:
+                values = audio_file.tags.get(name, [])
+        except Exception as e:
+            logger.exception("An error occurred while reading tags: %s", e)
+            continue
+        if values and str(values[0]).strip():
+            tags[name] = str(values[0]).strip()
+    return tags
+
+def parse_track_number(text):
+    """The number in a track tag like "3" or "3/12"; 0 if there's none."""
+    number = text.split("/")[0].strip()
+    return int(number) if number.isdigit() else 0
+
+@metrics.timed("load_music.extract_cover")
+def extract_mp3_cover(file_path):
+    """Extract album cover for MP3 files."""
+    from mutagen.id3 import ID3, ID3NoHeaderError
+    try:
+        try:
+            tags = ID3(file_path)
+        except ID3NoHeaderError:
+            tags = ID3()
+        apic_tags = []
+        for tag in tags.values():
+            if tag.FrameID.startswith('APIC'):
+                apic_tags.append(tag)
+        if apic_tags:
+            return apic_tags[0].data
+    except Exception as e:
+        logger.exception("An error occurred while extracting mp3 cover: %s", e)
+    return None
+
+@metrics.timed("load_music.extract_cover")
+def extract_opus_cover(file_path):
+    """Extract album cover for OPUS files."""
+    from mutagen.oggopus import OggOpus
+    from mutagen.flac import Picture, error as FLACError
+    try:
+        file_ = OggOpus(file_path)
+        for b64_data in file_.get("METADATA_BLOCK_PICTURE", []):
+            try:
+                data = base64.b64decode(b64_data)
+                picture = Picture(data)
+                return picture.data
+            except (TypeError, ValueError, FLACError):
+                continue
+    except Exception as e:
+        logger.exception("An error occurred while extracting OPUS cover: %s", e)
+    return None
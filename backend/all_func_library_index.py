@@ -0,0 +1,326 @@
+import os
+import sqlite3
+import sys
+import threading
+from backend.all_func_thumbnails import asset_path
+from backend.logger import setup_logger
+logger = setup_logger()
+
+INDEX_PATH = "library_index.db"
+SCHEMA_VERSION = 3
+TRACK_COLUMNS = "path, name, date_modified, size, type, duration_seconds, album_cover, title, artist, album, genre, track_number"
+LOOKUP_BATCH = 500  # paths looked up together, under SQLite's limit on parameters
+
+
+class Track:
+    """One music file of the library.
+
+    Libraries run to tens of thousands of tracks, so a track is a slotted record rather
+    than a dict. Strings that many tracks share (the type, the cover thumbnail, artist,
+    album and genre) are interned, and the duration is only formatted when something
+    shows it. name comes from the file name; the tags are "" (track_number 0) when the
+    file doesn't have them.
+    """
+
+    __slots__ = (
+        "path", "name", "date_modified", "size", "type", "duration_seconds", "album_cover",
+        "title", "artist", "album", "genre", "track_number",
+    )
+
+    def __init__(self, path, name, date_modified, size, type, duration_seconds, album_cover=None,
+                 title="", artist="", album="", genre="", track_number=0):
+        self.path = path
+        self.name = name
+        self.date_modified = date_modified
+        self.size = size
+        self.type = sys.intern(type)
+        self.duration_seconds = duration_seconds
+        self.album_cover = sys.intern(album_cover) if album_cover is not None else None
+        self.title = title
+        self.artist = sys.intern(artist)
+        self.album = sys.intern(album)
+        self.genre = sys.intern(genre)
+        self.track_number = track_number
+
+    @property
+    def duration(self):
+        return format_duration(self.duration_seconds)
+
+    def __reduce__(self):
+        # rebuilt through __init__, so tracks parsed on a worker process are interned again
+        return Track, (
+            self.path, self.name, self.date_modified, self.size, self.type, self.duration_seconds, self.album_cover,
+            self.title, self.artist, self.album, self.genre, self.track_number,
+        )
+
+    def __repr__(self):
+        return f"Track({self.path!r})"
+
+
+class LibraryIndex:
+    """On-disk metadata cache so unchanged files are never parsed twice."""
+
+    def __init__(self, db_path=INDEX_PATH):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self.lock, self.connection:
+            if self.connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                # the cache can always be rebuilt from the files, so an old layout is just dropped
+                self.connection.execute("DROP TABLE IF EXISTS tracks")
+                self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS tracks (
+                    path TEXT PRIMARY KEY,
+                    folder TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    date_modified REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    type TEXT NOT NULL,
+                    duration_seconds REAL NOT NULL,
+                    album_cover TEXT,
+                    title TEXT NOT NULL,
+                    artist TEXT NOT NULL,
+                    album TEXT NOT NULL,
+                    genre TEXT NOT NULL,
+                    track_number INTEGER NOT NULL
+                )"""
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS tracks_folder ON tracks (folder)")
+            # loudness is keyed by content, so a renamed or moved file doesn't have to be measured again
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS fingerprints (
+                    path TEXT PRIMARY KEY,
+                    date_modified REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    fingerprint TEXT NOT NULL
+                )"""
+            )
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS waveforms (
+                    path TEXT PRIMARY KEY,
+                    date_modified REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    slot INTEGER NOT NULL
+                )"""
+            )
+            # an empty fingerprint marks a track that was too quiet or too short to take one of
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS spectral_fingerprints (
+                    path TEXT PRIMARY KEY,
+                    date_modified REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    fingerprint BLOB NOT NULL
+                )"""
+            )
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS loudness (
+                    fingerprint TEXT PRIMARY KEY,
+                    loudness REAL NOT NULL,
+                    peak REAL NOT NULL
+                )"""
+            )
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS seek_indexes (
+                    path TEXT PRIMARY KEY,
+                    date_modified REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    sample_rate INTEGER NOT NULL,
+                    total_samples INTEGER NOT NULL,
+                    data_offset INTEGER NOT NULL,
+                    block_align INTEGER NOT NULL,
+                    step_samples INTEGER NOT NULL,
+                    offsets BLOB,
+                    samples BLOB
+                )"""
+            )
+
+    def load_folder(self, folder_path):
+        """Return the cached tracks of a folder as {path: Track}."""
+        try:
+            with self.lock:
+                rows = self.connection.execute(
+                    f"SELECT {TRACK_COLUMNS} FROM tracks WHERE folder = ?", (os.path.abspath(folder_path),),
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.exception("An error occurred while reading the library index: %s", e)
+            return {}
+        return tracks_from_rows(rows)
+
+    def load_tracks(self, paths):
+        """Return the cached tracks of any folder at paths as {path: Track}; paths not in the index are left out."""
+        paths = list(paths)
+        rows = []
+        try:
+            with self.lock:
+                for start in range(0, len(paths), LOOKUP_BATCH):
+                    batch = paths[start:start + LOOKUP_BATCH]
+                    rows += self.connection.execute(
+                        f"SELECT {TRACK_COLUMNS} FROM tracks WHERE path IN ({', '.join('?' * len(batch))})", batch,
+                    ).fetchall()
+        except sqlite3.Error as e:
+            logger.exception("An error occurred while reading the library index: %s", e)
+            return {}
+        return tracks_from_rows(rows)
+
+    def folders(self):
+        """Every folder the index holds tracks of."""
+        try:
+            with self.lock:
+                rows = self.connection.execute("SELECT DISTINCT folder FROM tracks ORDER BY folder").fetchall()
+        except sqlite3.Error as e:
+            logger.exception("An error occurred while reading the library index: %s", e)
+            return []
+        return [folder for folder, in rows]
+
+    def update_folder(self, folder_path, changed, removed):
+        """Store new/changed file metadata and forget deleted files in one transaction."""
+        folder = os.path.abspath(folder_path)
+        try:
+            with self.lock, self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            file_metadata.path,
+                            folder,
+                            file_metadata.name,
+                            file_metadata.date_modified,
+                            file_metadata.size,
+                            file_metadata.type,
+                            file_metadata.duration_seconds,
+                            file_metadata.album_cover,
+                            file_metadata.title,
+                            file_metadata.artist,
+                            file_metadata.album,
+                            file_metadata.genre,
+                            file_metadata.track_number,
+                        )
+                        for file_metadata in changed
+                    ],
+                )
+                self.connection.executemany("DELETE FROM tracks WHERE path = ?", [(path,) for path in removed])
+        except sqlite3.Error as e:
+            logger.exception("An error occurred while writing the library index: %s", e)
+
+    def load_loudness(self):
+        """Return ({path: (date_modified, size, fingerprint)}, {fingerprint: (loudness, peak)})."""
+        try:
+            with self.lock:
+                fingerprints = self.connection.execute("SELECT path, date_modified, size, fingerprint FROM fingerprints").fetchall()
+                measurements = self.connection.execute("SELECT fingerprint, loudness, peak FROM loudness").fetchall()
+        except sqlite3.Error as e:
+            logger.exception("An error occurred while reading the library index: %s", e)
+            return {}, {}
+        return (
+            {path: (date_modified, size, fingerprint) for path, date_modified, size, fingerprint in fingerprints},
+            {fingerprint: (loudness, peak) for fingerprint, loudness, peak in measurements},
+        )
+
+    def store_loudness(self, fingerprints, measurements):
+        """Store (path, date_modified, size, fingerprint) rows and (fingerprint, loudness, peak) rows."""
+        try:
+            with self.lock, self.connection:
+                self.connection.executemany("INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?)", fingerprints)
+                self.connection.executemany("INSERT OR REPLACE INTO loudness VALUES (?, ?, ?)", measurements)
+        except sqlite3.Error as e:
+            logger.exception("An error occurred while writing the library index: %s", e)
+
+    def load_waveform_slots(self):
+        """Return {path: (date_modified, size, slot)} for every stored waveform."""
+        try:
+            with self.lock:
+                rows = self.connection.execute("SELECT path, date_modified, size, slot FROM waveforms").fetchall()
+        except sqlite3.Error as e:
+            logger.exception("An error occurred while reading the library index: %s", e)
+            return {}
+        return {path: (date_modified, size, slot) for path, date_modified, size, slot in rows}
+
+    def store_waveform_slot(self, path, date_modified, size, slot):
+        try:
+            with self.lock, self.connection:
+                self.connection.execute("INSERT OR REPLACE INTO waveforms VALUES (?, ?, ?, ?)", (path, date_modified, size, slot))
+        except sqlite3.Error as e:
+            logger.exception("An error occurred while writing the library index: %s", e)
+
+    def prune_waveform_slots(self, slot_count):
+        """Forget the waveforms of files the index no longer holds, and any slot past the slot_count records there are."""
+        try:
+            with self.lock, self.connection:
+                self.connection.execute("DELETE FROM waveforms WHERE slot >= ? OR path NOT IN (SELECT path FROM tracks)", (slot_count,))
+        except sqlite3.Error as e:
+            logger.exception("An error occurred while writing the library index: %s", e)
+
+    def move_waveform_slots(self, moves):
+        """Point waveforms at new slots, from (slot, path) rows, in one transaction."""
+        try:
+            with self.lock, self.connection:
+                self.connection.executemany("UPDATE waveforms SET slot = ? WHERE path = ?", moves)
+        except sqlite3.Error as e:
+            logger.exception("An error occurred while writing the library index: %s", e)
+            return False
+        return True
+
+    def load_spectral_fingerprints(self):
+        """Return {path: (date_modified, size, fingerprint)} for every fingerprinted track."""
+        try:
+            with self.lock:
+                rows = self.connection.execute("SELECT path, date_modified, size, fingerprint FROM spectral_fingerprints").fetchall()
+        except sqlite3.Error as e:
+            logger.exception("An error occurred while reading the library index: %s", e)
+            return {}
+        return {path: (date_modified, size, fingerprint) for path, date_modified, size, fingerprint in rows}
+
+    def store_spectral_fingerprints(self, rows):
+        """Store (path, date_modified, size, fingerprint) rows."""
+        try:
+            with self.lock, self.connection:
+                self.connection.executemany("INSERT OR REPLACE INTO spectral_fingerprints VALUES (?, ?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            logger.exception("An error occurred while writing the library index: %s", e)
+
+    def load_seek_index(self, path, date_modified, size):
+        """Return the stored seek index row of a file, or None if it's missing or the file has changed."""
+        try:
+            with self.lock:
+                row = self.connection.execute(
+                    "SELECT sample_rate, total_samples, data_offset, block_align, step_samples, offsets, samples "
+                    "FROM seek_indexes WHERE path = ? AND date_modified = ? AND size = ?",
+                    (path, date_modified, size),
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.exception("An error occurred while reading the library index: %s", e)
+            return None
+        return row
+
+    def store_seek_index(self, path, date_modified, size, row):
+        try:
+            with self.lock, self.connection:
+                self.connection.execute("INSERT OR REPLACE INTO seek_indexes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (path, date_modified, size, *row))
+        except sqlite3.Error as e:
+            logger.exception("An error occurred while writing the library index: %s", e)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def tracks_from_rows(rows):
+    """Tracks from rows of TRACK_COLUMNS as {path: Track}, leaving out any whose cover thumbnail is gone."""
+    cached = {}
+    existing_covers = {}
+    for path, name, date_modified, size, file_type, duration_seconds, album_cover, *tags in rows:
+        if album_cover is not None:
+            if album_cover not in existing_covers:
+                existing_covers[album_cover] = os.path.exists(asset_path(album_cover))
+            if not existing_covers[album_cover]:
+                # thumbnail cache was cleared, treat the file as new so its cover is rebuilt
+                continue
+        cached[path] = Track(path, name, date_modified, size, file_type, duration_seconds, album_cover, *tags)
+    return cached
+
+
+def format_duration(song_duration):
+    minutes = int(song_duration // 60)
+    seconds = int(song_duration % 60)
+    return f"{minutes:02}:{seconds:02}"
@@ -0,0 +1,196 @@
+import hashlib
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from backend.all_func_decoding import decode_audio
+from backend.logger import setup_logger
+logger = setup_logger()
+
+TARGET_LOUDNESS = -18.0  # LUFS, the ReplayGain 2 reference level
+ABSOLUTE_GATE = -70.0  # LUFS
+RELATIVE_GATE = -10.0  # LU below the loudness of the blocks that passed the absolute gate
+STEPS_PER_BLOCK = 4  # 400 ms blocks that overlap by 75%, measured in 100 ms steps
+FINGERPRINT_BYTES = 64 * 1024  # read from the start and from the end of a file
+STORE_BATCH = 32  # measurements written to the index together
+
+
+def k_weighting(sample_rate):
+    """The BS.1770 K-weighting filter (high shelf, then high-pass) as an sos array for any sample rate."""
+    # high shelf of about +4 dB above 1.5 kHz, for the acoustic effect of the head
+    gain_db, q, centre = 3.999843853973347, 0.7071752369554196, 1681.974450955533
+    k = math.tan(math.pi * centre / sample_rate)
+    high_gain = 10 ** (gain_db / 20)
+    band_gain = high_gain ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = [
+        (high_gain + band_gain * k / q + k * k) / a0, 2 * (k * k - high_gain) / a0, (high_gain - band_gain * k / q + k * k) / a0,
+        1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0,
+    ]
+    # RLB high-pass around 38 Hz
+    q, centre = 0.5003270373238773, 38.13547087602444
+    k = math.tan(math.pi * centre / sample_rate)
+    a0 = 1 + k / q + k * k
+    high_pass = [1.0, -2.0, 1.0, 1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    return np.array([shelf, high_pass])
+
+
+def measure_loudness(samples, sample_rate):
+    """Integrated loudness (LUFS, gated as in EBU R128) and sample peak of a (frames, channels) block."""
+    from scipy.signal import sosfilt
+
+    peak = float(np.abs(samples).max()) if len(samples) else 0.0
+    step = sample_rate // 10
+    steps = len(samples) // step
+    if steps < STEPS_PER_BLOCK:
+        return ABSOLUTE_GATE, peak
+
+    weighted = sosfilt(k_weighting(sample_rate), samples[:steps * step], axis=0)
+    # energy of every 100 ms step, summed over the channels (all weighted 1.0 for mono and stereo)
+    step_energy = np.square(weighted).reshape(steps, step, -1).sum(axis=(1, 2), dtype=np.float64)
+    cumulative = np.concatenate([[0.0], np.cumsum(step_energy)])
+    block_power = (cumulative[STEPS_PER_BLOCK:] - cumulative[:-STEPS_PER_BLOCK]) / (STEPS_PER_BLOCK * step)
+
+    with np.errstate(divide="ignore"):
+        block_loudness = -0.691 + 10 * np.log10(block_power)
+    gated = block_power[block_loudness > ABSOLUTE_GATE]
+    if not len(gated):
+        return ABSOLUTE_GATE, peak
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE
+    gated = block_power[(block_loudness > ABSOLUTE_GATE) & (block_loudness > relative_gate)]
+    return float(-0.691 + 10 * np.log10(gated.mean())), peak
+
+
+def analyze_file(file_path):
+    """Decode a file and measure it; returns (loudness, peak), or None if it can't be decoded."""
+    try:
+        samples, sample_rate = decode_audio(file_path)
+        return measure_loudness(samples, sample_rate)
+    except Exception as e:
+        logger.exception("An error occurred while measuring loudness: %s", e)
+        return None
+
+
+def track_gain(loudness, peak):
+    """Linear gain that brings a track to the reference level without clipping its peak."""
+    if loudness <= ABSOLUTE_GATE:
+        return 1.0  # silence, there's nothing to bring up
+    gain_db = TARGET_LOUDNESS - loudness
+    if peak > 0:
+        gain_db = min(gain_db, -20 * math.log10(peak))
+    return 10 ** (gain_db / 20)
+
+
+def file_fingerprint(file_path, size):
+    """Hash of the size and the first and last bytes of a file, cheap enough to take for a whole library."""
+    digest = hashlib.sha1(str(size).encode())
+    with open(file_path, "rb") as audio_file:
+        digest.update(audio_file.read(FINGERPRINT_BYTES))
+        if size > 2 * FINGERPRINT_BYTES:
+            audio_file.seek(-FINGERPRINT_BYTES, os.SEEK_END)
+            digest.update(audio_file.read(FINGERPRINT_BYTES))
+    return digest.hexdigest()
+
+
+def lower_priority():
+    if hasattr(os, "nice"):
+        os.nice(10)  # analysis must never get in the way of playback
+
+
+class LoudnessAnalyzer:
+    """Measures the loudness of the library in the background and hands out per-track gains.
+
+    Measurements are cached in the library index by file fingerprint. Files that aren't
+    cached yet are decoded and measured on a pool of low-priority worker processes;
+    on_result(path) is called whenever one of them is done.
+    """
+
+    def __init__(self, library_index, on_result=None):
+        self.library_index = library_index
+        self.on_result = on_result
+        self.results = {}  # path -> (loudness, peak)
+        self.lock = threading.Lock()
+        self.generation = 0
+
+    def gain_for(self, file_path):
+        """Normalization gain for a track, 1.0 while it hasn't been measured."""
+        result = self.results.get(file_path)
+        return track_gain(*result) if result is not None else 1.0
+
+    def analyze(self, music_files, workers=None):
+        """Measure every track of music_files that isn't cached yet; a newer call replaces a running one."""
+        entries = [(file.path, file.date_modified, file.size) for file in music_files]
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+        threading.Thread(target=self.run, args=(entries, workers, generation), daemon=True).start()
+
+    def cancel(self):
+        with self.lock:
+            self.generation += 1
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def run(self, entries, workers, generation):
+        try:
+            known_files, measurements = self.library_index.load_loudness()
+            to_measure = []
+            new_fingerprints = []
+            for file_path, date_modified, size in entries:
+                known = known_files.get(file_path)
+                if known is not None and known[:2] == (date_modified, size) and known[2] in measurements:
+                    self.results[file_path] = measurements[known[2]]
+                    continue
+                if not self.is_current(generation):
+                    return
+                try:
+                    fingerprint = file_fingerprint(file_path, size)
+                except OSError:
+                    continue
+                if fingerprint in measurements:
+                    # renamed, moved or copied: same content, same loudness
+                    self.results[file_path] = measurements[fingerprint]
+                    new_fingerprints.append((file_path, date_modified, size, fingerprint))
+                else:
+                    to_measure.append((file_path, date_modified, size, fingerprint))
+            if new_fingerprints:
+                self.library_index.store_loudness(new_fingerprints, [])
+            if to_measure:
+                self.measure(to_measure, workers, generation)
+        except Exception as e:
+            logger.exception("An error occurred while analyzing loudness: %s", e)
+
+    def measure(self, to_measure, workers, generation):
+        if workers is None:
+            workers = max(1, (os.cpu_count() or 2) - 1)  # leave a core for the UI and the mixer
+        pending_fingerprints, pending_measurements = [], []
+        with ProcessPoolExecutor(max_workers=workers, initializer=lower_priority) as executor:
+            remaining = iter(to_measure)
+            running = {}
+            while True:
+                # keep a couple of files per worker queued, so a cancel doesn't wait on a long backlog
+                while len(running) < workers * 2 and self.is_current(generation):
+                    entry = next(remaining, None)
+                    if entry is None:
+                        break
+                    running[executor.submit(analyze_file, entry[0])] = entry
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path, date_modified, size, fingerprint = running.pop(future)
+                    result = future.result()
+                    if result is None:
+                        continue
+                    self.results[file_path] = result
+                    pending_fingerprints.append((file_path, date_modified, size, fingerprint))
+                    pending_measurements.append((fingerprint, *result))
+                    if self.on_result is not None and self.is_current(generation):
+                        self.on_result(file_path)
+                if len(pending_measurements) >= STORE_BATCH:
+                    self.library_index.store_loudness(pending_fingerprints, pending_measurements)
+                    pending_fingerprints, pending_measurements = [], []
+        if pending_measurements:
+            self.library_index.store_loudness(pending_fingerprints, pending_measurements)
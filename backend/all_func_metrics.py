@@ -0,0 +1,192 @@
+import atexit
+import functools
+import json
+import math
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_ENV = "MUSIC_PLAYER_METRICS"  # set to 1 to collect metrics
+METRICS_FILE_ENV = "MUSIC_PLAYER_METRICS_FILE"  # write them to this JSON file at exit
+METRICS_PORT_ENV = "MUSIC_PLAYER_METRICS_PORT"  # serve them as JSON on http://127.0.0.1:<port>/
+HISTOGRAM_BUCKETS = 40  # bucket b counts durations under 2**b microseconds
+
+
+class Histogram:
+    """Distribution of durations in power-of-two buckets, constant size however much it sees."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        self.buckets[min(int(seconds * 1e6).bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+
+    def percentile(self, fraction):
+        """Upper bound, in ms, of the bucket the given fraction of the durations falls in."""
+        wanted = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= wanted:
+                return min(2 ** bucket / 1000, self.max * 1000)
+        return self.max * 1000
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.count, 3) if self.count else None,
+            "min_ms": round(self.min * 1000, 3) if self.count else None,
+            "max_ms": round(self.max * 1000, 3),
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p90_ms": round(self.percentile(0.9), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+        }
+
+
+class Span:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.started)
+
+
+class NullSpan:
+    """What span() hands out while metrics are off: entering and leaving it does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+
+NULL_SPAN = NullSpan()
+
+
+class Metrics:
+    """Counters and timing histograms, kept in memory and exported on demand.
+
+    Switched on with MUSIC_PLAYER_METRICS. While it's off, span() returns a shared no-op
+    and timed() leaves the function it decorates untouched, so the instrumented code
+    pays next to nothing.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+        self.server = None
+
+    def span(self, name):
+        """Context manager that adds the time spent inside it to the histogram name."""
+        return Span(self, name) if self.enabled else NULL_SPAN
+
+    def timed(self, name):
+        """Decorator version of span(); decided once, when the function is defined."""
+        def decorate(function):
+            if not self.enabled:
+                return function
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with Span(self, name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "uptime_s": round(time.time() - self.started, 3),
+                "counters": dict(sorted(self.counters.items())),
+                "histograms": {name: histogram.as_dict() for name, histogram in sorted(self.histograms.items())},
+            }
+
+    def write_json(self, path):
+        with open(path, "w") as json_file:
+            json.dump(self.snapshot(), json_file, indent=2)
+
+    def serve(self, port):
+        """Serve the snapshot as JSON on 127.0.0.1:port from a background thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(metrics.snapshot()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
+
+    def start_exports(self):
+        """Start the exports asked for in the environment."""
+        if not self.enabled:
+            return
+        if os.environ.get(METRICS_PORT_ENV) and self.server is None:
+            self.serve(int(os.environ[METRICS_PORT_ENV]))
+        if os.environ.get(METRICS_FILE_ENV):
+            atexit.register(self.write_json, os.environ[METRICS_FILE_ENV])
+
+    def instrument_page(self, page):
+        """Time every page.update(), named after the player code that called it."""
+        if not self.enabled:
+            return
+        update = page.update
+
+        def timed_update(*controls):
+            # Control.update() goes through page.update() too; name the caller outside flet
+            frame = sys._getframe(1)
+            while frame is not None and f"{os.sep}flet{os.sep}" in frame.f_code.co_filename:
+                frame = frame.f_back
+            caller = frame.f_code.co_name if frame is not None else "?"
+            with Span(self, f"page.update:{caller}"):
+                return update(*controls)
+
+        page.update = timed_update
+
+
+metrics = Metrics(enabled=bool(os.environ.get(METRICS_ENV)))
@@ -0,0 +1,252 @@
+import atexit
+import collections
+import os
+import random
+from backend.all_func_config import ConfigStore
+from backend.logger import setup_logger
+logger = setup_logger()
+
+QUEUE_PATH = "play_queue.json"
+PLAYED_PATH = "shuffle_played.txt"
+HISTORY_LENGTH = 200  # tracks "previous" can go back through
+
+
+class ShuffleBag:
+    """Every track once, in random order, before any track comes round again.
+
+    items is split in two: items[:remaining] can still be drawn this round, the rest
+    already have been. Drawing swaps a random pick to the end of the first part, so
+    draws, adds and removes are all constant-time; a new round just resets remaining.
+    """
+
+    def __init__(self):
+        self.items = []
+        self.positions = {}  # path -> index in items
+        self.remaining = 0
+
+    def reset(self, paths, drawn=()):
+        self.items = list(paths)
+        self.positions = {path: index for index, path in enumerate(self.items)}
+        self.remaining = len(self.items)
+        for path in drawn:
+            self.mark_drawn(path)
+
+    def swap(self, first, second):
+        items = self.items
+        items[first], items[second] = items[second], items[first]
+        self.positions[items[first]] = first
+        self.positions[items[second]] = second
+
+    def draw(self, avoid=None):
+        """A random track not drawn this round yet, never avoid unless it's the only track."""
+        if not self.items:
+            return None
+        if self.remaining == 0:
+            self.remaining = len(self.items)  # a new round
+        pick = random.randrange(self.remaining)
+        if self.items[pick] == avoid and self.remaining > 1:
+            # the last track of a round may not open the next one
+            self.swap(pick, self.remaining - 1)
+            pick = random.randrange(self.remaining - 1)
+        self.remaining -= 1
+        self.swap(pick, self.remaining)
+        return self.items[self.remaining]
+
+    def mark_drawn(self, path):
+        position = self.positions.get(path)
+        if position is not None and position < self.remaining:
+            self.remaining -= 1
+            self.swap(position, self.remaining)
+
+    def put_back(self, path):
+        """Make a drawn track drawable again this round."""
+        position = self.positions.get(path)
+        if position is not None and position >= self.remaining:
+            self.swap(position, self.remaining)
+            self.remaining += 1
+
+    def add(self, path):
+        if path in self.positions:
+            return
+        self.positions[path] = len(self.items)
+        self.items.append(path)
+        self.put_back(path)
+
+    def remove(self, path):
+        position = self.positions.get(path)
+        if position is None:
+            return
+        if position < self.remaining:
+            # move it to the drawn part first, so both parts stay contiguous
+            self.remaining -= 1
+            self.swap(position, self.remaining)
+            position = self.remaining
+        self.swap(position, len(self.items) - 1)
+        self.items.pop()
+        del self.positions[path]
+
+    def drawn(self):
+        return self.items[self.remaining:]
+
+
+class PlayedLog:
+    """The tracks played this round of the shuffle, one path per line.
+
+    A track that starts is appended as a line, so the round isn't written out again on
+    every track; the file is only written over when the library or the round starts over,
+    or when repeats have made it much longer than the round.
+    """
+
+    def __init__(self, path=PLAYED_PATH):
+        self.path = path
+        self.lines = 0  # in the file, repeats included
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as played_file:
+                paths = [line.rstrip("\n") for line in played_file if line.strip()]
+            self.lines = len(paths)
+            return paths
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logger.exception("An error occurred while loading the shuffle state: %s", e)
+            return []
+
+    def append(self, path):
+        try:
+            with open(self.path, "a", encoding="utf-8") as played_file:
+                played_file.write(path + "\n")
+            self.lines += 1
+        except Exception as e:
+            logger.exception("An error occurred while saving the shuffle state: %s", e)
+
+    def rewrite(self, paths):
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as played_file:
+                played_file.writelines(path + "\n" for path in paths)
+            os.replace(temp_path, self.path)
+            self.lines = len(paths)
+        except Exception as e:
+            logger.exception("An error occurred while saving the shuffle state: %s", e)
+
+
+class PlayQueue:
+    """What plays after the current track, and what played before it.
+
+    Tracks are kept by path, so sorting or rescanning the library doesn't move them.
+    up_next holds the tracks the user queued and goes first in every loop mode;
+    after it, Random Song draws from a shuffle bag. The queue and history are written to
+    their own file in the background, not to config.json; what the bag has drawn this
+    round, which can be the whole library, goes to a PlayedLog a track at a time.
+    """
+
+    def __init__(self, store=None, played_log=None):
+        self.store = store if store is not None else queue_store
+        self.played_log = played_log if played_log is not None else PlayedLog()
+        self.up_next = collections.deque(self.store.get("up_next", []))
+        self.history = collections.deque(self.store.get("history", []), maxlen=HISTORY_LENGTH)
+        self.drawn_elsewhere = self.played_log.load()  # played this round, not in the bag yet
+        if self.store.get("shuffle_played"):
+            # kept in the queue file by earlier versions
+            self.drawn_elsewhere += self.store.get("shuffle_played")
+            self.store.update(shuffle_played=None)
+        self.shuffle = ShuffleBag()
+        self.pending = None  # the upcoming track while it hasn't started, and whether it came from the bag
+
+    def set_library(self, paths):
+        """Start over on a newly scanned library, keeping what still exists of the queue and history."""
+        self.shuffle.reset(paths, self.shuffle.drawn() + self.drawn_elsewhere)
+        self.drawn_elsewhere = []
+        self.played_log.rewrite(self.shuffle.drawn())
+        known = self.shuffle.positions
+        self.up_next = collections.deque(path for path in self.up_next if path in known)
+        self.history = collections.deque((path for path in self.history if path in known), maxlen=HISTORY_LENGTH)
+        self.pending = None
+        self.save()
+
+    def track_added(self, path):
+        self.shuffle.add(path)
+
+    def track_removed(self, path):
+        self.shuffle.remove(path)
+        if path in self.up_next:
+            self.up_next.remove(path)
+        if self.pending is not None and self.pending[0] == path:
+            self.pending = None
+
+    def enqueue(self, path):
+        self.up_next.append(path)
+        self.release()
+        self.save()
+
+    def play_next(self, paths):
+        """Queue paths ahead of whatever was queued already, in the order given."""
+        self.up_next.extendleft(reversed(list(paths)))
+        self.release()
+        self.save()
+
+    def upcoming(self, shuffle, current_path):
+        """The queued or shuffled track that plays next, None to leave it to the loop mode.
+
+        The answer stays the same until a track starts or release() is called.
+        """
+        if self.pending is None:
+            if self.up_next:
+                self.pending = (self.up_next[0], False)
+            elif shuffle:
+                new_round = self.shuffle.remaining == 0
+                path = self.shuffle.draw(avoid=current_path)
+                if path is None:
+                    return None
+                if new_round:
+                    self.played_log.rewrite([])
+                self.pending = (path, True)
+            else:
+                return None
+        return self.pending[0]
+
+    def release(self):
+        """Forget the upcoming track, so the next upcoming() picks again."""
+        if self.pending is not None and self.pending[1]:
+            self.shuffle.put_back(self.pending[0])
+        self.pending = None
+
+    def started(self, path, shuffle=False):
+        """Record that path started playing, however it was picked; shuffle while Random Song is on."""
+        if self.up_next and self.up_next[0] == path:
+            self.up_next.popleft()
+        if self.pending is not None and self.pending[0] != path:
+            self.release()
+        self.pending = None
+        # a track picked by hand counts for this round too
+        if path in self.shuffle.positions:
+            self.shuffle.mark_drawn(path)
+        else:
+            self.drawn_elsewhere.append(path)  # played while the library was still being scanned
+        if shuffle:
+            self.played_log.append(path)
+            if self.played_log.lines > 2 * max(len(self.shuffle.items), 1):
+                self.played_log.rewrite(self.shuffle.drawn() + self.drawn_elsewhere)
+        if not self.history or self.history[-1] != path:
+            self.history.append(path)
+        self.save()
+
+    def previous(self, current_path):
+        """Take the track that played before current_path off the history, None if there's none."""
+        while self.history:
+            path = self.history.pop()
+            if path != current_path:
+                return path
+        return None
+
+    def has_previous(self, current_path):
+        return len(self.history) > 1 or bool(self.history) and self.history[-1] != current_path
+
+    def save(self):
+        self.store.update(up_next=list(self.up_next), history=list(self.history))
+
+
+queue_store = ConfigStore(QUEUE_PATH, defaults={})
+atexit.register(queue_store.flush)
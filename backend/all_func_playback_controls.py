@@ -1,26 +1,54 @@
-import json
 import time
 import pygame
-import random
 import flet as ft
 import threading
-from backend.all_func_file_handling import load_config
+from backend.all_func_config import config_store
+from backend.all_func_equalizer import EqualizerStream
+from backend.all_func_library_index import format_duration
+from backend.all_func_metrics import metrics
+from backend.all_func_play_queue import PlayQueue
+from backend.all_func_seek_index import SeekIndex, build_seek_index
 from backend.logger import setup_logger
 logger = setup_logger()
 
+PROGRESS_STEPS = 500  # slider positions per song, finer moves aren't visible
+MIN_PROGRESS_STEP_SECONDS = 0.25
+SONG_END_RECHECK_SECONDS = 0.05
+PRELOAD_AHEAD_SECONDS = 10  # queue the upcoming track this long before the current one ends
+AUDIBLE_TIMEOUT_SECONDS = 5.0
+
 class PlaybackControls:
     def __init__(self, music_player):
         self.music_player = music_player
-        self.seek_target_position = None  # Target seek position
-        self.seek_start_time = None       # Timestamp when seek started
+        # position = get_pos() / 1000 + position_offset; a seek moves the offset, not a wall clock
+        self.position_offset = 0.0
+        self.seek_index = None  # of the current track
         self.seek_lock = threading.Lock() # Thread safety for seek operations
         self.is_playing = False
         self.duration = 0
         self.current_index = -1
+        self.playing_path = None  # the track loaded for playback, kept once it's no longer in music_files
         self.first_time=True
         self.loop_mode = 0  # 0: No Loop, 1: Loop Song, 2: Next Song, 3: Random Song
+        self.progress_event = threading.Event()  # set whenever play, pause or seek changes the timeline
+        self.end_timer = None
+        self.preload_timer = None
+        self.playback_generation = 0
+        self.queued_index = None  # track handed to self.output.queue, if any
+        self.queue_switched = False  # the mixer has moved on to the queued track
+        self.queue_cancelled = False  # the queued track is no longer wanted; it's stopped when it starts
+        self.play_queue = PlayQueue()
+        self.track_positions = {}  # path -> index in music_files, checked on every use
+        self.queue_lock = threading.Lock()
+        self.last_mixer_pos = 0
+        # pygame.mixer.music, or the equalizer's stream while the equalizer is not flat
+        self.equalizer_stream = EqualizerStream(music_player.volume_control.equalizer)
+        self.output = pygame.mixer.music  # MusicPlayer.init_audio picks the right one once the mixer is up
 
+    @metrics.timed("play_music")
     def play_music(self, index):
+        play_requested = time.perf_counter()
+        self.music_player.audio_ready.wait()
         if self.first_time==True:
             self.first_time=False
         try:
@@ -34,33 +62,22 @@ class PlaybackControls:
 
             file_metadata = self.music_player.music_files[index]
 
-            pygame.mixer.music.stop()
+            self.output.stop()
             
             try:
-                pygame.mixer.music.load(file_metadata["path"])
+                self.output.load(file_metadata.path)
             except Exception as e:
                 logger.exception("An error occurred while loading file: %s", e)
                 return
             
-            config = load_config() 
-            config["current_music"] = index
-            with open("config.json", "w") as json_file:
-                json.dump(config, json_file)
-
-            self.seek_target_position = None
-            self._song_ended = False
-            self.music_player.progress.value = 0
-            self.music_player.progress.max = file_metadata["duration_seconds"]
-            self.music_player.progress.update()
-            self.current_index = index
-            self.is_playing = True
-            self.duration = file_metadata["duration_seconds"]
-            self.music_player.current_song.value = f"[{index+1}/{len(self.music_player.music_files)}] - {file_metadata['name']}"
-            self.music_player.song_duration.value = file_metadata["duration"]
-            self.music_player.play_button.icon = ft.Icons.PAUSE_CIRCLE_OUTLINE_ROUNDED
-            
-            pygame.mixer.music.play()
+            self.set_current_track(index)
+            self.last_mixer_pos = 0
+            self.position_offset = 0.0
+            self.output.play()
             self.music_player.page.update()
+            self.schedule_progress()
+            if metrics.enabled:
+                threading.Thread(target=self.measure_audible, args=(play_requested, self.playback_generation), daemon=True).start()
 
         except Exception as e:
             print(f"Error in play_music: {e}")
@@ -78,87 +95,255 @@ class PlaybackControls:
             self.play_music(index+1)
             logger.exception("An error occurred: %s", e)
 
+    def measure_audible(self, play_requested, generation):
+        """Record how long play_music took to get sound out: until the mixer's position first moves."""
+        deadline = play_requested + AUDIBLE_TIMEOUT_SECONDS
+        while time.perf_counter() < deadline and generation == self.playback_generation:
+            if self.output.get_pos() > 0:
+                metrics.observe("play_music.load_to_audible", time.perf_counter() - play_requested)
+                return
+            time.sleep(0.001)
+
+    def set_current_track(self, index):
+        """Point the state and the now-playing display at music_files[index]."""
+        file_metadata = self.music_player.music_files[index]
+        config_store.update(current_music=index)
+        self.play_queue.started(file_metadata.path, shuffle=self.loop_mode == 3)
+        self.apply_track_gain(file_metadata.path)
+        self.music_player.show_waveform(index)
+
+        self.position_offset = 0.0  # a queued track starts with get_pos() back at 0
+        self.queued_index = None
+        self.queue_switched = False
+        self.queue_cancelled = False
+        self.music_player.progress.value = 0
+        self.current_index = index
+        self.playing_path = file_metadata.path
+        self.is_playing = True
+        self.load_seek_index(file_metadata)
+        self.music_player.current_song.value = f"[{index+1}/{len(self.music_player.music_files)}] - {file_metadata.name}"
+        self.music_player.play_button.icon = ft.Icons.PAUSE_CIRCLE_OUTLINE_ROUNDED
+        self.music_player.back_button.disabled = index <= 0 and not self.play_queue.has_previous(file_metadata.path)
+        self.music_player.next_button.disabled = index >= len(self.music_player.music_files) - 1 and not self.play_queue.up_next
+
+    def current_path(self):
+        """The current track's path, the playing one's while music_files doesn't have it."""
+        if 0 <= self.current_index < len(self.music_player.music_files):
+            return self.music_player.music_files[self.current_index].path
+        return self.playing_path
+
+    def index_of(self, path):
+        """Index of a track in music_files, None if it's no longer there."""
+        music_files = self.music_player.music_files
+        index = self.track_positions.get(path)
+        if index is None or index >= len(music_files) or music_files[index].path != path:
+            # the list was sorted, rescanned or changed since the positions were taken
+            self.track_positions = {file_metadata.path: index for index, file_metadata in enumerate(music_files)}
+            index = self.track_positions.get(path)
+        return index
+
+    def load_seek_index(self, file_metadata):
+        """Attach the seek index of the track that's starting, from the library index if it's there.
+
+        A track played for the first time has its index built in the background; until
+        it's ready, seeks go to the mixer as asked and the duration comes from the tags.
+        """
+        row = self.music_player.library_index.load_seek_index(file_metadata.path, file_metadata.date_modified, file_metadata.size)
+        if row is not None:
+            self.set_seek_index(SeekIndex.from_row(row), file_metadata)
+            return
+        self.set_seek_index(None, file_metadata)
+        threading.Thread(target=self.make_seek_index, args=(file_metadata,), daemon=True).start()
+
+    def make_seek_index(self, file_metadata):
+        """Build and store the seek index of a track, then attach it if the track is still playing."""
+        try:
+            seek_index = build_seek_index(file_metadata.path)
+        except Exception as e:
+            logger.exception("An error occurred while building a seek index: %s", e)
+            return
+        if seek_index is None:
+            return
+        self.music_player.library_index.store_seek_index(file_metadata.path, file_metadata.date_modified, file_metadata.size, seek_index.to_row())
+        if self.current_path() != file_metadata.path:
+            return
+        duration = self.duration
+        self.set_seek_index(seek_index, file_metadata)
+        if self.duration != duration and self.is_playing:
+            self.schedule_progress()  # the song end was timed on the estimate
+        self.music_player.page.update()
+
+    def set_seek_index(self, seek_index, file_metadata):
+        self.seek_index = seek_index
+        self.equalizer_stream.seek_index = seek_index
+        # the index counts the samples the decoder really puts out, the tags can only estimate
+        self.duration = seek_index.duration if seek_index is not None else file_metadata.duration_seconds
+        self.music_player.progress.max = self.duration
+        self.music_player.progress.value = min(self.music_player.progress.value, self.duration)
+        self.music_player.song_duration.value = format_duration(self.duration)
+
+    def apply_track_gain(self, file_path):
+        if config_store.get("normalize_loudness", True):
+            gain = self.music_player.loudness_analyzer.gain_for(file_path)
+        else:
+            gain = 1.0
+        self.music_player.volume_control.set_track_gain(gain)
+
+    def loudness_measured(self, file_path):
+        """Called by the loudness analysis; a track that's already playing gets its gain right away."""
+        if self.current_path() == file_path:
+            self.apply_track_gain(file_path)
+
+    def tracks_moved(self, moved):
+        """Keep current_index and queued_index on their tracks after music_files was sorted or changed.
+
+        moved[old index] is the track's new index, -1 if it was removed. If the current track
+        itself was removed it keeps playing and current_path() still gives it, but
+        current_index is -1, as after a track_list_changed() to a list without it.
+        """
+        if self.queued_index is not None and self.queued_index < len(moved):
+            self.queued_index = max(0, surviving_index(moved, self.queued_index, 1))
+        if not 0 <= self.current_index < len(moved):
+            return
+        self.current_index = int(moved[self.current_index])
+        config_store.update(current_music=self.current_index if self.current_index >= 0 else None)
+        if self.current_index >= 0:
+            file_metadata = self.music_player.music_files[self.current_index]
+            self.music_player.current_song.value = f"[{self.current_index+1}/{len(self.music_player.music_files)}] - {file_metadata.name}"
+
+    def track_list_changed(self, current_path):
+        """Carry playback over to another list in music_files, a playlist or the library.
+
+        current_path, the track that was current, stays current if the new list has it, and
+        keeps playing either way; if the list doesn't have it current_index is -1, so
+        next_song() starts from the top. The queue and the shuffle bag start over on the list.
+        """
+        music_files = self.music_player.music_files
+        self.play_queue.set_library(file_metadata.path for file_metadata in music_files)
+        index = self.index_of(current_path) if current_path is not None else None
+        self.current_index = index if index is not None else -1
+        config_store.update(current_music=index)
+        if index is not None:
+            self.music_player.current_song.value = f"[{index+1}/{len(music_files)}] - {music_files[index].name}"
+        elif current_path is None and music_files:
+            self.music_player.current_song.value = f"[1/{len(music_files)}] - {music_files[0].name}"
+        self.music_player.back_button.disabled = self.current_index <= 0 and not self.play_queue.has_previous(current_path)
+        self.music_player.next_button.disabled = self.current_index >= len(music_files) - 1 and not self.play_queue.up_next
+        self.requeue()  # what was queued to follow came from the old list
+
     def play_pause(self, e):
+        self.music_player.audio_ready.wait()
         if self.is_playing:
-            pygame.mixer.music.pause()
+            self.output.pause()
             self.music_player.play_button.icon = ft.Icons.PLAY_CIRCLE_OUTLINE_ROUNDED
-        elif self.current_index == -1 and self.music_player.music_files:
+        elif self.current_index == -1 and self.playing_path is None and self.music_player.music_files:
             self.play_music(0)
             return
         elif self.first_time and self.current_index!=0:
                 self.play_music(self.current_index)
                 return
         else:
-            pygame.mixer.music.unpause()
+            self.output.unpause()
             self.music_player.play_button.icon = ft.Icons.PAUSE_CIRCLE_OUTLINE_ROUNDED
         self.is_playing = not self.is_playing
         self.music_player.page.update()
+        self.schedule_progress()
 
     def next_song(self, e):
-        if self.current_index + 1 < len(self.music_player.music_files):
-            self.play_music(self.current_index + 1)
+        index = self.index_of(self.play_queue.up_next[0]) if self.play_queue.up_next else None
+        if index is None and self.current_index + 1 < len(self.music_player.music_files):
+            index = self.current_index + 1
+        if index is not None:
+            self.play_music(index)
 
     def prev_song(self, e):
+        """Go back to the track that played before this one, or else to the one above it."""
+        current_path = self.current_path()
+        while True:
+            path = self.play_queue.previous(current_path)
+            if path is None:
+                break
+            index = self.index_of(path)
+            if index is not None:
+                self.play_music(index)
+                return
         if self.current_index - 1 >= 0:
             self.play_music(self.current_index - 1)
 
-    def seek(self, e):
-        if self.is_playing and self.duration > 0:
-            with self.seek_lock:
-                seek_pos = self.music_player.progress.value
-                seek_pos = max(0, min(seek_pos, self.duration))
-                self.seek_target_position = seek_pos
-                self.seek_start_time = time.time()
+    def queue_track(self, index):
+        """Add music_files[index] to the tracks that play next."""
+        file_metadata = self.music_player.music_files[index]
+        self.play_queue.enqueue(file_metadata.path)
+        self.requeue()
+        self.music_player.next_button.disabled = False
+        self.music_player.page.open(ft.SnackBar(ft.Text(f"Added to queue: {file_metadata.name}")))
 
-                try:
-                    pygame.mixer.music.set_pos(seek_pos)
-                except Exception as e:
-                    logger.exception("An error occurred while seeking: %s", e)
-                    print(f"Seek error: {e}")
+    def play_tracks(self, indexes):
+        """Play music_files[indexes[0]] and queue the rest to follow it in that order, an album say."""
+        if not indexes:
+            return
+        music_files = self.music_player.music_files
+        self.play_queue.play_next(music_files[index].path for index in indexes[1:])
+        self.play_music(indexes[0])
 
-                self.music_player.progress.value = seek_pos
-                self.music_player.page.update()
+    def seek(self, e):
+        if self.is_playing and self.duration > 0:
+            self.seek_to(self.music_player.progress.value)
 
     def seek_forward(self, e):
         if self.is_playing and self.duration > 0:
-            with self.seek_lock:
-                if self.seek_target_position is not None:
-                    current_pos = self.seek_target_position + (time.time() - self.seek_start_time)
-                else:
-                    current_pos = pygame.mixer.music.get_pos() / 1000
-                
-                new_pos = min(current_pos + 5, self.duration)
-                self.seek_target_position = new_pos
-                self.seek_start_time = time.time()
-
-                try:
-                    pygame.mixer.music.set_pos(new_pos)
-                except Exception as e:
-                    logger.exception("An error occurred while seeking: %s", e)
-                    print(f"Seek error: {e}")
-
-                self.music_player.progress.value = new_pos
-                self.music_player.page.update()
+            self.seek_to(self.get_position() + 5)
 
     def seek_backward(self, e):
         if self.is_playing and self.duration > 0:
-            with self.seek_lock:
-                if self.seek_target_position is not None:
-                    current_pos = self.seek_target_position + (time.time() - self.seek_start_time)
-                else:
-                    current_pos = pygame.mixer.music.get_pos() / 1000
-                
-                new_pos = max(current_pos - 5, 0)
-                self.seek_target_position = new_pos
-                self.seek_start_time = time.time()
-
-                try:
-                    pygame.mixer.music.set_pos(new_pos)
-                except Exception as e:
-                    logger.exception("An error occurred while seeking: %s", e)
-
-                self.music_player.progress.value = new_pos
-                self.music_player.page.update()
+            self.seek_to(self.get_position() - 5)
+
+    def seek_to(self, position):
+        """Jump to position (seconds) and re-base the clock on the mixer's own count of what it played."""
+        position = max(0, min(position, self.duration))
+        if self.seek_index is not None:
+            position = self.seek_index.snap(position)
+        with self.seek_lock:
+            try:
+                self.output.set_pos(position)
+            except Exception as e:
+                logger.exception("An error occurred while seeking: %s", e)
+                return
+            # set_pos() leaves get_pos() counting on, so the offset carries the jump
+            self.position_offset = position - max(self.output.get_pos(), 0) / 1000
+            self.music_player.progress.value = position
+            self.music_player.page.update()
+        self.schedule_progress()
+
+    def update_output(self):
+        """Route playback through the equalizer only while it changes the sound."""
+        output = pygame.mixer.music if self.music_player.volume_control.equalizer.is_flat() else self.equalizer_stream
+        if output is self.output:
+            return
+        if self.playing_path is None or not self.is_playing and not self.output.get_pos() > 0:
+            # nothing loaded yet (or playback finished), the next play_music picks the new output
+            self.output.stop()
+            self.output = output
+            return
+
+        # carry on from the same spot on the other output
+        position = self.get_position()
+        was_playing = self.is_playing
+        self.output.stop()
+        self.output = output
+        try:
+            self.output.load(self.playing_path)
+            self.last_mixer_pos = 0
+            self.output.play(start=position)
+            if not was_playing:
+                self.output.pause()
+        except Exception as e:
+            logger.exception("An error occurred while switching the equalizer: %s", e)
+            return
+        with self.seek_lock:
+            self.position_offset = position
+        self.queued_index = None
+        self.schedule_progress()
 
     def toggle_loop(self, e):
         self.loop_mode = (self.loop_mode + 1) % 4
@@ -175,39 +360,169 @@ class PlaybackControls:
         loop_modes = ["No Loop", "Loop Song", "Next Song", "Random Song"]
         self.music_player.loop_button.tooltip = loop_modes[self.loop_mode]
         self.music_player.loop_button.update()
-        config = load_config()
-        config["loop"] = loop_modes[self.loop_mode]
-        with open("config.json", "w") as json_file:
-            json.dump(config, json_file)
+        config_store.update(loop=loop_modes[self.loop_mode])
+        self.requeue()
+
+    def requeue(self):
+        """Pick the upcoming track again after the loop mode or the queue changed."""
+        if self.queued_index is None:
+            return
+        self.play_queue.release()
+        if self.upcoming_index() is None:
+            self.queue_cancelled = True  # the mixer can't give a queued file back
+            return
+        # the new queue replaces the old one
+        self.queue_cancelled = False
+        self.queued_index = None
+        self.preload_next(self.playback_generation)
+
+    def get_position(self):
+        """Current playback position in seconds."""
+        with self.seek_lock:
+            mixer_pos = self.output.get_pos()
+            if mixer_pos < self.last_mixer_pos and self.queued_index is not None:
+                # get_pos() only runs backwards when the mixer starts the queued track
+                self.queue_switched = True
+            self.last_mixer_pos = mixer_pos
+            if self.queue_switched:
+                return 0
+            current_pos = max(mixer_pos, 0) / 1000 + self.position_offset
+        return max(0, min(current_pos, self.duration))
+
+    def schedule_progress(self):
+        """Wake the progress loop and re-arm the song end and preload timers after play, pause or seek."""
+        for timer in (self.end_timer, self.preload_timer):
+            if timer is not None:
+                timer.cancel()
+        self.end_timer = None
+        self.preload_timer = None
+        self.playback_generation += 1
+        if self.is_playing and self.duration > 0:
+            remaining = self.duration - self.get_position()
+            self.start_end_timer(remaining)
+            if self.queued_index is None:
+                self.preload_timer = threading.Timer(max(remaining - PRELOAD_AHEAD_SECONDS, 0), self.preload_next, args=(self.playback_generation,))
+                self.preload_timer.daemon = True
+                self.preload_timer.start()
+        self.progress_event.set()
+
+    def upcoming_index(self):
+        """Track that will follow the current one: the queue's next, else the loop mode's; None if playback stops."""
+        if self.loop_mode == 3 and len(self.play_queue.shuffle.items) != len(self.music_player.music_files):
+            # still scanning; the bag catches up with the library
+            self.play_queue.set_library(file_metadata.path for file_metadata in self.music_player.music_files)
+        path = self.play_queue.upcoming(self.loop_mode == 3, self.current_path())
+        if path is not None:
+            index = self.index_of(path)
+            if index is not None:
+                return index
+        if self.loop_mode == 1:
+            return self.current_index if self.current_index >= 0 else None
+        if self.loop_mode == 2:
+            return (self.current_index + 1) % len(self.music_player.music_files)
+        return None
+
+    def preload_next(self, generation):
+        """Hand the upcoming track to the mixer so it starts the moment the current one ends."""
+        if generation != self.playback_generation or not self.is_playing or self.queued_index is not None:
+            return
+        next_index = self.upcoming_index()
+        if next_index is None:
+            return
+        try:
+            self.output.queue(self.music_player.music_files[next_index].path)
+        except Exception as e:
+            logger.exception("An error occurred while queueing the next file: %s", e)
+            return
+        self.queued_index = next_index
+        self.music_player.waveform_generator.request([self.music_player.music_files[next_index]])
+
+    def start_queued_track(self):
+        """Catch the display up with the track the mixer switched to on its own."""
+        with self.queue_lock:
+            if not self.queue_switched:
+                return
+            self.queue_switched = False
+            index = self.queued_index
+        if self.queue_cancelled:
+            # the loop was turned off after the track was queued
+            self.output.stop()
+            self.queued_index = None
+            self.is_playing = False
+            self.music_player.play_button.icon = ft.Icons.PLAY_CIRCLE_OUTLINE_ROUNDED
+        else:
+            self.set_current_track(index)
+        self.music_player.page.update()
+        self.schedule_progress()
+
+    def start_end_timer(self, remaining):
+        self.end_timer = threading.Timer(max(remaining, 0), self.handle_song_end, args=(self.playback_generation,))
+        self.end_timer.daemon = True
+        self.end_timer.start()
+
+    def handle_song_end(self, generation):
+        if generation != self.playback_generation or not self.is_playing:
+            return  # a later play, pause or seek has taken over
+        if self.queued_index is not None:
+            self.get_position()
+            if self.queue_switched:
+                self.start_queued_track()
+            elif self.output.get_busy():
+                self.start_end_timer(SONG_END_RECHECK_SECONDS)
+            elif not self.queue_cancelled:
+                self.play_music(self.queued_index)  # the queued file never started
+            else:
+                self.queued_index = None
+                self.handle_song_end(generation)
+            return
+        if self.output.get_busy():
+            # the clock ran ahead of the audio, check again once the rest has played
+            self.start_end_timer(max(self.duration - self.get_position(), SONG_END_RECHECK_SECONDS))
+            return
+
+        next_index = self.upcoming_index()
+        if next_index is None:  # No loop, nothing queued
+            self.is_playing = False
+            self.music_player.play_button.icon = ft.Icons.PLAY_CIRCLE_OUTLINE_ROUNDED
+            self.music_player.page.update()
+            self.schedule_progress()
+        else:
+            self.play_music(next_index)
 
     def update_progress(self):
+        """Push the position to the slider and time label, only when what they show changes."""
         while True:
-            if self.is_playing and self.duration > 0:
-                with self.seek_lock:
-                    if self.seek_target_position is not None:
-                        elapsed = time.time() - self.seek_start_time
-                        current_pos = min(self.seek_target_position + elapsed, self.duration)
-                    else:
-                        current_pos = pygame.mixer.music.get_pos() / 1000
-                        current_pos = max(0, min(current_pos, self.duration))
-
-                    # Update progress display
-                    self.music_player.song_progress.value = f"{int(current_pos // 60):02}:{int(current_pos % 60):02}/"
-                    self.music_player.progress.value = current_pos
-                    self.music_player.page.update()
-
-                    # Handle song completion
-                    if current_pos >= self.duration - 0.5 and not self._song_ended:
-                        self._song_ended = True
-                        if self.loop_mode == 0:  # No loop
-                            self.is_playing = False
-                            self.music_player.play_button.icon = ft.Icons.PLAY_CIRCLE_OUTLINE_ROUNDED
-                            self.music_player.page.update()
-                        elif self.loop_mode == 1:  # Loop current song
-                            self.play_music(self.current_index)
-                        elif self.loop_mode == 2:  # Next song
-                            next_index = (self.current_index + 1) % len(self.music_player.music_files)
-                            self.play_music(next_index)
-                        elif self.loop_mode == 3:  # Random song
-                            self.play_music(random.choice([i for i in range(len(self.music_player.music_files)) if i != self.current_index]))
-            time.sleep(0.05)
+            self.progress_event.clear()
+            if not (self.is_playing and self.duration > 0):
+                self.progress_event.wait()  # nothing moves while paused or stopped
+                continue
+
+            current_pos = self.get_position()
+            if self.queue_switched:
+                self.start_queued_track()
+                continue
+            step = max(self.duration / PROGRESS_STEPS, MIN_PROGRESS_STEP_SECONDS)
+            progress_value = int(current_pos / step) * step
+            progress_text = f"{int(current_pos // 60):02}:{int(current_pos % 60):02}/"
+            changed_controls = []
+            if progress_text != self.music_player.song_progress.value:
+                self.music_player.song_progress.value = progress_text
+                changed_controls.append(self.music_player.song_progress)
+            if progress_value != self.music_player.progress.value:
+                self.music_player.progress.value = progress_value
+                changed_controls.append(self.music_player.progress)
+            if changed_controls:
+                self.music_player.page.update(*changed_controls)
+
+            # sleep until the label or the slider has something new to show, or until woken
+            next_change = min(int(current_pos) + 1, (int(current_pos / step) + 1) * step)
+            self.progress_event.wait(max(next_change - current_pos, 0.02))
+
+
+def surviving_index(moved, index, step):
+    """New index of the track at index, or of the nearest one in direction step that wasn't removed; -1 if none."""
+    while 0 <= index < len(moved):
+        if moved[index] >= 0:
+            return int(moved[index])
+        index += step
+    return -1
@@ -0,0 +1,173 @@
+import collections
+import os
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from backend.all_func_library_engine import DELIVERY_INTERVAL_SECONDS, MUSIC_EXTENSIONS, extract_metadata, is_cache_valid
+from backend.all_func_library_index import Track
+from backend.logger import setup_logger
+logger = setup_logger()
+
+PLAYLIST_EXTENSIONS = (".m3u", ".m3u8")
+INDEX_LOOKUP_BATCH = 500  # playlist entries looked up in the library index together
+
+
+def iter_m3u(playlist_path):
+    """Yield (path, title, duration_seconds) for every entry of an M3U/M3U8 file, reading it a line at a time.
+
+    Relative paths are taken from the playlist's folder and file:// URLs become paths;
+    other URLs are skipped, the player only plays files. title and duration come from the
+    #EXTINF line before an entry, None without one. Lines are UTF-8, or Latin-1 where they
+    aren't valid UTF-8 (older .m3u files are written in the system code page).
+    """
+    folder = os.path.dirname(os.path.abspath(playlist_path))
+    title = duration = None
+    with open(playlist_path, "rb") as playlist_file:
+        for raw_line in playlist_file:
+            try:
+                line = raw_line.decode("utf-8")
+            except UnicodeDecodeError:
+                line = raw_line.decode("latin-1")
+            line = line.lstrip("\ufeff").strip()
+            if not line:
+                continue
+            if line.startswith("#"):
+                if line.upper().startswith("#EXTINF:"):
+                    info, _, title = line[len("#EXTINF:"):].partition(",")
+                    title = title.strip() or None
+                    try:
+                        # extended players add attributes after the duration
+                        duration = float(info.split()[0]) if info.split() else None
+                    except ValueError:
+                        duration = None
+                    if duration is not None and duration < 0:
+                        duration = None  # -1 is how M3U says the length isn't known
+                continue
+            path = entry_path(line, folder)
+            if path is not None:
+                yield path, title, duration
+            title = duration = None
+
+
+def entry_path(location, folder):
+    """The absolute path an entry of a playlist in folder points at, None for anything but a file."""
+    if location.lower().startswith("file://"):
+        location = urllib.request.url2pathname(urllib.parse.urlparse(location).path)
+    elif "://" in location:
+        return None
+    if os.sep == "/":
+        location = location.replace("\\", "/")  # a playlist written on Windows
+    return os.path.normpath(os.path.join(folder, location))
+
+
+def write_m3u(playlist_path, tracks):
+    """Write tracks as an extended M3U (UTF-8, so .m3u8 as well), a line at a time.
+
+    Tracks under the playlist's folder are written relative to it, so the folder can be
+    moved with its playlist. The file is replaced in one go once it has been written.
+    """
+    folder = os.path.dirname(os.path.abspath(playlist_path))
+    file_descriptor, temp_path = tempfile.mkstemp(dir=folder, prefix=".playlist-", suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "w", encoding="utf-8", newline="\n") as playlist_file:
+            playlist_file.write("#EXTM3U\n")
+            for file_metadata in tracks:
+                title = file_metadata.title or file_metadata.name
+                if file_metadata.artist and file_metadata.title:
+                    title = f"{file_metadata.artist} - {file_metadata.title}"
+                location = file_metadata.path
+                if location.startswith(os.path.join(folder, "")):
+                    location = os.path.relpath(location, folder)
+                playlist_file.write(f"#EXTINF:{round(file_metadata.duration_seconds)},{title}\n{location}\n")
+        os.replace(temp_path, playlist_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+class Playlist:
+    """The tracks of an M3U/M3U8 file, resolved against the library.
+
+    An entry the library holds is found by a dict lookup on its path and shares the
+    library's Track; an entry that isn't in the library but is in the library index (a
+    folder scanned before) is read from there, in batches. Files that were never scanned,
+    start out as stand-ins made from the playlist line, and complete() parses them.
+    Entries whose file is gone or that the player can't play are only counted, in skipped.
+    """
+
+    def __init__(self, path, library, library_index):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.tracks = []
+        self.unparsed = collections.deque()  # positions in tracks of the stand-ins
+        self.skipped = 0
+        self.from_index = 0
+        self.stand_ins = 0
+        batch = []
+        for entry in iter_m3u(path):
+            if not entry[0].lower().endswith(MUSIC_EXTENSIONS):
+                self.skipped += 1
+                continue
+            track_id = library.ids.get(entry[0])
+            if track_id is not None:
+                self.tracks.append(library.tracks[track_id])
+                continue
+            batch.append((len(self.tracks), entry))
+            self.tracks.append(None)
+            if len(batch) >= INDEX_LOOKUP_BATCH:
+                self.resolve(batch, library_index)
+                batch = []
+        if batch:
+            self.resolve(batch, library_index)
+        if self.skipped:
+            kept = [position for position, file_metadata in enumerate(self.tracks) if file_metadata is not None]
+            new_positions = dict(zip(kept, range(len(kept))))
+            self.tracks = [self.tracks[position] for position in kept]
+            self.unparsed = collections.deque(new_positions[position] for position in self.unparsed)
+
+    def resolve(self, batch, library_index):
+        """Fill in entries the library doesn't have, from the library index or from the playlist line."""
+        indexed = library_index.load_tracks(path for _, (path, _, _) in batch)
+        for position, (path, title, duration) in batch:
+            try:
+                file_stat = os.stat(path)
+            except OSError:
+                self.skipped += 1
+                continue
+            file_metadata = indexed.get(path)
+            if is_cache_valid(file_metadata, file_stat):
+                self.from_index += 1
+            else:
+                # never scanned, or changed since it was
+                name, file_type = os.path.splitext(os.path.basename(path))
+                file_metadata = Track(path, name, 0.0, 0, file_type.lower(), duration or 0.0, title=title or "")
+                self.unparsed.append(position)
+                self.stand_ins += 1
+            self.tracks[position] = file_metadata
+
+    def complete(self, on_tracks=None, cancelled=None):
+        """Parse the stand-ins in playlist order, replacing them in tracks.
+
+        on_tracks(positions) gets the positions replaced since its last call, every
+        DELIVERY_INTERVAL_SECONDS and once at the end; setting cancelled stops it.
+        """
+        done = []
+        last_delivery = time.monotonic()
+        while self.unparsed:
+            if cancelled is not None and cancelled.is_set():
+                return
+            position = self.unparsed.popleft()
+            file_metadata = self.tracks[position]
+            try:
+                file_stat = os.stat(file_metadata.path)
+                self.tracks[position] = extract_metadata(file_metadata.path, file_stat.st_mtime, file_stat.st_size)
+                done.append(position)
+            except Exception as e:
+                logger.exception("An error occurred while reading a playlist track: %s", e)
+            if on_tracks is not None and done and time.monotonic() - last_delivery >= DELIVERY_INTERVAL_SECONDS:
+                on_tracks(done)
+                done = []
+                last_delivery = time.monotonic()
+        if on_tracks is not None and done:
+            on_tracks(done)
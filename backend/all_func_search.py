@@ -0,0 +1,71 @@
+from array import array
+from collections import defaultdict
+import numpy as np
+
+GRAM_SIZE = 3
+EMPTY_POSTING = array("I")
+
+
+class SearchIndex:
+    """N-gram index over lowercased song names for substring search.
+
+    Every name is split into all of its 1, 2 and 3 character grams. A query is answered
+    from the posting lists of its grams (the intersection can only shrink as the query
+    grows), and only those candidates are checked with a real substring test.
+
+    Positions only ever grow, so a posting list is a sorted array of 4-byte ints rather
+    than a set: a fraction of the memory, and intersected in numpy starting from the
+    shortest. numpy reads the arrays in place, without copying them; the views only last
+    for one search() and a view stops add() from growing its array, so the two must not
+    run at the same time (LibraryEngine calls both under its lock).
+    """
+
+    def __init__(self, names=()):
+        self.names = []
+        self.postings = defaultdict(lambda: array("I"))
+        self.last_query = None
+        self.last_result = None
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        """Index the next song name and return its position."""
+        index = len(self.names)
+        name = name.lower()
+        self.names.append(name)
+        grams = {name[start:start + size] for size in range(1, GRAM_SIZE + 1) for start in range(len(name) - size + 1)}
+        for gram in grams:
+            self.postings[gram].append(index)
+        self.last_query = None
+        return index
+
+    def search(self, query):
+        """Return the positions of all names containing query, in ascending order."""
+        query = query.lower()
+        if query == "":
+            return list(range(len(self.names)))
+
+        if self.last_query is not None and self.last_query in query:
+            # the user kept typing: every match of the new query already matched the old one
+            candidates = self.last_result
+        else:
+            size = min(len(query), GRAM_SIZE)
+            grams = {query[start:start + size] for start in range(len(query) - size + 1)}
+            posting_lists = sorted((self.postings.get(gram, EMPTY_POSTING) for gram in grams), key=len)
+            candidates = np.frombuffer(posting_lists[0], dtype=np.uint32)
+            for posting in posting_lists[1:]:
+                if len(candidates) == 0:
+                    break
+                # keep the candidates a binary search finds in the (longer) posting list
+                posting = np.frombuffer(posting, dtype=np.uint32)
+                found = np.minimum(np.searchsorted(posting, candidates), len(posting) - 1)
+                candidates = candidates[posting[found] == candidates]
+            candidates = candidates.tolist()
+
+        if len(query) <= GRAM_SIZE and candidates is not self.last_result:
+            result = candidates  # the gram itself is the query, nothing left to verify
+        else:
+            result = [index for index in candidates if query in self.names[index]]
+        self.last_query = query
+        self.last_result = result
+        return result
@@ -0,0 +1,260 @@
+import mmap
+import struct
+import numpy as np
+from backend.logger import setup_logger
+logger = setup_logger()
+
+INDEX_STEP_SECONDS = 0.5  # grid of the MP3 frame / Ogg page table
+
+# MPEG audio header tables, indexed by [version][layer][bitrate index] and [version][sample rate index]
+MPEG1, MPEG2, MPEG25 = 3, 2, 0
+BITRATES = {
+    MPEG1: {
+        3: [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+        2: [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+        1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    },
+    MPEG2: {
+        3: [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+        2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+        1: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    },
+}
+BITRATES[MPEG25] = BITRATES[MPEG2]
+SAMPLE_RATES = {MPEG1: [44100, 48000, 32000], MPEG2: [22050, 24000, 16000], MPEG25: [11025, 12000, 8000]}
+LAYER_III, LAYER_II, LAYER_I = 1, 2, 3
+DECODER_DELAY = 529  # samples an MP3 decoder adds in front, on top of the encoder delay in the LAME tag
+# Xing/Info header flag -> size of the field it announces; the LAME tag follows the last one
+XING_FIELDS = ((0x1, 4), (0x2, 4), (0x4, 100), (0x8, 4))  # frames, bytes, TOC, quality
+
+
+class SeekIndex:
+    """Exact length of a file, and where in the file any position starts.
+
+    WAV positions are worked out from the size of a sample frame. MP3 frames and Ogg
+    pages are listed on a uniform time grid, so a position maps straight to its grid
+    slot: every lookup is constant-time, however long the file is.
+    """
+
+    def __init__(self, sample_rate, total_samples, data_offset=0, block_align=0, step_samples=0, offsets=None, samples=None):
+        self.sample_rate = sample_rate
+        self.total_samples = total_samples
+        self.data_offset = data_offset
+        self.block_align = block_align
+        self.step_samples = step_samples
+        self.offsets = offsets  # byte offset of the first frame/page that starts in each grid slot
+        self.samples = samples  # first sample decoded from that frame/page
+
+    @property
+    def duration(self):
+        return self.total_samples / self.sample_rate
+
+    def snap(self, seconds):
+        """The position a seek to seconds really lands on: clamped to the file, on a whole sample."""
+        return min(max(0, round(seconds * self.sample_rate)), self.total_samples) / self.sample_rate
+
+    def locate(self, seconds):
+        """(byte offset, first sample) of the frame or page to start decoding from for seconds."""
+        sample = round(self.snap(seconds) * self.sample_rate)
+        if self.block_align:
+            return self.data_offset + sample * self.block_align, sample
+        slot = min(sample // self.step_samples, len(self.offsets) - 1)
+        return int(self.offsets[slot]), int(self.samples[slot])
+
+    def to_row(self):
+        return (
+            self.sample_rate, self.total_samples, self.data_offset, self.block_align, self.step_samples,
+            self.offsets.astype(np.int64).tobytes() if self.offsets is not None else None,
+            self.samples.astype(np.int64).tobytes() if self.samples is not None else None,
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        sample_rate, total_samples, data_offset, block_align, step_samples, offsets, samples = row
+        return cls(
+            sample_rate, total_samples, data_offset, block_align, step_samples,
+            np.frombuffer(offsets, dtype=np.int64) if offsets is not None else None,
+            np.frombuffer(samples, dtype=np.int64) if samples is not None else None,
+        )
+
+
+def build_seek_index(file_path):
+    """Build the seek index of a WAV, MP3 or Ogg (Opus/Vorbis) file; None if the format isn't recognised."""
+    try:
+        with open(file_path, "rb") as audio_file:
+            with mmap.mmap(audio_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+                    return wav_seek_index(data)
+                if data[:4] == b"OggS":
+                    return ogg_seek_index(data)
+                return mp3_seek_index(data)
+    except (OSError, ValueError, struct.error) as e:
+        logger.exception("An error occurred while building a seek index: %s", e)
+        return None
+
+
+def grid_table(starts, offsets, sample_rate):
+    """Reduce (first sample, byte offset) of every frame or page to the first one in each grid slot."""
+    step_samples = max(1, int(sample_rate * INDEX_STEP_SECONDS))
+    starts = np.asarray(starts, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    slots = np.arange(starts[-1] // step_samples + 1) * step_samples
+    # the last frame that starts at or before each grid point
+    chosen = np.searchsorted(starts, slots, side="right") - 1
+    return step_samples, offsets[chosen], starts[chosen]
+
+
+def wav_seek_index(data):
+    position = 12
+    sample_rate = block_align = None
+    while position + 8 <= len(data):
+        chunk_id, chunk_size = struct.unpack_from("<4sI", data, position)
+        if chunk_id == b"fmt ":
+            _, _, sample_rate, _, block_align = struct.unpack_from("<HHIIH", data, position + 8)
+        elif chunk_id == b"data":
+            if sample_rate is None or not block_align:
+                return None
+            data_offset = position + 8
+            data_size = min(chunk_size, len(data) - data_offset)
+            return SeekIndex(sample_rate, data_size // block_align, data_offset=data_offset, block_align=block_align)
+        position += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+def parse_mp3_header(data, position):
+    """(frame length, samples per frame, sample rate) of the MPEG audio frame at position, or None."""
+    if position + 4 > len(data) or data[position] != 0xFF or data[position + 1] & 0xE0 != 0xE0:
+        return None
+    version = (data[position + 1] >> 3) & 3
+    layer = (data[position + 1] >> 1) & 3
+    bitrate_index = data[position + 2] >> 4
+    rate_index = (data[position + 2] >> 2) & 3
+    padding = (data[position + 2] >> 1) & 1
+    if version == 1 or layer == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = BITRATES[version][layer][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    if layer == LAYER_I:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    if layer == LAYER_III and version != MPEG1:
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate
+    return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+
+
+def next_mp3_header(data, position, header):
+    """Check that header at position is a real frame: another one like it must follow it.
+
+    Returns the header of the frame that follows, () where the audio ends right after it
+    (the end of the file or an ID3v1/APE tag), or None if a stray 0xFF in a tag, in cover
+    art or in junk only looked like a frame.
+    """
+    next_position = position + header[0]
+    if next_position == len(data) or data[next_position:next_position + 3] == b"TAG" or data[next_position:next_position + 8] == b"APETAGEX":
+        return ()
+    following = parse_mp3_header(data, next_position)
+    if following is None or following[1:] != header[1:]:
+        return None
+    return following
+
+
+def mp3_seek_index(data):
+    position = 0
+    if data[:3] == b"ID3":
+        tag_size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        position = 10 + tag_size + (10 if data[5] & 0x10 else 0)
+
+    starts, offsets = [], []
+    sample = 0
+    sample_rate = None
+    delay = padding = 0
+    first = True
+    end = len(data)
+    header = None  # of the frame at position, when the previous frame already parsed it
+    while position + 4 <= end:
+        if header is None:
+            header = parse_mp3_header(data, position)
+        following = next_mp3_header(data, position, header) if header is not None and position + header[0] <= end else None
+        if following is None:
+            header = None
+            if data[position:position + 3] == b"TAG":
+                break  # ID3v1 at the end
+            # junk between frames: look for the next frame sync
+            position = data.find(b"\xff", position + 1)
+            if position < 0:
+                break
+            continue
+        frame_length, samples_per_frame, frame_rate = header
+        header = following or None  # () at the end of the stream
+        if first:
+            first = False
+            sample_rate = frame_rate
+            # a Xing/Info or VBRI frame describes the stream and decodes to nothing
+            mono = (data[position + 3] >> 6) == 3
+            side_info = (17 if mono else 32) if samples_per_frame == 1152 else (9 if mono else 17)
+            xing = position + 4 + side_info
+            if data[xing:xing + 4] in (b"Xing", b"Info"):
+                flags = struct.unpack_from(">I", data, xing + 4)[0]
+                lame = xing + 8 + sum(size for flag, size in XING_FIELDS if flags & flag)
+                if data[lame:lame + 4] in (b"LAME", b"Lavf", b"Lavc"):
+                    delay = (data[lame + 21] << 4) | (data[lame + 22] >> 4)
+                    padding = ((data[lame + 22] & 0x0F) << 8) | data[lame + 23]
+                position += frame_length
+                continue
+            if data[position + 36:position + 40] == b"VBRI":
+                position += frame_length
+                continue
+        starts.append(sample)
+        offsets.append(position)
+        sample += samples_per_frame
+        position += frame_length
+
+    if not starts:
+        return None
+    # the decoder drops the encoder delay (plus its own) at the start and the padding at the end
+    skipped = delay + DECODER_DELAY if delay or padding else 0
+    total_samples = max(0, sample - delay - padding)
+    starts = [max(0, start - skipped) for start in starts]
+    step_samples, grid_offsets, grid_starts = grid_table(starts, offsets, sample_rate)
+    return SeekIndex(sample_rate, total_samples, step_samples=step_samples, offsets=grid_offsets, samples=grid_starts)
+
+
+def ogg_seek_index(data):
+    position = 0
+    serial = None
+    sample_rate = None
+    pre_skip = 0
+    starts, offsets = [], []
+    previous_granule = 0
+    last_granule = 0
+    while position + 27 <= len(data):
+        if data[position:position + 4] != b"OggS":
+            position = data.find(b"OggS", position + 1)
+            if position < 0:
+                break
+            continue
+        granule, page_serial = struct.unpack_from("<qI", data, position + 6)
+        segments = data[position + 26]
+        body = position + 27 + segments
+        page_length = 27 + segments + sum(data[position + 27:body])
+        if serial is None:
+            serial = page_serial
+            if data[body:body + 8] == b"OpusHead":
+                sample_rate = 48000  # Opus always decodes at 48 kHz
+                pre_skip = struct.unpack_from("<H", data, body + 10)[0]
+            elif data[body:body + 7] == b"\x01vorbis":
+                sample_rate = struct.unpack_from("<I", data, body + 12)[0]
+            else:
+                return None
+        elif page_serial == serial and granule >= 0:
+            # a page's granule position counts the samples up to the end of its last packet
+            if granule > previous_granule:
+                starts.append(max(0, previous_granule - pre_skip))
+                offsets.append(position)
+                previous_granule = granule
+            last_granule = granule
+        position += page_length
+
+    if not starts:
+        return None
+    step_samples, grid_offsets, grid_starts = grid_table(starts, offsets, sample_rate)
+    return SeekIndex(sample_rate, max(0, last_granule - pre_skip), step_samples=step_samples, offsets=grid_offsets, samples=grid_starts)
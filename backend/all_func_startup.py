@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+STARTUP_REPORT_ENV = "MUSIC_PLAYER_STARTUP_REPORT"  # set to 1 to print the report once the player is playable
+
+
+class StartupTimer:
+    """Milestones of a cold start, counted from the moment main.py starts importing.
+
+    measure() records how long a step took (an import, the mixer init, ...) and mark()
+    records when a milestone was reached; report() lists both in order.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.steps = []  # (label, seconds taken, seconds since start when it finished)
+        self.marks = {}
+        self.reported = False
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def measure(self, label):
+        step_started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((label, time.perf_counter() - step_started, self.elapsed()))
+
+    def mark(self, milestone):
+        """Record the first time a milestone is reached."""
+        self.marks.setdefault(milestone, self.elapsed())
+
+    def as_dict(self):
+        return {
+            "steps": [{"label": label, "ms": round(taken * 1000, 1)} for label, taken, _ in self.steps],
+            "milestones_ms": {milestone: round(at * 1000, 1) for milestone, at in self.marks.items()},
+        }
+
+    def report(self):
+        """Print the timings once, if the report is switched on."""
+        if self.reported or not os.environ.get(STARTUP_REPORT_ENV):
+            return
+        self.reported = True
+        lines = ["startup timings (ms since launch):"]
+        events = [(finished, f"  {label:<32} {taken * 1000:8.1f} ms") for label, taken, finished in self.steps]
+        events += [(at, f"* {milestone:<32} {at * 1000:8.1f}") for milestone, at in self.marks.items()]
+        lines += [line for _, line in sorted(events)]
+        print("\n".join(lines), file=sys.stderr)
+
+
+startup_timer = StartupTimer()
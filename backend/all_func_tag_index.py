@@ -0,0 +1,62 @@
+UNKNOWN_NAMES = {"artist": "Unknown Artist", "album": "Unknown Album", "genre": "Unknown Genre"}
+
+
+class TagIndex:
+    """Inverted indexes from tags to track ids: artist -> album -> tracks, and genre -> tracks.
+
+    They are filled track by track while the library is scanned and kept up to date as
+    tracks are added or replaced, so showing an artist, an album or a genre is a lookup
+    rather than a pass over the library. Names are matched ignoring case and surrounding
+    spaces; the spelling seen first is the one shown. Tracks without the tag are kept
+    under the empty name. A bucket of tracks is a dict of track ids (to None), so a track
+    comes out of it as quickly as it went in, and they still come out in the order added.
+    """
+
+    def __init__(self, tracks=()):
+        self.artists = {}  # artist key -> {album key -> {track id: None}}
+        self.genres = {}  # genre key -> {track id: None}
+        self.names = {}  # key -> name as it was first seen
+        for track_id, track in enumerate(tracks):
+            self.add(track_id, track)
+
+    def key(self, name):
+        key = name.strip().casefold()
+        self.names.setdefault(key, name.strip())
+        return key
+
+    def add(self, track_id, track):
+        albums = self.artists.setdefault(self.key(track.artist), {})
+        albums.setdefault(self.key(track.album), {})[track_id] = None
+        self.genres.setdefault(self.key(track.genre), {})[track_id] = None
+
+    def remove(self, track_id, track):
+        artist, album, genre = self.key(track.artist), self.key(track.album), self.key(track.genre)
+        albums = self.artists[artist]
+        del albums[album][track_id]
+        if not albums[album]:
+            del albums[album]
+            if not albums:
+                del self.artists[artist]
+        del self.genres[genre][track_id]
+        if not self.genres[genre]:
+            del self.genres[genre]
+
+    def name(self, key, tag="artist"):
+        """How a key is shown; tag picks what an empty one is called."""
+        return self.names.get(key) or UNKNOWN_NAMES[tag]
+
+    def artist_keys(self):
+        """Every artist, in name order with the unknown one last."""
+        return sorted(self.artists, key=lambda key: (key == "", key))
+
+    def album_keys(self, artist):
+        return sorted(self.artists.get(artist, {}), key=lambda key: (key == "", key))
+
+    def genre_keys(self):
+        return sorted(self.genres, key=lambda key: (key == "", key))
+
+    def album_ids(self, artist, album):
+        return list(self.artists.get(artist, {}).get(album, ()))
+
+    def genre_ids(self, genre):
+        return list(self.genres.get(genre, ()))
@@ -0,0 +1,72 @@
+import hashlib
+import io
+import os
+import threading
+from backend.logger import setup_logger
+logger = setup_logger()
+
+try:
+    from PIL import Image
+except ImportError:  # without Pillow covers are cached as-is, only deduplicated
+    Image = None
+
+# flet serves <project>/assets at the root of the app, see ft.app(assets_dir=...)
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets")
+THUMBNAIL_FOLDER = "thumbnails"
+THUMBNAIL_SIZE = (100, 40)  # same box as the ft.Image in the playlist rows
+
+
+def store_thumbnail(cover_data):
+    """Downscale an embedded cover once and return its asset path.
+
+    Thumbnails are named after the hash of the original cover bytes, so every track
+    of an album points at the same file and an existing thumbnail is never rebuilt.
+    """
+    digest = hashlib.sha1(cover_data).hexdigest()
+    file_name = digest + (".jpg" if Image is not None else guess_image_extension(cover_data))
+    src = f"/{THUMBNAIL_FOLDER}/{file_name}"
+    thumbnail_path = asset_path(src)
+    if os.path.exists(thumbnail_path):
+        return src
+
+    try:
+        if Image is not None:
+            with Image.open(io.BytesIO(cover_data)) as image:
+                image = image.convert("RGB")
+                image.thumbnail(THUMBNAIL_SIZE, Image.LANCZOS)
+                buffer = io.BytesIO()
+                image.save(buffer, "JPEG", quality=90)
+                thumbnail_data = buffer.getvalue()
+        else:
+            thumbnail_data = cover_data
+
+        os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+        # scan workers may race on the same album, so write under a private name and rename
+        temp_path = f"{thumbnail_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as thumbnail_file:
+            thumbnail_file.write(thumbnail_data)
+        os.replace(temp_path, thumbnail_path)
+    except Exception as e:
+        logger.exception("An error occurred while creating a thumbnail: %s", e)
+        return None
+    return src
+
+
+def set_assets_dir(assets_dir):
+    """Write thumbnails under assets_dir from now on, in this process."""
+    global ASSETS_DIR
+    ASSETS_DIR = assets_dir
+
+
+def asset_path(src):
+    return os.path.join(ASSETS_DIR, *src.strip("/").split("/"))
+
+
+def guess_image_extension(data):
+    if data.startswith(b"\x89PNG"):
+        return ".png"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return ".gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    return ".jpg"
@@ -1,29 +1,116 @@
-from ctypes import cast, POINTER
-from comtypes import CLSCTX_ALL
-import comtypes
-from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+import sys
+import pygame
+from backend.all_func_equalizer import Equalizer, level_to_gain_db
+from backend.logger import setup_logger
+logger = setup_logger()
+
+
+class SystemVolume:
+    """Windows master volume through pycaw."""
 
-class VolumeControl:
     def __init__(self):
-        self.is_muted = False
-        self.previous_volume = self.get_current_volume
+        # COM and pycaw are slow to import and only exist on Windows
+        from ctypes import cast, POINTER
+        from comtypes import CLSCTX_ALL
+        import comtypes
+        from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
         comtypes.CoInitialize()
         devices = AudioUtilities.GetSpeakers()
         interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
         self.volume = cast(interface, POINTER(IAudioEndpointVolume))
+
+    def get(self):
+        return round(self.volume.GetMasterVolumeLevelScalar() * 100)
+
+    def set(self, volume_percent):
+        self.volume.SetMasterVolumeLevelScalar(volume_percent / 100, None)
+
+    def output_scale(self):
+        return 1.0  # the system mixer does the scaling
+
+
+class MixerVolume:
+    """Volume of the player's own output, used where there is no system volume backend."""
+
+    def __init__(self):
+        self.volume_percent = round(pygame.mixer.music.get_volume() * 100)
+
+    def get(self):
+        return self.volume_percent
+
+    def set(self, volume_percent):
+        self.volume_percent = volume_percent
+
+    def output_scale(self):
+        return self.volume_percent / 100
+
+
+def open_volume_backend():
+    """The system volume on Windows, the mixer's own volume anywhere else."""
+    if sys.platform == "win32":
+        try:
+            return SystemVolume()
+        except Exception as e:
+            logger.exception("An error occurred while opening the system volume: %s", e)
+    return MixerVolume()
+
+
+class VolumeControl:
+    def __init__(self):
+        self.is_muted = False
+        self.previous_volume = self.get_current_volume
+        self.backend = None  # opened by open() once the mixer is running
+        self.track_gain = 1.0  # loudness normalization of the current track
         self.bass_level = 50
         self.mid_level = 50
         self.treble_level = 50
+        self.equalizer = Equalizer()
 
+    def open(self):
+        self.backend = open_volume_backend()
+        self.apply_output_volume()
 
     def get_current_volume(self):
         """Get the current volume level as a percentage (0 to 100)."""
-        return round(self.volume.GetMasterVolumeLevelScalar() * 100)
+        if self.backend is None:
+            return 100
+        return self.backend.get()
 
     def set_volume(self, volume_percent):
         """Set the system volume to the specified percentage (0 to 100)."""
-        volume_scalar = volume_percent / 100
-        self.volume.SetMasterVolumeLevelScalar(volume_scalar, None)
+        if self.backend is not None:
+            self.backend.set(volume_percent)
+            self.apply_output_volume()
+
+    def set_track_gain(self, gain):
+        """Scale playback by a per-track normalization gain (1.0 leaves it as it is)."""
+        self.track_gain = gain
+        self.apply_output_volume()
+
+    def apply_output_volume(self):
+        """Set pygame's own volume: the track gain, times the slider where there's no system volume."""
+        if self.backend is None or not pygame.mixer.get_init():
+            return
+        # pygame can only turn a track down, tracks quieter than the reference play at full level
+        volume = min(1.0, self.track_gain * self.backend.output_scale())
+        pygame.mixer.music.set_volume(volume)
+        # the equalizer plays on a mixer channel instead of through mixer.music
+        for channel in range(pygame.mixer.get_num_channels()):
+            pygame.mixer.Channel(channel).set_volume(volume)
+
+    def set_equalizer(self, bass=None, mid=None, treble=None):
+        """Set equalizer levels (0 to 100, 50 is flat); bands left as None keep their level."""
+        if bass is not None:
+            self.bass_level = bass
+        if mid is not None:
+            self.mid_level = mid
+        if treble is not None:
+            self.treble_level = treble
+        self.equalizer.set_gains(
+            bass=level_to_gain_db(self.bass_level),
+            mid=level_to_gain_db(self.mid_level),
+            treble=level_to_gain_db(self.treble_level),
+        )
 
     def mute_unmute(self):
         """Toggle mute/unmute."""
@@ -0,0 +1,271 @@
+import abc
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from backend.logger import setup_logger
+logger = setup_logger()
+
+BATCH_QUIET_SECONDS = 0.5  # a batch is handed on once events stop for this long
+BATCH_MAX_SECONDS = 3.0  # or once it is this old, so a long copy still shows up as it goes
+POLL_INTERVAL_SECONDS = 10.0
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, length of the name that follows
+
+
+class LibraryWatcher(abc.ABC):
+    """Watches the library folders on a background thread and reports what changed.
+
+    on_changes gets a set of paths, files or folders, that were created, changed, moved
+    or deleted. Events are batched, so copying an album in is reported once, not per file.
+    Subclasses only provide read_changes().
+    """
+
+    idle_timeout = 1.0  # how long read_changes() may block while there is nothing to hand on
+
+    def __init__(self, folder_paths, on_changes, extensions):
+        self.folder_paths = list(folder_paths)
+        self.on_changes = on_changes
+        self.extensions = extensions
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.close()
+
+    def close(self):
+        pass
+
+    @abc.abstractmethod
+    def read_changes(self, timeout):
+        """Wait up to timeout seconds and return the paths that changed, or an empty set."""
+
+    def is_relevant(self, path, is_folder):
+        return is_folder or path.lower().endswith(self.extensions)
+
+    def run(self):
+        batch = set()
+        batch_started = last_event = None
+        while not self.stop_event.is_set():
+            if batch:
+                now = time.monotonic()
+                timeout = max(0.0, min(last_event + BATCH_QUIET_SECONDS, batch_started + BATCH_MAX_SECONDS) - now)
+            else:
+                timeout = self.idle_timeout
+            try:
+                changes = self.read_changes(timeout)
+            except Exception as e:
+                logger.exception("An error occurred while watching the library: %s", e)
+                changes = set()
+                self.stop_event.wait(1.0)
+            if changes:
+                last_event = time.monotonic()
+                if not batch:
+                    batch_started = last_event
+                batch |= changes
+            if batch and time.monotonic() >= min(last_event + BATCH_QUIET_SECONDS, batch_started + BATCH_MAX_SECONDS):
+                try:
+                    self.on_changes(batch)
+                except Exception as e:
+                    logger.exception("An error occurred while applying library changes: %s", e)
+                batch = set()
+
+
+class InotifyWatcher(LibraryWatcher):
+    """Linux watcher on top of inotify, one watch per folder of the library tree.
+
+    A watch follows its folder when the folder is moved, so a moved folder's watches are
+    dropped (the folder and everything below it) and the tree is watched again under the
+    new name if it was moved within the library. If the system runs out of watches for a
+    new folder, inotify is closed and a PollingWatcher takes over from then on.
+    """
+
+    def __init__(self, folder_paths, on_changes, extensions):
+        super().__init__(folder_paths, on_changes, extensions)
+        libc_name = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}  # watch descriptor -> folder path
+        self.poller = None  # the PollingWatcher read_changes() hands over to, once out of watches
+        try:
+            for folder_path in self.folder_paths:
+                self.watch_tree(folder_path)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def watch_tree(self, folder_path):
+        """Watch a folder and every folder below it."""
+        folders = [folder_path]
+        while folders:
+            folder = folders.pop()
+            watch = self.libc.inotify_add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+            if watch < 0:
+                error = ctypes.get_errno()
+                if error in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                    continue  # gone again, or not ours to read
+                # ENOSPC: out of watches (fs.inotify.max_user_watches), the caller falls back to polling
+                raise OSError(error, f"inotify_add_watch failed for {folder}")
+            self.watches[watch] = folder
+            try:
+                with os.scandir(folder) as entries:
+                    folders.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                continue
+
+    def unwatch_tree(self, folder_path):
+        """Stop watching a folder and every folder below it, under the path they were watched at."""
+        below = os.path.join(folder_path, "")
+        for watch, folder in list(self.watches.items()):
+            if folder == folder_path or folder.startswith(below):
+                del self.watches[watch]
+                self.libc.inotify_rm_watch(self.fd, watch)  # its IN_IGNORED finds nothing left to drop
+
+    def read_changes(self, timeout):
+        if self.poller is not None:
+            return self.poller.read_changes(timeout)
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changes = set()
+        out_of_watches = False
+        offset = 0
+        while offset < len(data):
+            watch, mask, _, name_length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_length].rstrip(b"\0"))
+            offset += name_length
+
+            if mask & IN_Q_OVERFLOW:
+                # events were dropped, all we know is that anything may have changed
+                changes.update(self.folder_paths)
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(watch, None)
+                continue
+            folder = self.watches.get(watch)
+            if folder is None:
+                continue
+            if mask & IN_MOVE_SELF:
+                # only a library folder itself gets here; one below it went with IN_MOVED_FROM
+                self.unwatch_tree(folder)
+                changes.add(folder)
+                continue
+            if not name:
+                continue
+            path = os.path.join(folder, name)
+            is_folder = bool(mask & IN_ISDIR)
+            if is_folder and mask & IN_MOVED_FROM:
+                self.unwatch_tree(path)
+            if is_folder and mask & (IN_CREATE | IN_MOVED_TO) and not out_of_watches:
+                try:
+                    self.watch_tree(path)
+                except OSError as e:
+                    logger.exception("An error occurred while watching a new folder: %s", e)
+                    out_of_watches = e.errno == errno.ENOSPC
+            if self.is_relevant(path, is_folder):
+                changes.add(path)
+        if out_of_watches:
+            self.poll_instead()
+        return changes
+
+    def poll_instead(self):
+        """Let go of inotify and hand read_changes() over to a PollingWatcher."""
+        self.close()
+        self.watches = {}
+        self.poller = PollingWatcher(self.folder_paths, self.on_changes, self.extensions)
+        self.poller.stop_event = self.stop_event
+        self.idle_timeout = self.poller.idle_timeout
+
+
+class PollingWatcher(LibraryWatcher):
+    """Fallback that walks the library every few seconds and compares it to the last walk."""
+
+    idle_timeout = POLL_INTERVAL_SECONDS
+
+    def __init__(self, folder_paths, on_changes, extensions):
+        super().__init__(folder_paths, on_changes, extensions)
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self):
+        snapshot = {}
+        for folder_path in self.folder_paths:
+            folders = [folder_path]
+            while folders:
+                folder = folders.pop()
+                try:
+                    with os.scandir(folder) as entries:
+                        for entry in entries:
+                            try:
+                                if entry.is_dir(follow_symlinks=False):
+                                    folders.append(entry.path)
+                                elif self.is_relevant(entry.path, False) and entry.is_file():
+                                    file_stat = entry.stat()
+                                    snapshot[entry.path] = (file_stat.st_mtime, file_stat.st_size)
+                            except OSError:
+                                continue
+                except OSError:
+                    continue
+        return snapshot
+
+    def read_changes(self, timeout):
+        if self.stop_event.wait(timeout):
+            return set()
+        snapshot = self.take_snapshot()
+        changes = {path for path, state in snapshot.items() if self.snapshot.get(path) != state}
+        changes.update(path for path in self.snapshot if path not in snapshot)
+        self.snapshot = snapshot
+        return changes
+
+
+def watch_library(folder_paths, on_changes, extensions):
+    """Start watching folder_paths with inotify where it's available, polling otherwise."""
+    watcher = None
+    if sys.platform.startswith("linux"):
+        try:
+            watcher = InotifyWatcher(folder_paths, on_changes, extensions)
+        except (OSError, AttributeError) as e:
+            logger.exception("An error occurred while setting up inotify, polling instead: %s", e)
+    if watcher is None:
+        watcher = PollingWatcher(folder_paths, on_changes, extensions)
+    watcher.start()
+    return watcher
@@ -0,0 +1,189 @@
+import heapq
+import itertools
+import mmap
+import os
+import threading
+import numpy as np
+from backend.all_func_decoding import open_audio
+from backend.logger import setup_logger
+logger = setup_logger()
+
+WAVEFORM_PATH = "waveforms.bin"
+WAVEFORM_BUCKETS = 2048  # min/max pairs per track, whatever its length
+RECORD_BYTES = WAVEFORM_BUCKETS * 2  # one int8 min and one int8 max per bucket
+DECODE_BLOCK_FRAMES = 65536
+PRIORITY_NOW = 0  # the playing and the next track
+PRIORITY_LIBRARY = 1
+COMPACT_FREE_SHARE = 0.25  # waveforms.bin is compacted on open once this much of it is free slots
+
+
+def compute_peaks(file_path, buckets=WAVEFORM_BUCKETS):
+    """Decode a file and reduce it to (buckets, 2) int8 min/max peaks, one block at a time."""
+    _, _, total_frames, blocks = open_audio(file_path, DECODE_BLOCK_FRAMES)
+    lows = np.zeros(buckets, dtype=np.float32)
+    highs = np.zeros(buckets, dtype=np.float32)
+    position = 0
+    for block in blocks:
+        # every frame belongs to bucket frame * buckets // total_frames; reduce each run of equal buckets
+        bucket_of_frame = np.arange(position, position + len(block), dtype=np.int64) * buckets // max(total_frames, 1)
+        bucket_of_frame = np.minimum(bucket_of_frame, buckets - 1)
+        starts = np.flatnonzero(np.diff(bucket_of_frame, prepend=-1))
+        touched = bucket_of_frame[starts]
+        lows[touched] = np.minimum(lows[touched], np.minimum.reduceat(block.min(axis=1), starts))
+        highs[touched] = np.maximum(highs[touched], np.maximum.reduceat(block.max(axis=1), starts))
+        position += len(block)
+    return np.round(np.clip(np.stack([lows, highs], axis=1), -1.0, 1.0) * 127).astype(np.int8)
+
+
+class WaveformStore:
+    """Waveforms of the library in one file of fixed-size records, read through a memory map.
+
+    A waveform is found by its slot alone and reading one is a zero-copy view into the map.
+    Which slot belongs to which file (and whether the file has changed since) is kept in the
+    library index. A changed file's waveform is rewritten in its own slot; the slots of
+    files that have left the index are freed when the store is opened and taken by new
+    waveforms before the file grows. Once free slots are COMPACT_FREE_SHARE of the file,
+    the records at its end are moved into them and the file is cut short, before it's mapped.
+    """
+
+    def __init__(self, library_index, path=WAVEFORM_PATH):
+        self.library_index = library_index
+        self.path = path
+        self.lock = threading.Lock()
+        self.map = None
+        try:
+            slot_count = os.path.getsize(path) // RECORD_BYTES
+        except OSError:
+            slot_count = 0
+        library_index.prune_waveform_slots(slot_count)
+        self.slots = library_index.load_waveform_slots()
+        used = {slot for _, _, slot in self.slots.values()}
+        self.free_slots = [slot for slot in range(slot_count) if slot not in used]  # ascending, so already a heap
+        if len(self.free_slots) > slot_count * COMPACT_FREE_SHARE:
+            self.compact(slot_count)
+
+    def compact(self, slot_count):
+        """Move the records past the last slot that's needed into the free slots below it, then truncate.
+
+        Records are copied before the index points at them, and the file is cut only after,
+        so a crash at any point leaves every slot the index knows intact.
+        """
+        live_count = len(self.slots)
+        targets = iter(slot for slot in self.free_slots if slot < live_count)
+        moves = []
+        try:
+            with open(self.path, "r+b") as waveform_file:
+                for path, (date_modified, size, slot) in sorted(self.slots.items(), key=lambda item: item[1][2]):
+                    if slot < live_count:
+                        continue
+                    target = next(targets)
+                    waveform_file.seek(slot * RECORD_BYTES)
+                    record = waveform_file.read(RECORD_BYTES)
+                    waveform_file.seek(target * RECORD_BYTES)
+                    waveform_file.write(record)
+                    moves.append((target, path))
+                waveform_file.flush()
+                os.fsync(waveform_file.fileno())
+                if not self.library_index.move_waveform_slots(moves):
+                    return
+                for target, path in moves:
+                    self.slots[path] = self.slots[path][:2] + (target,)
+                waveform_file.truncate(live_count * RECORD_BYTES)
+        except OSError as e:
+            logger.exception("An error occurred while compacting waveforms: %s", e)
+            return
+        self.free_slots = []
+
+    def get(self, file_metadata):
+        """The (WAVEFORM_BUCKETS, 2) int8 peaks of a track, or None if they aren't stored yet."""
+        known = self.slots.get(file_metadata.path)
+        if known is None or known[:2] != (file_metadata.date_modified, file_metadata.size):
+            return None
+        offset = known[2] * RECORD_BYTES
+        with self.lock:
+            if self.map is None or len(self.map) < offset + RECORD_BYTES:
+                self.remap()
+            if self.map is None or len(self.map) < offset + RECORD_BYTES:
+                return None
+            return np.frombuffer(self.map, dtype=np.int8, count=RECORD_BYTES, offset=offset).reshape(WAVEFORM_BUCKETS, 2)
+
+    def put(self, file_metadata, peaks):
+        with self.lock:
+            known = self.slots.get(file_metadata.path)
+            if known is not None or self.free_slots:
+                # a changed file keeps its slot, a new one takes the first free slot
+                slot = known[2] if known is not None else heapq.heappop(self.free_slots)
+                with open(self.path, "r+b") as waveform_file:
+                    waveform_file.seek(slot * RECORD_BYTES)
+                    waveform_file.write(peaks.tobytes())
+            else:
+                with open(self.path, "ab") as waveform_file:
+                    size = waveform_file.seek(0, os.SEEK_END)
+                    slot = -(-size // RECORD_BYTES)
+                    if size != slot * RECORD_BYTES:
+                        # a write that was cut short; pad it so every record stays aligned
+                        waveform_file.write(bytes(slot * RECORD_BYTES - size))
+                    waveform_file.write(peaks.tobytes())
+        self.library_index.store_waveform_slot(file_metadata.path, file_metadata.date_modified, file_metadata.size, slot)
+        self.slots[file_metadata.path] = (file_metadata.date_modified, file_metadata.size, slot)
+
+    def remap(self):
+        # a map can't grow, so a file that has had records appended is mapped again
+        try:
+            with open(self.path, "rb") as waveform_file:
+                if os.fstat(waveform_file.fileno()).st_size == 0:
+                    return
+                self.map = mmap.mmap(waveform_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            self.map = None
+
+
+class WaveformGenerator:
+    """Computes missing waveforms on a background thread.
+
+    The whole library is queued at PRIORITY_LIBRARY; the playing and the next track are
+    requested at PRIORITY_NOW and jump the queue. on_ready(path) is called for each new
+    waveform.
+    """
+
+    def __init__(self, store, on_ready=None):
+        self.store = store
+        self.on_ready = on_ready
+        self.queue = []  # heap of (priority, order, file_metadata)
+        self.queued = {}  # path -> best priority it is queued at
+        self.order = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def request(self, music_files, priority=PRIORITY_NOW):
+        """Queue the tracks whose waveform is missing."""
+        with self.condition:
+            for file_metadata in music_files:
+                if self.queued.get(file_metadata.path, priority + 1) <= priority or self.store.get(file_metadata) is not None:
+                    continue
+                self.queued[file_metadata.path] = priority
+                heapq.heappush(self.queue, (priority, next(self.order), file_metadata))
+            if self.queue and self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+                priority, _, file_metadata = heapq.heappop(self.queue)
+                if self.queued.get(file_metadata.path) != priority:
+                    continue  # queued again at a better priority, or already done
+                del self.queued[file_metadata.path]
+            if self.store.get(file_metadata) is not None:
+                continue
+            try:
+                peaks = compute_peaks(file_metadata.path)
+            except Exception as e:
+                logger.exception("An error occurred while computing a waveform: %s", e)
+                continue
+            self.store.put(file_metadata, peaks)
+            if self.on_ready is not None:
+                self.on_ready(file_metadata.path)
@@ -0,0 +1,168 @@
+"""Build and inspect a library index without starting the player.
+
+Scan a large library once, on any machine, and copy the index (and the thumbnails
+in the assets folder) to the players that use it.
+
+Run from the project root:
+    python -m backend.library_cli [--index FILE] [--assets DIR] scan FOLDER... [--workers N] [--processes]
+    python -m backend.library_cli stats [FOLDER...] [--json]
+    python -m backend.library_cli search QUERY [FOLDER...] [--limit N]
+    python -m backend.library_cli verify [FOLDER...]
+    python -m backend.library_cli duplicates [FOLDER...] [--workers N]
+    python -m backend.library_cli playlist FILE [FOLDER...]
+
+Without folders, stats, search, verify and duplicates cover every folder in the index,
+and playlist resolves against all of it.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from backend import all_func_thumbnails
+from backend.all_func_duplicates import DuplicateFinder
+from backend.all_func_library_engine import LibraryEngine
+from backend.all_func_library_index import INDEX_PATH, LibraryIndex, format_duration
+from backend.all_func_playlists import Playlist
+
+
+def absolute_folders(folders):
+    return [os.path.abspath(folder) for folder in folders] if folders else None
+
+
+def scan(engine, args):
+    started = time.perf_counter()
+    found = 0
+
+    def on_tracks(rows):
+        nonlocal found
+        found += len(rows)
+        print(f"\r{found} tracks found", end="", file=sys.stderr, flush=True)
+
+    parsed = engine.scan(absolute_folders(args.folders), on_tracks=on_tracks, workers=args.workers, use_processes=args.processes)
+    print(file=sys.stderr)
+    print(f"{len(engine.music_files)} tracks in {len(engine.folder_paths)} folders, {parsed} parsed, {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+def stats(engine, args):
+    engine.load_index(absolute_folders(args.folders))
+    library_stats = engine.stats()
+    if args.json:
+        print(json.dumps(library_stats, indent=2))
+        return 0
+    print(f"folders:  {library_stats['folders']}")
+    print(f"tracks:   {library_stats['tracks']}")
+    for file_type, count in library_stats["by_type"].items():
+        print(f"  {file_type}: {count}")
+    print(f"duration: {format_duration(library_stats['total_duration_seconds'])}")
+    print(f"size:     {library_stats['total_size_bytes'] / 1024 / 1024:.1f} MB")
+    print(f"covers:   {library_stats['with_cover']} tracks, {library_stats['covers']} thumbnails")
+    print(f"tags:     {library_stats['artists']} artists, {library_stats['albums']} albums, {library_stats['genres']} genres")
+    return 0
+
+
+def search(engine, args):
+    engine.load_index(absolute_folders(args.folders))
+    results = engine.search(args.query.lower())
+    for _, file_metadata in results[:args.limit]:
+        print(f"{file_metadata.duration:>8}  {file_metadata.path}")
+    if len(results) > args.limit:
+        print(f"... {len(results) - args.limit} more", file=sys.stderr)
+    return 0
+
+
+def verify(engine, args):
+    problems = engine.verify(absolute_folders(args.folders))
+    for kind, paths in problems.items():
+        for path in paths:
+            print(f"{kind}: {path}")
+    print(", ".join(f"{len(paths)} {kind}" for kind, paths in problems.items()), file=sys.stderr)
+    return 1 if any(problems.values()) else 0
+
+
+def duplicates(engine, args):
+    engine.load_index(absolute_folders(args.folders))
+
+    def on_progress(done, total):
+        print(f"\r{done}/{total} tracks fingerprinted", end="", file=sys.stderr, flush=True)
+
+    finder = DuplicateFinder(engine.library_index, on_progress=on_progress)
+    finder.find(engine.music_files, workers=args.workers).join()
+    print(file=sys.stderr)
+    groups = [engine.rows(group) for group in finder.groups]
+    for number, rows in enumerate(sorted(groups, key=lambda rows: rows[0][1].path)):
+        if number:
+            print()
+        for _, file_metadata in rows:
+            print(f"{file_metadata.duration:>8}  {file_metadata.path}")
+    print(f"{len(groups)} groups of duplicates", file=sys.stderr)
+    return 0
+
+
+def playlist(engine, args):
+    engine.load_index(absolute_folders(args.folders))
+    started = time.perf_counter()
+    opened = Playlist(args.file, engine, engine.library_index)
+    resolved = time.perf_counter() - started
+    opened.complete()
+    for file_metadata in opened.tracks:
+        print(f"{file_metadata.duration:>8}  {file_metadata.path}")
+    in_library = len(opened.tracks) - opened.from_index - opened.stand_ins
+    print(
+        f"{len(opened.tracks)} tracks: {in_library} in the library, {opened.from_index} from the index, "
+        f"{opened.stand_ins} parsed; {opened.skipped} skipped; resolved in {resolved * 1000:.0f}ms",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", default=INDEX_PATH, help="library index database (default: %(default)s)")
+    parser.add_argument("--assets", help="folder the cover thumbnails are written to (default: the player's assets)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan_parser = commands.add_parser("scan", help="scan folders into the index")
+    scan_parser.add_argument("folders", nargs="+")
+    scan_parser.add_argument("--workers", type=int, help="files parsed at once (default: one per CPU)")
+    scan_parser.add_argument("--processes", action="store_true", help="parse on processes instead of threads")
+    scan_parser.set_defaults(run=scan)
+
+    stats_parser = commands.add_parser("stats", help="summarise what the index holds")
+    stats_parser.add_argument("folders", nargs="*")
+    stats_parser.add_argument("--json", action="store_true")
+    stats_parser.set_defaults(run=stats)
+
+    search_parser = commands.add_parser("search", help="find tracks by name")
+    search_parser.add_argument("query")
+    search_parser.add_argument("folders", nargs="*")
+    search_parser.add_argument("--limit", type=int, default=50)
+    search_parser.set_defaults(run=search)
+
+    verify_parser = commands.add_parser("verify", help="compare the index with the folders on disk; exits 1 if they differ")
+    verify_parser.add_argument("folders", nargs="*")
+    verify_parser.set_defaults(run=verify)
+
+    duplicates_parser = commands.add_parser("duplicates", help="find tracks that sound the same, by audio fingerprint")
+    duplicates_parser.add_argument("folders", nargs="*")
+    duplicates_parser.add_argument("--workers", type=int, help="files decoded at once (default: one per CPU but one)")
+    duplicates_parser.set_defaults(run=duplicates)
+
+    playlist_parser = commands.add_parser("playlist", help="resolve the entries of an M3U/M3U8 playlist against the library")
+    playlist_parser.add_argument("file")
+    playlist_parser.add_argument("folders", nargs="*")
+    playlist_parser.set_defaults(run=playlist)
+
+    args = parser.parse_args(argv)
+    if args.assets:
+        all_func_thumbnails.set_assets_dir(os.path.abspath(args.assets))
+    library_index = LibraryIndex(args.index)
+    try:
+        return args.run(LibraryEngine(library_index), args)
+    finally:
+        library_index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,8 @@ import logging
 
 def setup_logger():
     logger = logging.getLogger('my_logger')
+    if logger.handlers:
+        return logger  # every module calls this; one handler, or each error is written once per module
     logger.setLevel(logging.ERROR)
 
     file_handler = logging.FileHandler('player_log.log')
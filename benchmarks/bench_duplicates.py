@@ -0,0 +1,137 @@
+"""Duplicate detection: how well fingerprints survive re-encoding, and the LSH index against comparing every pair.
+
+The first part writes synthetic songs (decaying chords on a beat) as 44.1 kHz stereo
+WAV, plus altered copies of each, and fingerprints them all through fingerprint_file;
+a copy should land well inside MAX_DISTANCE of its original and unrelated songs well
+outside it. The second part plants near-duplicates among random fingerprints and times
+DuplicateIndex on them, with the share of planted pairs it finds.
+
+Run from the project root:  python -m benchmarks.bench_duplicates [--songs 12] [--sizes 10000 50000]
+"""
+import argparse
+import os
+import tempfile
+import time
+import wave
+import numpy as np
+from backend.all_func_duplicates import FINGERPRINT_BYTES, MAX_DISTANCE, DuplicateIndex, fingerprint_file
+
+NOTES_HZ = [220, 247, 262, 294, 330, 349, 392, 440, 494, 523, 587, 659, 698, 784, 880, 988]
+BEAT_SECONDS = 0.4
+ALL_PAIRS_SAMPLE = 4000  # tracks the all-pairs comparison is timed on, then scaled up
+
+
+def song(seed, seconds, sample_rate):
+    """A chord of three random notes on every beat, each fading out, over a little noise."""
+    rng = np.random.default_rng(seed)
+    samples = rng.standard_normal(int(seconds * sample_rate)) * 0.005
+    ring = np.arange(int(BEAT_SECONDS * 1.5 * sample_rate)) / sample_rate
+    for beat in range(int(seconds / BEAT_SECONDS)):
+        start = int(beat * BEAT_SECONDS * sample_rate)
+        chord = sum(np.sin(2 * np.pi * note * ring + rng.random() * 6) for note in rng.choice(NOTES_HZ, 3))
+        piece = (chord * np.exp(-ring * 4) * 0.2)[:len(samples) - start]
+        samples[start:start + len(piece)] += piece
+    return samples
+
+
+def write_wav(path, samples, sample_rate):
+    stereo = (np.clip(np.repeat(samples[:, np.newaxis], 2, axis=1), -1, 1) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(stereo.tobytes())
+
+
+def distance(first, second):
+    return int(np.bitwise_count(np.frombuffer(first, dtype=np.uint8) ^ np.frombuffer(second, dtype=np.uint8)).sum())
+
+
+def fingerprint_robustness(songs, seconds):
+    rate = 44100
+    rng = np.random.default_rng(0)
+    variants = {
+        "-6 dB": lambda samples: (samples * 0.5, rate),
+        "noise at -40 dB": lambda samples: (samples + rng.standard_normal(len(samples)) * 0.002, rate),
+        "22.05 kHz": lambda samples: (samples[::2], rate // 2),
+        "starts 40 ms later": lambda samples: (np.concatenate([np.zeros(int(0.04 * rate)), samples]), rate),
+        "cut 40 ms into it": lambda samples: (samples[int(0.04 * rate):], rate),
+    }
+    with tempfile.TemporaryDirectory() as folder:
+        originals = []
+        copies = {name: [] for name in variants}
+        for number in range(songs):
+            samples = song(number, seconds, rate)
+            path = os.path.join(folder, f"song_{number}.wav")
+            write_wav(path, samples, rate)
+            originals.append(path)
+            for variant_number, (name, alter) in enumerate(variants.items()):
+                copy_path = os.path.join(folder, f"song_{number}_{variant_number}.wav")
+                write_wav(copy_path, *alter(samples))
+                copies[name].append(copy_path)
+
+        started = time.perf_counter()
+        fingerprints = [fingerprint_file(path) for path in originals]
+        per_track = (time.perf_counter() - started) / songs
+        print(f"{songs} songs of {seconds:g} s, 44.1 kHz stereo WAV: {per_track * 1000:.0f} ms per fingerprint")
+        print(f"bits that differ, out of {FINGERPRINT_BYTES * 8} (same recording up to {MAX_DISTANCE}):")
+        for name, paths in copies.items():
+            distances = [distance(fingerprint, fingerprint_file(path)) for fingerprint, path in zip(fingerprints, paths)]
+            print(f"  {name:<20} mean {np.mean(distances):5.1f}  max {max(distances):3}")
+        unrelated = [distance(fingerprints[a], fingerprints[b]) for a in range(songs) for b in range(a + 1, songs)]
+        print(f"  {'unrelated songs':<20} mean {np.mean(unrelated):5.1f}  min {min(unrelated):3}")
+
+
+def planted_library(size, rng):
+    """Random fingerprints, one in 50 with a copy that has 2-10% of its bits flipped."""
+    fingerprints = rng.integers(0, 256, (size, FINGERPRINT_BYTES), dtype=np.uint8)
+    originals = np.arange(0, size, 50)
+    copies = fingerprints[originals].copy()
+    bits = np.unpackbits(copies, axis=1)
+    flip_rate = rng.uniform(0.02, 0.10, (len(originals), 1))
+    bits ^= (rng.random(bits.shape) < flip_rate).astype(np.uint8)
+    fingerprints = np.concatenate([fingerprints, np.packbits(bits, axis=1)])
+    planted = {(int(original), size + number) for number, original in enumerate(originals)}
+    return [(index, fingerprint.tobytes()) for index, fingerprint in enumerate(fingerprints)], planted
+
+
+def all_pairs_seconds(fingerprints):
+    """Time to compare every pair of fingerprints, row against the rows after it."""
+    started = time.perf_counter()
+    for row in range(len(fingerprints) - 1):
+        np.bitwise_count(fingerprints[row] ^ fingerprints[row + 1:]).sum(axis=1)
+    return time.perf_counter() - started
+
+
+def index_speed(sizes):
+    rng = np.random.default_rng(1)
+    print(f"\n{'tracks':>8} | {'LSH index':>10} | {'pairs compared':>14} | {'planted found':>13} | {'all pairs (est.)':>16}")
+    for size in sizes:
+        entries, planted = planted_library(size, rng)
+        started = time.perf_counter()
+        duplicate_index = DuplicateIndex(entries)
+        compared = len(duplicate_index.candidate_pairs()[0])
+        groups = duplicate_index.groups()
+        lsh_seconds = time.perf_counter() - started
+        found = {tuple(sorted(group)) for group in groups if len(group) == 2}
+        sample = duplicate_index.fingerprints[:ALL_PAIRS_SAMPLE]
+        all_pairs = all_pairs_seconds(sample) * (len(entries) / len(sample)) ** 2
+        print(
+            f"{len(entries):>8} | {lsh_seconds * 1000:>8.0f}ms | {compared:>14} | "
+            f"{len(planted & found) / len(planted):>13.1%} | {all_pairs:>15.1f}s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--songs", type=int, default=12)
+    parser.add_argument("--seconds", type=float, default=40, help="length of every song")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000], help="tracks in the index test")
+    args = parser.parse_args()
+
+    fingerprint_robustness(args.songs, args.seconds)
+    index_speed(args.sizes)
+
+
+if __name__ == "__main__":
+    main()
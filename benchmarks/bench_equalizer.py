@@ -0,0 +1,56 @@
+"""Per-block processing time of the equalizer against the real-time budget.
+
+Run from the project root:  python -m benchmarks.bench_equalizer [--rate 48000] [--seconds 60]
+"""
+import argparse
+import time
+import numpy as np
+from backend.all_func_equalizer import Equalizer
+
+
+def bench(block_frames, sample_rate, channels, seconds, change_every):
+    equalizer = Equalizer(sample_rate, channels)
+    equalizer.set_gains(bass=6.0, mid=-3.0, treble=4.0)
+    rng = np.random.default_rng(0)
+    block = (rng.standard_normal((block_frames, channels)) * 0.1).astype(np.float32)
+    block_count = int(seconds * sample_rate / block_frames)
+
+    timings = []
+    for number in range(block_count):
+        if change_every and number % change_every == 0:
+            # a slider being dragged: new coefficients, so this block is cross-faded
+            equalizer.set_gains(bass=float(number % 24 - 12))
+        start = time.perf_counter()
+        samples = equalizer.process(block)
+        (samples * 32767).astype(np.int16)  # conversion for pygame.sndarray.make_sound
+        timings.append(time.perf_counter() - start)
+
+    timings = np.array(timings) * 1000
+    budget = block_frames / sample_rate * 1000
+    return {
+        "budget_ms": budget,
+        "mean_ms": timings.mean(),
+        "p99_ms": np.percentile(timings, 99),
+        "max_ms": timings.max(),
+        "headroom": budget / np.percentile(timings, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=int, default=48000)
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=60, help="audio processed per configuration")
+    parser.add_argument("--blocks", type=int, nargs="+", default=[1024, 2048, 4096])
+    args = parser.parse_args()
+
+    print(f"{args.rate} Hz, {args.channels} channels, {args.seconds:g} s of audio per row")
+    print(f"{'block':>6} | {'changes':<13} | {'budget ms':>9} | {'mean ms':>8} | {'p99 ms':>7} | {'max ms':>7} | {'headroom':>8}")
+    for block_frames in args.blocks:
+        for change_every, label in ((0, "none"), (10, "every 10th")):
+            result = bench(block_frames, args.rate, args.channels, args.seconds, change_every)
+            print(f"{block_frames:>6} | {label:<13} | {result['budget_ms']:>9.2f} | {result['mean_ms']:>8.3f} | {result['p99_ms']:>7.3f} | {result['max_ms']:>7.3f} | {result['headroom']:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Scan, sort, search and render cost of the player on synthetic libraries, as JSON.
+
+Every library size runs in a fresh interpreter, on a headless page with the real
+MusicPlayer, so peak RSS is per size. For each step it reports wall time, peak RSS so
+far, controls sent to the page and page.update() calls. The libraries are written
+once to --library-dir (a temporary folder by default) and reused from there.
+
+Run from the project root:  python -m benchmarks.bench_library [--sizes 1000 10000 50000] [--library-dir DIR] [--output FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEARCH_QUERIES = ["song 1", "artist 42", "no such track"]
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB elsewhere
+
+
+def measure(folders, work_dir, executor):
+    """Drive one player through the benchmark steps and return their numbers."""
+    os.chdir(work_dir)
+    with open("config.json", "w") as json_file:
+        json.dump({"folder_paths": [], "normalize_loudness": False, "scan_executor": executor}, json_file)
+
+    import backend.all_func_thumbnails
+    backend.all_func_thumbnails.ASSETS_DIR = os.path.join(work_dir, "assets")  # keep the covers out of the project
+    import main
+    from backend.all_func_file_handling import display_files, load_music, search_files, sort_playlist
+    from benchmarks.headless import count_controls, make_page
+
+    page, connection = make_page()
+    main.main(page)
+    player = page.controls[0]
+    player.audio_ready.wait()
+    # waveforms are computed in the background and have a benchmark of their own
+    player.waveform_generator.request = lambda music_files, priority=None: None
+
+    steps = {}
+
+    def step(name, action):
+        connection.reset_counters()
+        started = time.perf_counter()
+        action()
+        steps[name] = {
+            "wall_ms": (time.perf_counter() - started) * 1000,
+            "peak_rss_mb": peak_rss_mb(),
+            "controls_built": connection.added_controls,
+            "page_updates": connection.update_calls,
+        }
+
+    step("load_music (cold index)", lambda: load_music(player, folders).join())
+    step("load_music (warm index)", lambda: load_music(player, folders).join())
+    for _ in range(4):
+        step("sort_playlist", lambda: sort_playlist(player, None))
+        steps[f"sort_playlist ({player.sort_button.tooltip})"] = steps.pop("sort_playlist")
+    for query in SEARCH_QUERIES:
+        player.search_field.value = query
+        step(f"search_files ({query})", lambda: search_files(player, None))
+    player.search_field.value = ""
+    step("display_files", lambda: display_files(player))
+
+    if player.library_watcher is not None:
+        player.library_watcher.stop()
+    return {"tracks": len(player.music_files), "controls_on_page": count_controls(page), "steps": steps}
+
+
+def run_size(folders, executor):
+    """measure() in a fresh interpreter with its own working folder."""
+    environment = dict(os.environ, SDL_AUDIODRIVER=os.environ.get("SDL_AUDIODRIVER", "dummy"))
+    with tempfile.TemporaryDirectory() as work_dir:
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_library", "--measure", work_dir, "--executor", executor, "--folders", *folders],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, env=environment,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def project_version():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--library-dir", help="where the synthetic libraries are written and reused from")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread", help="how the scan parses files")
+    parser.add_argument("--output", help="also write the JSON to this file")
+    parser.add_argument("--measure", metavar="WORK_DIR", help=argparse.SUPPRESS)
+    parser.add_argument("--folders", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.folders, args.measure, args.executor)))
+        return
+
+    from benchmarks.synthetic_library import make_library
+    with tempfile.TemporaryDirectory() as temp_dir:
+        library_dir = args.library_dir or temp_dir
+        results = {
+            "version": project_version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "executor": args.executor,
+            "runs": [],
+        }
+        for size in args.sizes:
+            print(f"writing a library of {size} tracks...", file=sys.stderr)
+            folders = make_library(library_dir, size)
+            print(f"measuring {size} tracks...", file=sys.stderr)
+            results["runs"].append(run_size(folders, args.executor))
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as json_file:
+            json_file.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Loudness analysis throughput, in tracks per minute for one core and for a process pool.
+
+Writes synthetic stereo WAV tracks (pink-ish noise at different levels) to a temporary
+folder, measures them with analyze_file and checks the results against the levels used.
+
+Run from the project root:  python -m benchmarks.bench_loudness [--tracks 24] [--seconds 180]
+"""
+import argparse
+import os
+import tempfile
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from backend.all_func_loudness import analyze_file, measure_loudness
+
+
+def write_track(path, seconds, level_db, sample_rate, seed):
+    rng = np.random.default_rng(seed)
+    noise = rng.standard_normal((int(seconds * sample_rate), 2))
+    # a 1/f tilt so the track isn't all treble, then scaled to the wanted RMS level
+    spectrum = np.fft.rfft(noise, axis=0)
+    spectrum /= np.sqrt(np.maximum(np.arange(len(spectrum)), 1))[:, np.newaxis]
+    shaped = np.fft.irfft(spectrum, n=len(noise), axis=0)
+    shaped *= 10 ** (level_db / 20) / np.sqrt(np.mean(shaped ** 2))
+    samples = (np.clip(shaped, -1, 1) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(samples.tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=24)
+    parser.add_argument("--seconds", type=float, default=180, help="length of every track")
+    parser.add_argument("--rate", type=int, default=44100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = []
+        for number in range(args.tracks):
+            path = os.path.join(folder, f"track_{number}.wav")
+            write_track(path, args.seconds, -30 + number % 5 * 5, args.rate, number)
+            paths.append(path)
+        print(f"{args.tracks} tracks of {args.seconds:g} s, {args.rate} Hz stereo WAV")
+
+        # where the time goes, on one track
+        samples = np.zeros((int(args.seconds * args.rate), 2), dtype=np.float32)
+        measure_loudness(samples[:args.rate], args.rate)  # imports scipy
+        started = time.perf_counter()
+        measure_loudness(samples, args.rate)
+        measure_only = time.perf_counter() - started
+        started = time.perf_counter()
+        analyze_file(paths[0])
+        whole = time.perf_counter() - started
+        print(f"one track: {whole * 1000:.0f} ms, of which {measure_only * 1000:.0f} ms filtering and gating")
+
+        started = time.perf_counter()
+        serial = [analyze_file(path) for path in paths]
+        serial_seconds = time.perf_counter() - started
+        print(f"1 core:     {args.tracks / serial_seconds * 60:8.0f} tracks/min")
+
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            pooled = list(executor.map(analyze_file, paths))
+        pool_seconds = time.perf_counter() - started
+        rate = args.tracks / pool_seconds * 60
+        print(f"{args.workers} workers: {rate:8.0f} tracks/min, {rate / args.workers:.0f} per core")
+
+        assert pooled == serial
+        levels = [loudness for loudness, _ in serial[:5]]
+        print("tracks at -30/-25/-20/-15/-10 dB RMS measured as (LUFS):", " ".join(f"{level:.1f}" for level in levels))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Control count and update cost of the playlist for growing libraries.
+
+Run from the project root:  python -m benchmarks.bench_playlist_view [--sizes 1000 10000 50000]
+"""
+import argparse
+import time
+import flet as ft
+from benchmarks.headless import count_controls, make_page
+from backend.all_func_library_index import Track
+from frontend.playlist_view import PlaylistView
+
+
+def synthetic_items(count):
+    return [
+        (index, Track(
+            f"/music/song_{index}.mp3",
+            f"Artist {index % 500} - Song {index}",
+            1700000000.0 + index,
+            4000000 + index,
+            ".mp3",
+            210.0,
+            f"/thumbnails/{index % 800:040x}.jpg",
+        ))
+        for index in range(count)
+    ]
+
+
+def legacy_rows(items):
+    """The rows the playlist used to build: one full control tree per track."""
+    return [
+        ft.TextButton(
+            content=ft.Row(
+                [
+                    ft.Row(
+                        [
+                            ft.Text(index + 1),
+                            ft.Image(src=file_metadata.album_cover, height=40, width=100),
+                            ft.Text(file_metadata.name)
+                        ],
+                        spacing=0
+                    ),
+                    ft.Text(file_metadata.duration),
+                ],
+                alignment=ft.MainAxisAlignment.SPACE_BETWEEN
+            ),
+            key=index,
+        )
+        for index, file_metadata in items
+    ]
+
+
+class ScrollEvent:
+    def __init__(self, pixels, viewport_dimension):
+        self.pixels = pixels
+        self.viewport_dimension = viewport_dimension
+
+
+def bench_virtualized(items, viewport_height):
+    page, connection = make_page()
+    view = PlaylistView(on_select=lambda index: None, viewport_height=viewport_height)
+    page.add(view)
+    connection.reset_counters()
+
+    start = time.perf_counter()
+    view.set_items(items)
+    show_seconds = time.perf_counter() - start
+    show_bytes = connection.sent_bytes
+
+    connection.reset_counters()
+    start = time.perf_counter()
+    for pixels in range(0, min(len(items), 2000) * 50, 400):  # a long drag, one event every 8 rows
+        view.handle_scroll(ScrollEvent(pixels, viewport_height))
+    scroll_seconds = time.perf_counter() - start
+
+    return {
+        "controls": count_controls(view),
+        "show_ms": show_seconds * 1000,
+        "show_kb": show_bytes / 1024,
+        "scroll_updates": connection.update_calls,
+        "scroll_ms_per_update": scroll_seconds * 1000 / max(connection.update_calls, 1),
+    }
+
+
+def bench_legacy(items):
+    page, connection = make_page()
+    file_list = ft.Column()
+    page.add(file_list)
+    connection.reset_counters()
+
+    start = time.perf_counter()
+    file_list.controls = legacy_rows(items)
+    page.update()
+    show_seconds = time.perf_counter() - start
+    return {
+        "controls": count_controls(file_list),
+        "show_ms": show_seconds * 1000,
+        "show_kb": connection.sent_bytes / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--viewport", type=int, default=600, help="playlist height in pixels")
+    parser.add_argument("--skip-legacy", action="store_true", help="don't build the full Column for comparison")
+    args = parser.parse_args()
+
+    print(f"{'tracks':>8} | {'list':<11} | {'controls':>8} | {'show ms':>9} | {'sent KB':>9} | {'scroll ms/update':>16}")
+    for size in args.sizes:
+        items = synthetic_items(size)
+        result = bench_virtualized(items, args.viewport)
+        print(f"{size:>8} | {'virtualized':<11} | {result['controls']:>8} | {result['show_ms']:>9.1f} | {result['show_kb']:>9.1f} | {result['scroll_ms_per_update']:>16.2f}")
+        if not args.skip_legacy:
+            result = bench_legacy(items)
+            print(f"{size:>8} | {'column':<11} | {result['controls']:>8} | {result['show_ms']:>9.1f} | {result['show_kb']:>9.1f} | {'-':>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Opening large M3U playlists: parse and resolve time, memory, and the linear search it replaces.
+
+Every playlist mixes tracks of the library (80%), tracks of a folder the library index
+holds but the library doesn't (10%) and files that were never scanned (10%); the last
+two are empty files in a temporary folder, so they can be looked at on disk. The time
+is that of Playlist(), which reads the file a line at a time and resolves every entry;
+stand-ins for the unscanned files are made but not parsed. Peak memory is measured with
+tracemalloc on a second run, next to the size of the playlist file itself. The linear
+column estimates looking each entry up by walking music_files, as a list lookup would.
+
+Run from the project root:  python -m benchmarks.bench_playlists [--sizes 10000 100000]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from backend import all_func_thumbnails
+from backend.all_func_library_engine import LibraryEngine
+from backend.all_func_library_index import LibraryIndex, Track
+from backend.all_func_playlists import Playlist, write_m3u
+
+LIBRARY_FOLDER = "/music/library"
+LINEAR_SAMPLE = 200  # entries the linear search is timed on, then scaled up
+
+
+def library_tracks(folder, count):
+    return [
+        Track(
+            f"{folder}/Artist {index % 500}/Artist {index % 500} - Song {index}.mp3",
+            f"Artist {index % 500} - Song {index}", 1700000000.0 + index, 4000000 + index, ".mp3", 150.0 + index % 120,
+            title=f"Song {index}", artist=f"Artist {index % 500}",
+        )
+        for index in range(count)
+    ]
+
+
+def files_on_disk(folder, count, prefix):
+    """Empty .mp3 files, as Tracks that match what os.stat says about them."""
+    tracks = []
+    for index in range(count):
+        path = os.path.join(folder, f"{prefix} {index}.mp3")
+        open(path, "w").close()
+        file_stat = os.stat(path)
+        tracks.append(Track(path, f"{prefix} {index}", file_stat.st_mtime, file_stat.st_size, ".mp3", 200.0))
+    return tracks
+
+
+def linear_seconds(library, paths):
+    """Time to find paths by walking music_files, per entry."""
+    started = time.perf_counter()
+    for path in paths:
+        next((file_metadata for file_metadata in library.music_files if file_metadata.path == path), None)
+    return (time.perf_counter() - started) / len(paths)
+
+
+def bench(size, work_dir):
+    archive_folder = os.path.join(work_dir, f"archive {size}")
+    unscanned_folder = os.path.join(work_dir, f"unscanned {size}")
+    os.makedirs(archive_folder)
+    os.makedirs(unscanned_folder)
+    library_index = LibraryIndex(":memory:")
+    in_library = library_tracks(LIBRARY_FOLDER, size * 8 // 10)
+    archived = files_on_disk(archive_folder, size // 10, "Archived")
+    unscanned = files_on_disk(unscanned_folder, size - len(in_library) - len(archived), "Unscanned")
+    library_index.update_folder(LIBRARY_FOLDER, in_library, [])
+    library_index.update_folder(archive_folder, archived, [])
+    library = LibraryEngine(library_index)
+    library.load_index([LIBRARY_FOLDER])
+
+    # library, archive and unscanned entries take turns, as in a hand-made mix
+    entries = [None] * size
+    entries[0::10] = archived[:len(entries[0::10])]
+    entries[1::10] = unscanned[:len(entries[1::10])]
+    rest = iter(in_library)
+    entries = [entry if entry is not None else next(rest) for entry in entries]
+    playlist_path = os.path.join(work_dir, f"mix {size}.m3u8")
+    started = time.perf_counter()
+    write_m3u(playlist_path, entries)
+    write_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    playlist = Playlist(playlist_path, library, library_index)
+    open_seconds = time.perf_counter() - started
+    assert len(playlist.tracks) == size and not playlist.skipped, (len(playlist.tracks), playlist.skipped)
+
+    tracemalloc.start()
+    Playlist(playlist_path, library, library_index)
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    linear = linear_seconds(library, [file_metadata.path for file_metadata in entries[2:2 + LINEAR_SAMPLE]]) * size
+    library_index.close()
+    print(
+        f"{size:>8} | {write_seconds * 1000:>7.0f}ms | {open_seconds * 1000:>7.0f}ms | "
+        f"{playlist.from_index:>10} | {len(playlist.unparsed):>11} | "
+        f"{peak_bytes / 1024 / 1024:>8.1f}MB | {os.path.getsize(playlist_path) / 1024 / 1024:>7.1f}MB | {linear:>12.1f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        all_func_thumbnails.ASSETS_DIR = work_dir  # none of the tracks has a cover
+        print(
+            f"{'entries':>8} | {'write':>9} | {'open':>9} | {'from index':>10} | {'stand-ins':>11} | "
+            f"{'peak mem':>10} | {'file':>9} | {'linear (est.)':>13}"
+        )
+        for size in args.sizes:
+            bench(size, work_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Cold start of the player: import cost per package and time to first paint, UI and playable.
+
+Every run is a fresh interpreter driving main.main() on a headless page. Without --library
+no folder is configured; with it, the first run builds the library index and later runs
+start from the cached index.
+
+Run from the project root:  python -m benchmarks.bench_startup [--library DIR] [--runs 3] [--json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RUN_PLAYER = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+import main
+from backend.all_func_startup import startup_timer
+from benchmarks.headless import make_page
+page, connection = make_page()
+main.main(page)
+player = page.controls[0]
+player.audio_ready.wait()
+startup_timer.mark("playable")  # what MusicPlayer.report_startup records, its thread may not have run yet
+if player.scan_thread is not None:
+    player.scan_thread.join()  # the library loads in the background, wait for its milestone
+print(json.dumps(startup_timer.as_dict()))
+"""
+
+
+def import_times(module):
+    """Cumulative import time per package, from python -X importtime.
+
+    A package only counts where it is first reached, not again for its own submodules.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        fields = line[len("import time:"):].split("|")
+        if not line.startswith("import time:") or len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2][1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((depth, name.strip().split(".")[0], int(fields[1])))
+
+    # importtime lists a module after everything it imported; reversed, parents come first
+    totals = defaultdict(int)
+    ancestors = []
+    for depth, package, cumulative in reversed(imports):
+        del ancestors[depth:]
+        if package not in ancestors:
+            totals[package] += cumulative
+        ancestors.append(package)
+    return sorted(((package, us / 1000) for package, us in totals.items()), key=lambda item: -item[1])
+
+
+def run_player(work_dir):
+    environment = dict(os.environ, SDL_AUDIODRIVER=os.environ.get("SDL_AUDIODRIVER", "dummy"))
+    result = subprocess.run(
+        [sys.executable, "-c", RUN_PLAYER, PROJECT_ROOT],
+        cwd=work_dir, capture_output=True, text=True, env=environment, timeout=300,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--library", help="music folder to load on start")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = {"imports_ms": import_times("frontend.music_player"), "runs": []}
+    with tempfile.TemporaryDirectory() as work_dir:
+        if args.library:
+            with open(os.path.join(work_dir, "config.json"), "w") as json_file:
+                json.dump({"folder_paths": [os.path.abspath(args.library)]}, json_file)
+        for _ in range(args.runs):
+            results["runs"].append(run_player(work_dir))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("import frontend.music_player, cumulative ms per package:")
+    for package, ms in results["imports_ms"][:12]:
+        print(f"  {package:<24} {ms:8.1f}")
+    milestones = list(results["runs"][0]["milestones_ms"])
+    print()
+    print(f"{'run':>3} | " + " | ".join(f"{milestone:>16}" for milestone in milestones))
+    for number, run in enumerate(results["runs"], 1):
+        print(f"{number:>3} | " + " | ".join(f"{run['milestones_ms'].get(milestone, float('nan')):>16.1f}" for milestone in milestones))
+    print("(ms since launch)")
+
+
+if __name__ == "__main__":
+    main()
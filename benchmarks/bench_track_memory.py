@@ -0,0 +1,99 @@
+"""Bytes per track held by the library, for the old dict records and for Track.
+
+A synthetic library is written to an in-memory index, then read back the way the player
+reads it. The dict column rebuilds the records the player used to keep (a dict per track
+with a preformatted duration); the Track column is what load_folder returns now. Both
+count the strings the records hold, measured with tracemalloc.
+
+Run from the project root:  python -m benchmarks.bench_track_memory [--sizes 1000 10000 50000]
+"""
+import argparse
+import gc
+import os
+import tempfile
+import tracemalloc
+from backend import all_func_thumbnails
+from backend.all_func_library_index import LibraryIndex, Track, format_duration
+from backend.all_func_search import SearchIndex
+
+FOLDER = "/music/library"
+COVERS = 800  # distinct thumbnails, about one per album
+
+
+def synthetic_tracks(count):
+    return [
+        Track(
+            f"{FOLDER}/Artist {index % 500}/Album {index // 10}/Artist {index % 500} - Song {index}.mp3",
+            f"Artist {index % 500} - Song {index}",
+            1700000000.0 + index,
+            4000000 + index,
+            (".mp3", ".opus", ".wav")[index % 3],
+            150.0 + index % 120,
+            f"/thumbnails/{index % COVERS:040x}.jpg" if index % 4 else None,
+        )
+        for index in range(count)
+    ]
+
+
+def legacy_records(library_index):
+    """The dict per track the library was kept as before Track, read straight from the index."""
+    rows = library_index.connection.execute(
+        "SELECT path, name, date_modified, size, type, duration_seconds, album_cover FROM tracks WHERE folder = ?", (FOLDER,),
+    ).fetchall()
+    return [
+        {
+            "name": name,
+            "path": path,
+            "date_modified": date_modified,
+            "size": size,
+            "type": file_type,
+            "duration": format_duration(duration_seconds),
+            "duration_seconds": duration_seconds,
+            "album_cover": album_cover,
+        }
+        for path, name, date_modified, size, file_type, duration_seconds, album_cover in rows
+    ]
+
+
+def measured_bytes(build):
+    """Memory still held by what build() returns, strings included."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as assets_dir:
+        # load_folder skips tracks whose thumbnail has gone, so the covers have to exist
+        all_func_thumbnails.ASSETS_DIR = assets_dir
+        os.makedirs(os.path.join(assets_dir, "thumbnails"))
+        for cover in range(COVERS):
+            open(os.path.join(assets_dir, "thumbnails", f"{cover:040x}.jpg"), "w").close()
+
+        print(f"{'tracks':>8} | {'dict B/track':>12} | {'Track B/track':>13} | {'saved':>6} | {'search index B/track':>20}")
+        for size in args.sizes:
+            library_index = LibraryIndex(":memory:")
+            library_index.update_folder(FOLDER, synthetic_tracks(size), [])
+
+            # every string comes fresh out of SQLite, as it does when the player starts
+            track_bytes, tracks = measured_bytes(lambda: list(library_index.load_folder(FOLDER).values()))
+            dict_bytes, records = measured_bytes(lambda: legacy_records(library_index))
+            search_bytes, _ = measured_bytes(lambda: SearchIndex(track.name for track in tracks))
+            library_index.close()
+            del records
+            print(
+                f"{size:>8} | {dict_bytes / size:>12.0f} | {track_bytes / size:>13.0f} | "
+                f"{1 - track_bytes / dict_bytes:>6.0%} | {search_bytes / size:>20.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
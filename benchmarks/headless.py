@@ -0,0 +1,53 @@
+"""A real ft.Page wired to an in-process connection, so UI code can run without a client."""
+import asyncio
+import json
+import flet as ft
+from flet.core.local_connection import LocalConnection
+from flet.core.protocol import CommandEncoder, PageCommandsBatchResponsePayload
+
+
+class HeadlessConnection(LocalConnection):
+    """Processes page commands like the desktop server does, but counts them instead of sending."""
+
+    def __init__(self):
+        super().__init__()
+        self.update_calls = 0
+        self.added_controls = 0
+        self.sent_bytes = 0
+
+    def send_command(self, session_id, command):
+        return self.send_commands(session_id, [command])
+
+    def send_commands(self, session_id, commands):
+        self.update_calls += 1
+        results = []
+        messages = []
+        for command in commands:
+            result, message = self._process_command(command)
+            if command.name == "add":
+                self.added_controls += len(result.split())
+            if command.name in ["add", "get"]:
+                results.append(result)
+            if message:
+                messages.append(message)
+        if messages:
+            self.sent_bytes += len(json.dumps(messages, cls=CommandEncoder, separators=(",", ":")))
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+    def reset_counters(self):
+        self.update_calls = 0
+        self.added_controls = 0
+        self.sent_bytes = 0
+
+
+def make_page(width=1280, height=800):
+    connection = HeadlessConnection()
+    page = ft.Page(connection, "headless", asyncio.new_event_loop())
+    page._set_attr("width", width)
+    page._set_attr("height", height)
+    return page, connection
+
+
+def count_controls(control):
+    """Number of controls in the tree under (and including) control."""
+    return 1 + sum(count_controls(child) for child in control._get_children())
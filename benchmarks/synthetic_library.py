@@ -0,0 +1,152 @@
+"""Synthetic music libraries for the benchmarks: tagged MP3, Opus and WAV files with embedded covers.
+
+A library is built from folders of FOLDER_TRACKS tracks. A finished folder is marked as
+such and reused on the next run, so a big library only has to be written once.
+"""
+import base64
+import io
+import os
+import struct
+
+FOLDER_TRACKS = 500
+TRACKS_PER_ALBUM = 10
+ARTISTS = 300
+GENRES = ["Rock", "Jazz", "Electronic", "Classical", "Hip-Hop", "Folk", "Ambient", "Pop"]
+COVER_SIZES = [None, 300, 600, 1200]  # pixels, cycled album by album; None is an album without a cover
+FORMATS = [".mp3", ".opus", ".wav"]
+TRACK_SECONDS = 1.0
+COMPLETE_MARKER = ".complete"
+
+
+def track_tags(number):
+    album = number // TRACKS_PER_ALBUM
+    artist = album % ARTISTS
+    return {
+        "title": f"Song {number}",
+        "artist": f"Artist {artist}",
+        "album": f"Album {album}",
+        "genre": GENRES[album % len(GENRES)],
+        "tracknumber": str(number % TRACKS_PER_ALBUM + 1),  # the Vorbis comment name
+        "date": str(1960 + album % 60),
+    }
+
+
+def cover_jpeg(album, size):
+    """A gradient cover, different for every album, JPEG-encoded like a real one."""
+    from PIL import Image
+    gradient = Image.linear_gradient("L").resize((size, size))
+    hue = (album * 47) % 256
+    image = Image.merge("RGB", (gradient, gradient.point(lambda value: (value + hue) % 256), gradient.rotate(90)))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def mp3_audio(seconds):
+    """Silent MPEG-1 Layer III frames, 128 kbit/s at 44.1 kHz."""
+    frame_count = int(seconds * 44100 / 1152)
+    frames = []
+    for number in range(frame_count):
+        # 417 bytes per frame, plus a padding byte on every third one to average 128 kbit/s
+        padding = 1 if number % 3 == 2 else 0
+        frames.append(bytes([0xFF, 0xFB, 0x90 | padding << 1, 0x64]) + bytes(413 + padding))
+    return b"".join(frames)
+
+
+def opus_audio(seconds):
+    """A mono Ogg Opus stream of silent 20 ms packets."""
+    from mutagen.ogg import OggPage
+    serial = 0x5EED
+    pre_skip = 312
+    head = OggPage()
+    head.serial, head.sequence, head.first = serial, 0, True
+    head.packets = [b"OpusHead" + struct.pack("<BBHIhB", 1, 1, pre_skip, 48000, 0, 0)]
+    vendor = b"synthetic"
+    tags = OggPage()
+    tags.serial, tags.sequence = serial, 1
+    tags.packets = [b"OpusTags" + struct.pack("<I", len(vendor)) + vendor + struct.pack("<I", 0)]
+    pages = [head, tags]
+    packets = int(seconds * 50)
+    for start in range(0, packets, 250):
+        page = OggPage()
+        page.serial, page.sequence = serial, len(pages)
+        page.packets = [b"\xf8\xff\xfe"] * min(250, packets - start)
+        page.position = pre_skip + (start + len(page.packets)) * 960
+        pages.append(page)
+    pages[-1].last = True
+    return b"".join(page.write() for page in pages)
+
+
+def wav_audio(seconds):
+    """Silent 8 kHz mono 16-bit PCM."""
+    data_size = int(seconds * 8000) * 2
+    header = b"RIFF" + struct.pack("<I", 36 + data_size) + b"WAVE"
+    header += b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, 8000, 16000, 2, 16)
+    return header + b"data" + struct.pack("<I", data_size) + bytes(data_size)
+
+
+def id3_tags(tags, cover):
+    from mutagen.id3 import ID3, APIC, TALB, TCON, TDRC, TIT2, TPE1, TRCK
+    id3 = ID3()
+    id3.add(TIT2(encoding=3, text=tags["title"]))
+    id3.add(TPE1(encoding=3, text=tags["artist"]))
+    id3.add(TALB(encoding=3, text=tags["album"]))
+    id3.add(TCON(encoding=3, text=tags["genre"]))
+    id3.add(TRCK(encoding=3, text=tags["tracknumber"]))
+    id3.add(TDRC(encoding=3, text=tags["date"]))
+    if cover is not None:
+        id3.add(APIC(encoding=3, mime="image/jpeg", type=3, desc="Cover", data=cover))
+    return id3
+
+
+def write_track(path, number, cover):
+    """Write one tagged track; the format is picked from the extension of path."""
+    tags = track_tags(number)
+    extension = os.path.splitext(path)[1]
+    if extension == ".mp3":
+        with open(path, "wb") as audio_file:
+            audio_file.write(mp3_audio(TRACK_SECONDS))
+        id3_tags(tags, cover).save(path)
+    elif extension == ".wav":
+        from mutagen.wave import WAVE
+        with open(path, "wb") as audio_file:
+            audio_file.write(wav_audio(TRACK_SECONDS))
+        audio = WAVE(path)
+        audio.add_tags()
+        for frame in id3_tags(tags, cover).values():
+            audio.tags.add(frame)
+        audio.save()
+    else:
+        from mutagen.flac import Picture
+        from mutagen.oggopus import OggOpus
+        with open(path, "wb") as audio_file:
+            audio_file.write(opus_audio(TRACK_SECONDS))
+        audio = OggOpus(path)
+        audio.update({key: [value] for key, value in tags.items()})
+        if cover is not None:
+            picture = Picture()
+            picture.type, picture.mime, picture.data = 3, "image/jpeg", cover
+            audio["metadata_block_picture"] = [base64.b64encode(picture.write()).decode("ascii")]
+        audio.save()
+
+
+def make_library(root, track_count):
+    """Folders under root holding at least track_count tracks; returns their paths."""
+    folders = []
+    covers = {}
+    for folder_number in range(-(-track_count // FOLDER_TRACKS)):
+        folder = os.path.join(root, f"part_{folder_number:03}")
+        folders.append(folder)
+        if os.path.exists(os.path.join(folder, COMPLETE_MARKER)):
+            continue
+        os.makedirs(folder, exist_ok=True)
+        for number in range(folder_number * FOLDER_TRACKS, (folder_number + 1) * FOLDER_TRACKS):
+            album = number // TRACKS_PER_ALBUM
+            size = COVER_SIZES[album % len(COVER_SIZES)]
+            if size is not None and album not in covers:
+                covers = {album: cover_jpeg(album, size)}  # tracks of an album are written together
+            tags = track_tags(number)
+            name = f"{tags['artist']} - {tags['title']}{FORMATS[number % len(FORMATS)]}"
+            write_track(os.path.join(folder, name), number, covers.get(album) if size is not None else None)
+        open(os.path.join(folder, COMPLETE_MARKER), "w").close()
+    return folders
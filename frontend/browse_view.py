@@ -0,0 +1,94 @@
+import flet as ft
+
+SHEET_HEIGHT = 420
+
+
+class BrowseSheet(ft.BottomSheet):
+    """Artists with their albums, and genres, read from the library's tag indexes.
+
+    Picking an entry hands its (index, file_metadata) rows to on_show; the play button of
+    an album hands them to on_play in track order. Only the level being looked at is
+    built, an artist's albums once the artist is picked.
+    """
+
+    def __init__(self, library, on_show, on_play):
+        self.library = library
+        self.on_show = on_show
+        self.on_play = on_play
+        self.tabs = ft.Tabs(
+            tabs=[ft.Tab(text="Artists"), ft.Tab(text="Genres")],
+            selected_index=0,
+            on_change=lambda e: self.show_top(),
+        )
+        self.entries = ft.ListView(expand=True)
+        super().__init__(
+            content=ft.Container(
+                content=ft.Column([self.tabs, self.entries]),
+                height=SHEET_HEIGHT,
+                padding=ft.padding.all(10),
+            ),
+        )
+
+    def show(self):
+        self.show_top()
+        self.open = True
+        self.page.update()
+
+    def show_top(self):
+        """Every artist or every genre, whichever tab is picked."""
+        with self.library.lock:
+            tags = self.library.tags
+            entries = [ft.ListTile(leading=ft.Icon(ft.Icons.LIBRARY_MUSIC_ROUNDED), title=ft.Text("All Songs"), on_click=lambda e: self.pick(None))]
+            if self.tabs.selected_index == 0:
+                for artist in tags.artist_keys():
+                    album_count = len(tags.artists[artist])
+                    entries.append(ft.ListTile(
+                        title=ft.Text(tags.name(artist, "artist")),
+                        subtitle=ft.Text(f"{album_count} album{'s' if album_count != 1 else ''}"),
+                        on_click=lambda e, artist=artist: self.show_artist(artist),
+                    ))
+            else:
+                for genre in tags.genre_keys():
+                    entries.append(ft.ListTile(
+                        title=ft.Text(tags.name(genre, "genre")),
+                        subtitle=ft.Text(f"{len(tags.genre_ids(genre))} songs"),
+                        on_click=lambda e, genre=genre: self.pick(self.library.genre_rows(genre)),
+                    ))
+        self.set_entries(entries)
+
+    def show_artist(self, artist):
+        """The albums of one artist, each with a button that plays it."""
+        with self.library.lock:
+            tags = self.library.tags
+            entries = [
+                ft.ListTile(leading=ft.Icon(ft.Icons.ARROW_BACK_ROUNDED), title=ft.Text(tags.name(artist, "artist")), on_click=lambda e: self.show_top()),
+                ft.ListTile(title=ft.Text("All Songs"), on_click=lambda e: self.pick(self.library.artist_rows(artist))),
+            ]
+            for album in tags.album_keys(artist):
+                entries.append(ft.ListTile(
+                    title=ft.Text(tags.name(album, "album")),
+                    subtitle=ft.Text(f"{len(tags.album_ids(artist, album))} songs"),
+                    trailing=ft.IconButton(
+                        ft.Icons.PLAY_ARROW_ROUNDED,
+                        tooltip="Play Album",
+                        on_click=lambda e, album=album: self.play(self.library.album_rows(artist, album)),
+                    ),
+                    on_click=lambda e, album=album: self.pick(self.library.album_rows(artist, album)),
+                ))
+        self.set_entries(entries)
+
+    def set_entries(self, entries):
+        self.entries.controls = entries
+        if self.page:
+            self.entries.update()
+            self.entries.scroll_to(offset=0)
+
+    def pick(self, rows):
+        """Close the sheet and show rows in the playlist; None for the whole library."""
+        self.open = False
+        self.on_show(rows)
+
+    def play(self, rows):
+        self.open = False
+        self.on_show(rows)
+        self.on_play([index for index, _ in rows])
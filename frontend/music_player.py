@@ -1,22 +1,55 @@
-import json
 import flet as ft
 import pygame
 import threading
 from backend.all_func_volume import VolumeControl
-from backend.all_func_file_handling import choose_folder, load_config, load_current_music, load_theme, sort_playlist, search_files, display_files, load_music, load_folder_path
+from backend.all_func_config import config_store
+from backend.all_func_file_handling import choose_folder, load_current_music, load_theme, sort_playlist, search_files, display_files, load_music, load_folder_paths, toggle_duplicates, duplicates_progress, show_duplicates, show_rows, toggle_playlist, open_playlist, save_playlist
 from backend.all_func_playback_controls import PlaybackControls
+from backend.all_func_library_engine import SORT_LABELS, LibraryEngine
+from backend.all_func_library_index import LibraryIndex
+from backend.all_func_duplicates import DuplicateFinder
+from backend.all_func_metrics import metrics
+from backend.all_func_loudness import LoudnessAnalyzer
+from backend.all_func_waveform import WaveformGenerator, WaveformStore
+from backend.all_func_startup import startup_timer
+from backend.logger import setup_logger
+from frontend.browse_view import BrowseSheet
+from frontend.playlist_view import PlaylistView
+from frontend.waveform_view import WaveformView
 from math import pi
+logger = setup_logger()
+
+SEARCH_DEBOUNCE_SECONDS = 0.2
 
 
 class MusicPlayer(ft.Container):
     def __init__(self, page: ft.Page):
         super().__init__()
         self.page = page
-        self.music_files = []
+        metrics.instrument_page(page)
+        metrics.start_exports()
+        self.library_watcher = None
+        self.scan_thread = None  # the library scan, while it's going
+        self.scan_cancelled = None
+        self.search_timer = None
+        self.showing_duplicates = False
+        self.playlist = None  # the Playlist that is the track list in place of the library, if any
+        self.playlist_cancelled = None
 
-        pygame.mixer.init()
         self.volume_control = VolumeControl()
+        self.volume_control.set_equalizer(**config_store.get("equalizer", {}))
+        self.library_index = LibraryIndex()
+        self.library = LibraryEngine(self.library_index)
         self.playback_controls = PlaybackControls(self)
+        self.loudness_analyzer = LoudnessAnalyzer(self.library_index, on_result=self.playback_controls.loudness_measured)
+        self.waveform_store = WaveformStore(self.library_index)
+        self.waveform_generator = WaveformGenerator(self.waveform_store, on_ready=self.waveform_ready)
+        self.duplicate_finder = DuplicateFinder(
+            self.library_index,
+            on_progress=lambda done, total: duplicates_progress(self, done, total),
+            on_done=lambda groups: show_duplicates(self),
+        )
+        self.audio_ready = threading.Event()
 
         self.page_theme=ft.IconButton(
             ft.Icons.DARK_MODE_ROUNDED,
@@ -27,12 +60,17 @@ class MusicPlayer(ft.Container):
             animate_rotation=ft.animation.Animation(300, ft.AnimationCurve.FAST_OUT_SLOWIN),
         )
         
-        self.file_list = ft.Column()
+        self.file_list = PlaylistView(
+            on_select=lambda index: self.playback_controls.play_music(index),
+            on_queue=lambda index: self.playback_controls.queue_track(index),
+            viewport_height=self.page.height-200,
+        )
         self.current_song = ft.Text("Select a folder")
         self.progress = ft.Slider(min=0, max=100, value=0, on_change=lambda e:self.playback_controls.seek(e), disabled=True, expand=1)
+        self.waveform_view = WaveformView()
         
         self.search_field=ft.SearchBar(
-            on_change=lambda e: search_files(self,e),
+            on_change=self.search_changed,
             bar_hint_text="Search By Song Name...",
             bar_leading=ft.IconButton(ft.Icons.SEARCH_ROUNDED, disabled=True),
             visible=False,
@@ -44,6 +82,13 @@ class MusicPlayer(ft.Container):
             on_click=self.toggle_search,
             disabled=True
         )
+        self.browse_button = ft.IconButton(
+            ft.Icons.LIBRARY_MUSIC_ROUNDED,
+            icon_size=30,
+            on_click=lambda e: self.browse_sheet.show(),
+            disabled=True,
+            tooltip="Browse by Artist or Genre"
+        )
         self.play_button = ft.IconButton(
             ft.Icons.PLAY_CIRCLE_OUTLINE_ROUNDED, 
             icon_size=50,
@@ -72,10 +117,37 @@ class MusicPlayer(ft.Container):
             tooltip="Sort by Name"
         )
         self.current_sort = 0  # 0 = Name, 1 = Date Modified, 2 = Size, 3 = Type
+        self.duplicates_button = ft.IconButton(
+            ft.Icons.CONTENT_COPY_ROUNDED,
+            icon_size=30,
+            on_click=lambda e: toggle_duplicates(self, e),
+            disabled=True,
+            tooltip="Find Duplicates"
+        )
         self.folder_button = ft.IconButton(
             icon=ft.Icons.FOLDER_OPEN_OUTLINED, 
             icon_size=30,
-            on_click=lambda e: choose_folder(self, e)
+            on_click=lambda e: choose_folder(self, e),
+            tooltip="Open Folder"
+        )
+        self.add_folder_button = ft.IconButton(
+            icon=ft.Icons.CREATE_NEW_FOLDER_OUTLINED,
+            icon_size=30,
+            on_click=lambda e: choose_folder(self, e, add=True),
+            tooltip="Add Folder to Library"
+        )
+        self.playlist_button = ft.IconButton(
+            ft.Icons.QUEUE_MUSIC_ROUNDED,
+            icon_size=30,
+            on_click=lambda e: toggle_playlist(self, e),
+            tooltip="Open Playlist"
+        )
+        self.save_playlist_button = ft.IconButton(
+            ft.Icons.SAVE_ALT_ROUNDED,
+            icon_size=30,
+            on_click=lambda e: save_playlist(self, e),
+            disabled=True,
+            tooltip="Save as Playlist"
         )
         
         self.loop_button = ft.IconButton(
@@ -121,6 +193,8 @@ class MusicPlayer(ft.Container):
             ft.Icons.VOLUME_UP_ROUNDED if self.volume_slider.value>50 else ft.Icons.VOLUME_MUTE_ROUNDED if self.volume_slider.value==0 else ft.Icons.VOLUME_DOWN_ROUNDED,
             on_click=self.mute_unmute
         )
+        # the mixer and the volume backend start in the background while the rest of the UI is built
+        threading.Thread(target=self.init_audio, daemon=True).start()
         self.song_progress=ft.Text()
         self.song_duration=ft.Text("00:00")
         
@@ -128,69 +202,117 @@ class MusicPlayer(ft.Container):
         self.update_progress_thread.start()
 
         self.play_list_container = ft.Container(
-            content=ft.Row(
-                [
-                    ft.Container(
-                        ft.Column(
-                            [
-                                self.file_list
-                            ],
-                            scroll=ft.ScrollMode.AUTO,
-                        ),
-                        expand=1
-                    )
-                ]
-            ),
+            content=self.file_list,
             height=self.page.height-200
         )
         self.first_time=True
 
-        # ===== equalizer doesnt work for now
-        # self.bass_level = 50 
-        # self.mid_level = 50
-        # self.treble_level = 50
-        # self.equalizer_sheet = ft.BottomSheet(
-        #     content=ft.Container(
-        #         content=ft.Column(
-        #             [
-        #                 ft.Text("Equalizer", style=ft.TextStyle(size=20, weight=ft.FontWeight.BOLD)),
-        #                 ft.Slider(min=0, max=100, divisions=100, value=self.bass_level, label="Bass", on_change=self.adjust_bass),
-        #                 ft.Slider(min=0, max=100, divisions=100, value=self.mid_level, label="Mid", on_change=self.adjust_mid),
-        #                 ft.Slider(min=0, max=100, divisions=100, value=self.treble_level, label="Treble", on_change=self.adjust_treble),
-        #             ],
-        #             alignment=ft.MainAxisAlignment.CENTER,
-        #             horizontal_alignment=ft.CrossAxisAlignment.CENTER
-        #         ),
-        #         padding=ft.padding.all(10)
-        #     ),
-        # )
-        # self.page.overlay.append(self.equalizer_sheet)
-
-    # def show_equalizer(self, e):
-    #     """Toggle Equalizer sheet visibility."""
-    #     self.equalizer_sheet.open=True
-    #     self.page.update()
-
-    # def adjust_bass(self, e):
-    #     """Adjust bass level."""
-    #     self.bass_level = e.control.value
-    #     self.volume_control.set_equalizer(bass=self.bass_level)
-    #     print(f"Adjusting Bass to: {self.bass_level}")
-
-    # def adjust_mid(self, e):
-    #     """Adjust mid level."""
-    #     self.mid_level = e.control.value
-    #     self.volume_control.set_equalizer(mid=self.mid_level)
-    #     print(f"Adjusting Mid to: {self.mid_level}")
-
-    # def adjust_treble(self, e):
-    #     """Adjust treble level."""
-    #     self.treble_level = e.control.value
-    #     self.volume_control.set_equalizer(treble=self.treble_level)
-    #     print(f"Adjusting Treble to: {self.treble_level}")
+        self.equalizer_sheet = ft.BottomSheet(
+            content=ft.Container(
+                content=ft.Column(
+                    [
+                        ft.Text("Equalizer", style=ft.TextStyle(size=20, weight=ft.FontWeight.BOLD)),
+                        ft.Slider(min=0, max=100, divisions=100, value=self.volume_control.bass_level, label="Bass", on_change=self.adjust_bass),
+                        ft.Slider(min=0, max=100, divisions=100, value=self.volume_control.mid_level, label="Mid", on_change=self.adjust_mid),
+                        ft.Slider(min=0, max=100, divisions=100, value=self.volume_control.treble_level, label="Treble", on_change=self.adjust_treble),
+                    ],
+                    alignment=ft.MainAxisAlignment.CENTER,
+                    horizontal_alignment=ft.CrossAxisAlignment.CENTER
+                ),
+                padding=ft.padding.all(10)
+            ),
+        )
+        self.page.overlay.append(self.equalizer_sheet)
+        self.browse_sheet = BrowseSheet(self.library, on_show=lambda rows: show_rows(self, rows), on_play=self.playback_controls.play_tracks)
+        self.page.overlay.append(self.browse_sheet)
+
+    @property
+    def music_files(self):
+        """The track list playback works on: the open playlist's, else the library's."""
+        if self.playlist is not None:
+            return self.playlist.tracks
+        return self.library.music_files
+
+    @property
+    def folder_paths(self):
+        return self.library.folder_paths
+
+    @property
+    def search_index(self):
+        return self.library.search_index
 
+    def init_audio(self):
+        """Start the mixer and the volume backend, then show the real volume."""
+        try:
+            with startup_timer.measure("mixer init"):
+                pygame.mixer.init()
+            with startup_timer.measure("volume backend"):
+                self.volume_control.open()
+            self.playback_controls.update_output()
+        except Exception as e:
+            logger.exception("An error occurred while starting audio: %s", e)
+        finally:
+            self.audio_ready.set()
+
+        self.volume_slider.value = self.volume_control.get_current_volume()
+        self.mute_button.icon = ft.Icons.VOLUME_UP_ROUNDED if self.volume_slider.value>50 else ft.Icons.VOLUME_MUTE_ROUNDED if self.volume_slider.value==0 else ft.Icons.VOLUME_DOWN_ROUNDED
+        if self.volume_slider.page:
+            self.volume_slider.update()
+            self.mute_button.update()
+
+    def report_startup(self):
+        self.audio_ready.wait()
+        startup_timer.mark("playable")
+        startup_timer.report()
+
+    def show_waveform(self, index):
+        """Draw the waveform of music_files[index]; a missing one is made ahead of the rest of the library."""
+        self.waveform_generator.request(self.music_files[index:index + 2])  # this track and the one after it
+        self.waveform_view.set_peaks(self.waveform_store.get(self.music_files[index]))
+
+    def waveform_ready(self, file_path):
+        index = self.playback_controls.current_index
+        if 0 <= index < len(self.music_files) and self.music_files[index].path == file_path:
+            self.waveform_view.set_peaks(self.waveform_store.get(self.music_files[index]))
+
+    def show_equalizer(self, e):
+        """Toggle Equalizer sheet visibility."""
+        self.equalizer_sheet.open=True
+        self.page.update()
+
+    def adjust_bass(self, e):
+        """Adjust bass level."""
+        self.volume_control.set_equalizer(bass=e.control.value)
+        self.equalizer_changed()
+
+    def adjust_mid(self, e):
+        """Adjust mid level."""
+        self.volume_control.set_equalizer(mid=e.control.value)
+        self.equalizer_changed()
+
+    def adjust_treble(self, e):
+        """Adjust treble level."""
+        self.volume_control.set_equalizer(treble=e.control.value)
+        self.equalizer_changed()
+
+    def equalizer_changed(self):
+        self.playback_controls.update_output()
+        config_store.update(equalizer={
+            "bass": self.volume_control.bass_level,
+            "mid": self.volume_control.mid_level,
+            "treble": self.volume_control.treble_level,
+        })
+
+    def search_changed(self, e):
+        """Wait for a pause in typing so a burst of keystrokes filters the list only once."""
+        if self.search_timer is not None:
+            self.search_timer.cancel()
+        self.search_timer = threading.Timer(SEARCH_DEBOUNCE_SECONDS, search_files, args=(self, e))
+        self.search_timer.start()
 
     def close_search(self, e):
+        if self.search_timer is not None:
+            self.search_timer.cancel()
         self.search_field.value=""
         self.search_field.update()
         search_files(self, "")
@@ -207,10 +329,7 @@ class MusicPlayer(ft.Container):
             self.page_theme.tooltip="Dark mode"
             self.page_theme.rotate.angle += pi
         self.page.update()
-        config = load_config() 
-        config["theme"] = self.page.theme_mode
-        with open("config.json", "w") as json_file:
-            json.dump(config, json_file)
+        config_store.update(theme=self.page.theme_mode)
 
     def set_volume(self, e):
         """Set the volume based on the slider value."""
@@ -236,12 +355,16 @@ class MusicPlayer(ft.Container):
     def toggle_search(self, e):
         """show or hide search bar"""
         self.search_field.visible= not self.search_field.visible
+        if self.search_timer is not None:
+            self.search_timer.cancel()
         if self.search_field.visible==True:
             self.search_field.value=""
             self.search_field.focus()
             self.play_list_container.height=self.page.height-265
         else:
             self.play_list_container.height=self.page.height-200
+        self.file_list.set_viewport_height(self.play_list_container.height)
+        if not self.search_field.visible:
             display_files(self, [(index, file) for index, file in enumerate(self.music_files)])
         self.page.update()
 
@@ -266,45 +389,59 @@ class MusicPlayer(ft.Container):
                 self.page_theme.icon=ft.Icons.LIGHT_MODE_ROUNDED
                 self.page_theme.tooltip="Light mode"
             self.page.theme_mode=theme
-        folder_path = load_folder_path()
-        if folder_path:
-            load_music(self, folder_path)
-            current_music, looping = load_current_music()
-            
-            config = load_config()
-            saved_sort_by = config.get("sort_by", "Name")
-            sort_labels = ["Name", "Recently Added", "Size (Ascending)", "Type"]
-            
-            if saved_sort_by in sort_labels:
-                self.current_sort = sort_labels.index(saved_sort_by) - 1
-                sort_playlist(self, None)
-
-            if current_music is not None:
-                self.playback_controls.current_index = current_music
-                self.current_song.value = f"[{current_music + 1}/{len(self.music_files)}] {self.music_files[current_music]['name']}"
-                self.current_song.update()
-
-            if looping is not None:
-                if looping=="No Loop":
-                    pass
-                elif looping=="Loop Song":
-                    self.playback_controls.toggle_loop(None)
-                elif looping=="Next Song":
-                    self.playback_controls.toggle_loop(None)
-                    self.playback_controls.toggle_loop(None)
-                elif looping=="Random Song":
-                    self.playback_controls.toggle_loop(None)
-                    self.playback_controls.toggle_loop(None)
-                    self.playback_controls.toggle_loop(None)
-
+        folder_paths = load_folder_paths()
+        if folder_paths:
+            saved_sort_by = config_store.get("sort_by", "Name")
+            if saved_sort_by in SORT_LABELS:
+                self.current_sort = SORT_LABELS.index(saved_sort_by)
+            load_music(self, folder_paths, on_loaded=self.restore_session)
+        else:
+            self.restore_session()  # a playlist can be played without a library
         return super().did_mount()
 
+    def restore_session(self):
+        """Pick up the playlist, track and loop mode of the last session once the library is loaded."""
+        current_music, looping = load_current_music()
+        playlist_path = config_store.get("playlist")
+        if playlist_path is not None:
+            if self.playback_controls.current_index != -1:
+                # a library track was picked while the scan was going, the library stays
+                config_store.update(playlist=None)
+                current_music = None
+            elif not open_playlist(self, playlist_path, announce=False):
+                current_music = None  # it was a track of the playlist
+
+        # unless a track was already picked while the scan was going
+        if current_music is not None and current_music < len(self.music_files) and self.playback_controls.current_index == -1:
+            self.playback_controls.current_index = current_music
+            config_store.update(current_music=current_music)
+            self.current_song.value = f"[{current_music + 1}/{len(self.music_files)}] {self.music_files[current_music].name}"
+            self.current_song.update()
+            self.show_waveform(current_music)
+
+        if looping is not None:
+            if looping=="No Loop":
+                pass
+            elif looping=="Loop Song":
+                self.playback_controls.toggle_loop(None)
+            elif looping=="Next Song":
+                self.playback_controls.toggle_loop(None)
+                self.playback_controls.toggle_loop(None)
+            elif looping=="Random Song":
+                self.playback_controls.toggle_loop(None)
+                self.playback_controls.toggle_loop(None)
+                self.playback_controls.toggle_loop(None)
+
+        startup_timer.mark("library loaded")
+        threading.Thread(target=self.report_startup, daemon=True).start()
+
 
     def resize(self, e):
         if self.search_field.visible:
             self.play_list_container.height = self.page.height - 265
         else:
             self.play_list_container.height = self.page.height - 200
+        self.file_list.set_viewport_height(self.play_list_container.height)
         self.update()
 
     def build(self):
@@ -327,7 +464,22 @@ class MusicPlayer(ft.Container):
                 ft.Container(
                     content=ft.Column(
                         [
-                            ft.Row([self.progress]),
+                            ft.Row(
+                                [
+                                    ft.Stack(
+                                        [
+                                            ft.Container(
+                                                content=self.waveform_view,
+                                                padding=ft.padding.symmetric(horizontal=24),
+                                                alignment=ft.alignment.center,
+                                                left=0, right=0, top=0, bottom=0,
+                                            ),
+                                            self.progress
+                                        ],
+                                        expand=1
+                                    )
+                                ]
+                            ),
                             ft.Row(
                                 [
                                     self.current_song,
@@ -355,8 +507,13 @@ class MusicPlayer(ft.Container):
                                     ft.Row(
                                         [
                                             self.folder_button,
+                                            self.add_folder_button,
+                                            self.playlist_button,
+                                            self.save_playlist_button,
                                             self.search_button,
+                                            self.browse_button,
                                             self.sort_button,
+                                            self.duplicates_button,
                                             self.seek_backward_button,
                                             self.back_button,
                                             self.play_button,
@@ -364,7 +521,7 @@ class MusicPlayer(ft.Container):
                                             self.seek_forward_button,
                                             self.loop_button,
                                             self.page_theme,
-                                            # self.equalizer_button
+                                            self.equalizer_button,
                                             ft.IconButton(
                                                 ft.Icons.CODE_ROUNDED,
                                                 on_click=lambda e:self.page.launch_url("https://github.com/R-S-M-J/MusicPlayer")
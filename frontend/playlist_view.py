@@ -0,0 +1,132 @@
+import math
+import flet as ft
+
+ROW_EXTENT = 50  # every row has the same height, so a scroll offset maps straight to an index
+OVERSCAN_ROWS = 10  # rows kept ready above and below the viewport
+DEFAULT_COVER = "/images/default1.png"
+
+
+class PlaylistView(ft.ListView):
+    """Playlist that only builds controls for the rows around the visible part of the list.
+
+    The rows are a small pool of controls that get re-bound to other tracks while
+    scrolling; the padding above and below them stands in for the rows that aren't built,
+    so the scrollbar still covers the whole playlist.
+    """
+
+    def __init__(self, on_select, on_queue=None, viewport_height=600):
+        super().__init__(
+            item_extent=ROW_EXTENT,
+            on_scroll=self.handle_scroll,
+            on_scroll_interval=50,
+            expand=True,
+        )
+        self.on_select = on_select
+        self.on_queue = on_queue  # long press on a row
+        self.viewport_height = viewport_height
+        self.items = []  # (index in music_files, file_metadata) pairs, in display order
+        self.first_row = 0
+        self.row_pool = []
+
+    def set_items(self, items):
+        """Show a new list of (index, file_metadata) pairs, starting from the top."""
+        self.items = list(items)
+        self.first_row = 0
+        self.render()
+        if self.page:
+            self.update()
+            self.scroll_to(offset=0)
+
+    def add_items(self, items):
+        """Append (index, file_metadata) pairs, leaving the scroll position where it is."""
+        self.items.extend(items)
+        self.render()
+        if self.page:
+            self.update()
+
+    def update_items(self, items):
+        """Swap in a changed list of (index, file_metadata) pairs, leaving the scroll position where it is."""
+        self.items = list(items)
+        self.render()
+        if self.page:
+            self.update()
+
+    def show_message(self, text):
+        self.items = []
+        self.first_row = 0
+        self.padding = None
+        self.controls = [
+            ft.Row(
+                [
+                    ft.Text(text)
+                ],
+                alignment=ft.MainAxisAlignment.CENTER,
+            )
+        ]
+        if self.page:
+            self.update()
+
+    def set_viewport_height(self, viewport_height):
+        if viewport_height != self.viewport_height:
+            self.viewport_height = viewport_height
+            if self.items:
+                self.render()
+
+    def handle_scroll(self, e: ft.OnScrollEvent):
+        if e.viewport_dimension:
+            self.viewport_height = e.viewport_dimension
+        first_visible = int(max(e.pixels, 0) // ROW_EXTENT)
+        last_visible = first_visible + math.ceil(self.viewport_height / ROW_EXTENT)
+        # only move the window once the viewport gets close to one of its edges
+        near_top = self.first_row > 0 and first_visible - self.first_row < OVERSCAN_ROWS // 2
+        near_bottom = self.first_row + len(self.controls) - last_visible < OVERSCAN_ROWS // 2
+        if near_top or near_bottom:
+            first_row = max(0, first_visible - OVERSCAN_ROWS)
+            if first_row != self.first_row:
+                self.first_row = first_row
+                self.render()
+                self.update()
+
+    def render(self):
+        """Bind the row pool to the current window of items."""
+        window_size = math.ceil(self.viewport_height / ROW_EXTENT) + 2 * OVERSCAN_ROWS
+        self.first_row = max(0, min(self.first_row, len(self.items) - window_size))
+        window = self.items[self.first_row:self.first_row + window_size]
+        while len(self.row_pool) < len(window):
+            self.row_pool.append(self.build_row())
+        for row, (index, file_metadata) in zip(self.row_pool, window):
+            self.bind_row(row, index, file_metadata)
+        self.controls = self.row_pool[:len(window)]
+        self.padding = ft.padding.only(
+            top=self.first_row * ROW_EXTENT,
+            bottom=(len(self.items) - self.first_row - len(window)) * ROW_EXTENT,
+        )
+
+    def build_row(self):
+        return ft.TextButton(
+            content=ft.Row(
+                [
+                    ft.Row(
+                        [
+                            ft.Text(),
+                            ft.Image(height=40, width=100),
+                            ft.Text()
+                        ],
+                        spacing=0
+                    ),
+                    ft.Text(),
+                ],
+                alignment=ft.MainAxisAlignment.SPACE_BETWEEN
+            ),
+            on_click=lambda e: self.on_select(e.control.data),
+            on_long_press=lambda e: self.on_queue(e.control.data) if self.on_queue else None,
+        )
+
+    def bind_row(self, row, index, file_metadata):
+        number, album_cover, name = row.content.controls[0].controls
+        duration = row.content.controls[1]
+        number.value = index + 1
+        album_cover.src = file_metadata.album_cover or DEFAULT_COVER
+        name.value = file_metadata.name
+        duration.value = file_metadata.duration
+        row.data = index
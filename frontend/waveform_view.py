@@ -0,0 +1,58 @@
+import flet as ft
+import flet.canvas as cv
+import numpy as np
+
+PIXELS_PER_POINT = 3  # horizontal resolution of the drawn outline
+WAVEFORM_HEIGHT = 32
+
+
+class WaveformView(cv.Canvas):
+    """Outline of a track's min/max peaks, drawn behind the seek bar.
+
+    The outline is one filled path, upper edge left to right and lower edge back, with a
+    point every few pixels; the stored peaks are reduced to that width before drawing.
+    """
+
+    def __init__(self, color=ft.Colors.with_opacity(0.25, ft.Colors.BLUE_200)):
+        super().__init__(
+            height=WAVEFORM_HEIGHT,
+            on_resize=self.handle_resize,
+            resize_interval=100,
+            expand=True,
+        )
+        self.color = color
+        self.peaks = None
+        self.width_px = 0
+
+    def set_peaks(self, peaks):
+        """Show (buckets, 2) int8 min/max peaks, or nothing for None."""
+        self.peaks = peaks
+        self.draw()
+        if self.page:
+            self.update()
+
+    def handle_resize(self, e: cv.CanvasResizeEvent):
+        if int(e.width) != self.width_px:
+            self.width_px = int(e.width)
+            self.draw()
+            self.update()
+
+    def draw(self):
+        if self.peaks is None or self.width_px <= 0:
+            self.shapes = []
+            return
+        points = max(2, min(len(self.peaks), self.width_px // PIXELS_PER_POINT))
+        group = len(self.peaks) // points
+        grouped = self.peaks[:points * group].reshape(points, group, 2)
+        lows = (grouped[:, :, 0].min(axis=1) / 127).tolist()
+        highs = (grouped[:, :, 1].max(axis=1) / 127).tolist()
+        xs = np.linspace(0, self.width_px, points).tolist()
+        middle = WAVEFORM_HEIGHT / 2
+        upper = [cv.Path.LineTo(x, middle - high * middle) for x, high in zip(xs, highs)]
+        lower = [cv.Path.LineTo(x, middle - low * middle) for x, low in zip(xs[::-1], lows[::-1])]
+        self.shapes = [
+            cv.Path(
+                [cv.Path.MoveTo(0, middle)] + upper + lower + [cv.Path.Close()],
+                paint=ft.Paint(style=ft.PaintingStyle.FILL, color=self.color),
+            )
+        ]
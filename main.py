@@ -1,12 +1,24 @@
-import flet as ft
-from frontend.music_player import MusicPlayer
+from backend.all_func_startup import startup_timer
+with startup_timer.measure("import flet"):
+    import flet as ft
 
 def main(page: ft.Page):
+    startup_timer.mark("window connected")
     page.title = "Music Player"
     page.scroll = ft.ScrollMode.AUTO
     page.theme_mode=ft.ThemeMode.SYSTEM
     page.padding=ft.padding.all(0)
+    # paint something right away, the player and its audio stack take a moment to import
+    loading = ft.Row([ft.ProgressRing()], alignment=ft.MainAxisAlignment.CENTER)
+    page.add(loading)
+    startup_timer.mark("first paint")
+
+    with startup_timer.measure("import frontend.music_player"):
+        from frontend.music_player import MusicPlayer
     player=MusicPlayer(page)
+    page.controls.remove(loading)
     page.add(player)
+    startup_timer.mark("ui ready")
 
-ft.app(target=main)
+if __name__ == "__main__":
+    ft.app(target=main)